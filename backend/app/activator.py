@@ -0,0 +1,80 @@
+import asyncio
+import httpx
+import structlog
+from fastapi import FastAPI, Request, Response
+from sqlalchemy import select
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Store
+from app.services.hibernation import wake_store, store_backend, STATUS_HIBERNATED, STATUS_WAKING
+from app.operator.readiness import WaitTimeout
+
+structlog.configure(
+    processors=[
+        structlog.processors.JSONRenderer()
+    ]
+)
+logger = structlog.get_logger()
+
+# Hop-by-hop and length headers are recomputed by the proxy hop
+SKIP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "upgrade", "proxy-authorization", "content-length", "content-encoding"}
+
+app = FastAPI(
+    title="Urumi Store Activator",
+    description="Wakes hibernated stores on their first request"
+)
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@app.on_event("startup")
+async def startup_event():
+    app.state.http = httpx.AsyncClient(timeout=60, follow_redirects=False)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await app.state.http.aclose()
+
+@app.api_route("/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+async def activate(path: str, request: Request):
+    """
+    Traefik only routes a store's hosts here while it is hibernated. Wake the
+    store, hold the request until WordPress is ready, then proxy it straight
+    to the store's service. Later requests go through the restored Ingress.
+    """
+    host = request.headers.get("host", "").split(":")[0]
+    namespace = host.split(".")[0]
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Store).where(Store.namespace == namespace))
+        store = result.scalars().first()
+    if not store:
+        return Response("Store not found", status_code=404)
+    if store.status not in (STATUS_HIBERNATED, STATUS_WAKING, "ready"):
+        return Response(f"Store is {store.status}", status_code=503, headers={"Retry-After": "30"})
+
+    logger.info("activator_request", namespace=namespace, status=store.status, path=request.url.path)
+    try:
+        # Also repairs a store left half-hibernated; waking is idempotent
+        await asyncio.wait_for(wake_store(namespace), timeout=settings.ACTIVATOR_WAKE_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, WaitTimeout):
+        logger.warning("activator_wake_timeout", namespace=namespace)
+        return Response("Store is waking up, please retry shortly", status_code=503, headers={"Retry-After": "10"})
+    except Exception as e:
+        logger.error("activator_wake_failed", namespace=namespace, error=str(e))
+        return Response("Store could not be woken", status_code=502)
+
+    backend = await store_backend(namespace)
+    if not backend:
+        return Response("Store has no route", status_code=502)
+    upstream = backend + request.url.path
+    if request.url.query:
+        upstream += f"?{request.url.query}"
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in SKIP_HEADERS}
+    response = await app.state.http.request(request.method, upstream, headers=headers, content=await request.body())
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS},
+    )
@@ -0,0 +1,197 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert
+from typing import Any, Dict, List, Optional
+from app.database import get_db
+from app.models import Store, AuditLog
+from app.schemas import StoreCreate, StoreResponse, StoreBatchCreate, StoreBatchDelete, StoreBatchResponse
+from app.services.jobs import enqueue_jobs
+from app.services.store_cache import store_cache
+from app.utils.limiter import limiter
+from app.config import settings
+import uuid
+
+router = APIRouter()
+
+SUCCESS_RESULTS = {"created", "claimed", "waiting_capacity", "deleting"}
+
+def _check_size(count: int):
+    if count > settings.STORE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.STORE_BATCH_MAX_ITEMS} items per batch.")
+
+def _item(index: int, result: str, store: Optional[Store] = None, store_id: Optional[uuid.UUID] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "result": result,
+        "store_id": store.id if store else store_id,
+        "store": StoreResponse.model_validate(store) if store else None,
+        "error": error,
+    }
+
+def _response(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    succeeded = sum(1 for item in items if item["result"] in SUCCESS_RESULTS)
+    return {"succeeded": succeeded, "failed": len(items) - succeeded, "items": items}
+
+@router.post("/stores:batch", response_model=StoreBatchResponse)
+@limiter.limit(f"{settings.RATE_LIMIT_CREATES_PER_MINUTE}/minute")
+async def create_stores_batch(
+    batch: StoreBatchCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many stores in one transaction: one quota reservation for the
+    batch, warm-pool claims per engine, one capacity check, then multi-row
+    inserts of stores, audit entries and provisioning jobs. Each item gets
+    its own result; items that fail do not fail the batch.
+    """
+    from app.services.quota import reserve_quota_slots, release_quota_slots
+    from app.services.warm_pool import claim_pooled_stores
+    from app.services.capacity import get_headroom, STATUS_WAITING
+    _check_size(len(batch.stores))
+    items: List[Optional[Dict[str, Any]]] = [None] * len(batch.stores)
+
+    valid = []
+    for index, raw in enumerate(batch.stores):
+        try:
+            valid.append((index, StoreCreate.model_validate(raw)))
+        except ValidationError as e:
+            items[index] = _item(index, "invalid", error="; ".join(err["msg"] for err in e.errors()))
+
+    # Quota: the counter row stays locked until commit
+    granted = await reserve_quota_slots(db, None, len(valid))
+    for index, _ in valid[granted:]:
+        items[index] = _item(index, "quota_exceeded", error=f"Quota exceeded. Max {settings.MAX_STORES_PER_USER} stores allowed.")
+    accepted = valid[:granted]
+
+    # Fast path: running warm-pool instances, per engine
+    claimed = []
+    remaining = []
+    for engine in dict.fromkeys(store_in.engine for _, store_in in accepted):
+        wanted = [(index, store_in) for index, store_in in accepted if store_in.engine == engine]
+        stores = await claim_pooled_stores(db, [store_in.name for _, store_in in wanted], engine)
+        for (index, _), store in zip(wanted, stores):
+            store.quota_reserved = True
+            claimed.append((index, store))
+        remaining += wanted[len(stores):]
+    remaining.sort(key=lambda pair: pair[0])
+
+    # Capacity admission once for the cold remainder, in item order
+    admitted = len(remaining)
+    if remaining and settings.CAPACITY_ADMISSION_MODE != "off":
+        headroom = await get_headroom(db)
+        if headroom is not None:
+            admitted = max(0, headroom["free_stores"] - headroom["waiting_stores"])
+
+    rows, row_indexes, rejected = [], [], 0
+    for position, (index, store_in) in enumerate(remaining):
+        fits = position < admitted
+        if not fits and settings.CAPACITY_ADMISSION_MODE == "reject":
+            items[index] = _item(index, "capacity_exceeded", error="Insufficient cluster capacity for a new store. Try again later.")
+            rejected += 1
+            continue
+        rows.append({
+            "name": store_in.name,
+            "engine": store_in.engine,
+            "status": "requested" if fits else STATUS_WAITING,
+            "namespace": f"store-{str(uuid.uuid4())[:8]}",
+            "user_id": None,
+            "quota_reserved": True,
+        })
+        row_indexes.append(index)
+    await release_quota_slots(db, None, rejected)
+
+    created = []
+    if rows:
+        result = await db.execute(insert(Store).returning(Store, sort_by_parameter_order=True), rows)
+        created = list(zip(row_indexes, result.scalars().all()))
+
+    ip_address = request.client.host
+    audit_rows = [
+        {
+            "action": "user.create_store",
+            "resource_type": "store",
+            "resource_id": str(store.id),
+            "ip_address": ip_address,
+            "metadata_": {"name": store.name, "engine": store.engine, "batch": True, "warm_pool": True},
+        }
+        for _, store in claimed
+    ] + [
+        {
+            "action": "user.create_store",
+            "resource_type": "store",
+            "resource_id": str(store.id),
+            "ip_address": ip_address,
+            "metadata_": {"name": store.name, "engine": store.engine, "batch": True, "waiting_capacity": store.status == STATUS_WAITING},
+        }
+        for _, store in created
+    ]
+    failures = [item for item in items if item is not None]
+    if failures:
+        audit_rows.append({
+            "action": "quota.check.failed" if any(i["result"] == "quota_exceeded" for i in failures) else "batch.create.partial",
+            "resource_type": "system",
+            "ip_address": ip_address,
+            "metadata_": {"requested": len(batch.stores), "failed": [{"index": i["index"], "result": i["result"]} for i in failures]},
+        })
+    if audit_rows:
+        await db.execute(insert(AuditLog), audit_rows)
+    await enqueue_jobs(db, "personalize_store", [store.id for _, store in claimed])
+    await enqueue_jobs(db, "provision_store", [store.id for _, store in created])
+    await db.commit()
+
+    for _, store in claimed + created:
+        store_cache.invalidate(store.id)
+    for index, store in claimed:
+        items[index] = _item(index, "claimed", store)
+    for index, store in created:
+        items[index] = _item(index, "created" if store.status != STATUS_WAITING else STATUS_WAITING, store)
+    return _response(items)
+
+@router.post("/stores:batchDelete", response_model=StoreBatchResponse)
+async def delete_stores_batch(
+    batch: StoreBatchDelete,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Start deletion of many stores in one transaction, with a result per id.
+    """
+    from app.services.quota import release_quota_many
+    _check_size(len(batch.ids))
+
+    result = await db.execute(
+        select(Store.id, Store.name, Store.status).where(Store.id.in_(batch.ids)).with_for_update()
+    )
+    found = {row.id: row for row in result.all()}
+
+    items, to_delete = [], []
+    for index, store_id in enumerate(batch.ids):
+        row = found.get(store_id)
+        if row is None:
+            items.append(_item(index, "not_found", store_id=store_id, error="Store not found"))
+        elif row.status == "deleting" or store_id in to_delete:
+            items.append(_item(index, "already_deleting", store_id=store_id))
+        else:
+            to_delete.append(store_id)
+            items.append(_item(index, "deleting", store_id=store_id))
+
+    if to_delete:
+        await db.execute(update(Store).where(Store.id.in_(to_delete)).values(status="deleting"))
+        await release_quota_many(db, to_delete)
+        await db.execute(insert(AuditLog), [
+            {
+                "action": "user.delete_store",
+                "resource_type": "store",
+                "resource_id": str(store_id),
+                "ip_address": request.client.host,
+                "metadata_": {"name": found[store_id].name, "batch": True},
+            }
+            for store_id in to_delete
+        ])
+        await enqueue_jobs(db, "deprovision_store", to_delete)
+        await db.commit()
+        for store_id in to_delete:
+            store_cache.invalidate(store_id)
+    return _response(items)
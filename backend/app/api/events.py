@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Request, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.config import settings
+from app.services.events import broker, replay_events, event_key, RESET
+import asyncio
+import json
+import uuid
+
+router = APIRouter()
+
+def _format(event) -> str:
+    lines = f"event: {event['type']}\n"
+    if "id" in event:
+        lines += f"id: {event['id']}\n"
+    return lines + f"data: {json.dumps(event, default=str)}\n\n"
+
+async def _stream(request: Request, store_id: Optional[uuid.UUID], last_event_id: Optional[str]):
+    async with broker.subscribe(store_id) as subscription:
+        # Subscribed before replaying, so nothing falls between the two
+        replayed = set()
+        if last_event_id:
+            try:
+                events, complete = await replay_events(store_id, int(last_event_id))
+            except ValueError:
+                events, complete = [], False
+            if not complete:
+                yield _format(RESET)
+            for event in events:
+                replayed.add(event_key(event))
+                yield _format(event)
+
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event_key(event) in replayed:
+                continue
+            yield _format(event)
+
+def _response(request: Request, store_id: Optional[uuid.UUID], last_event_id: Optional[str]) -> StreamingResponse:
+    return StreamingResponse(
+        _stream(request, store_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/")
+async def fleet_events(
+    request: Request,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events for the whole fleet: customer store status changes and
+    non-activity audit events. Reconnects resume from Last-Event-ID (or
+    ?last_event_id=); an `event: reset` means the client should refetch.
+    """
+    return _response(request, None, last_event_id_header or last_event_id)
+
+@router.get("/stores/{store_id}")
+async def store_events(
+    store_id: uuid.UUID,
+    request: Request,
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events for one store: status changes and its activity log.
+    """
+    return _response(request, store_id, last_event_id_header or last_event_id)
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.database import get_db
-from app.models import Store, AuditLog
+from sqlalchemy import select
+from app.database import get_db, get_read_db
 import asyncio
 from kubernetes import client, config
 import shutil
@@ -52,46 +51,27 @@ async def get_platform_health(db: AsyncSession = Depends(get_db)):
     return health
 
 @router.get("/metrics")
-async def get_platform_metrics(db: AsyncSession = Depends(get_db)):
+async def get_platform_metrics(db: AsyncSession = Depends(get_read_db)):
     """
-    Aggregate system metrics from DB.
+    Aggregate system metrics from DB (one rollup query, briefly cached).
     """
-    # 1. Basic Counts
-    total_result = await db.execute(select(func.count()).select_from(Store))
-    total_stores = total_result.scalar() or 0
+    from app.services.fleet_metrics import get_fleet_metrics
+    return await get_fleet_metrics(db)
 
-    failed_result = await db.execute(select(func.count()).select_from(Store).where(Store.status == "failed"))
-    failed_stores = failed_result.scalar() or 0
-
-    active_ns_result = await db.execute(select(func.count(Store.namespace.distinct())).select_from(Store).where(Store.status == "ready"))
-    active_namespaces = active_ns_result.scalar() or 0
-
-    # 2. Average Provisioning Time (in seconds)
-    avg_time = 0
-    try:
-        # Cross-DB approach for average provisioning time
-        stmt = select(Store).where(
-            Store.status == "ready", 
-            Store.provisioning_started_at.isnot(None),
-            Store.provisioning_completed_at.isnot(None)
-        )
-        result = await db.execute(stmt)
-        stores = result.scalars().all()
-        
-        if stores:
-            durations = [
-                (s.provisioning_completed_at - s.provisioning_started_at).total_seconds()
-                for s in stores
-            ]
-            avg_time = sum(durations) / len(durations)
-    except Exception as e:
-        print(f"Metrics calc error: {e}")
-        avg_time = "N/A"
+@router.get("/queue")
+async def get_queue_metrics(db: AsyncSession = Depends(get_read_db)):
+    """
+    Provisioning job queue depth and latency.
+    """
+    from app.services.jobs import queue_stats
+    return await queue_stats(db)
 
-    return {
-        "total_stores": total_stores,
-        "failed_stores": failed_stores,
-        "active_namespaces": active_namespaces,
-        "avg_provisioning_time_seconds": round(avg_time, 2) if isinstance(avg_time, (int, float)) else avg_time,
-        "success_rate": round(((total_stores - failed_stores) / total_stores * 100), 1) if total_stores > 0 else 100
-    }
+@router.get("/capacity")
+async def get_capacity(db: AsyncSession = Depends(get_db)):
+    """
+    Cluster headroom for new stores as seen by admission control.
+    """
+    from app.services.capacity import get_headroom
+    from app.config import settings
+    headroom = await get_headroom(db, lock=False)
+    return {"mode": settings.CAPACITY_ADMISSION_MODE, "headroom": headroom}
@@ -1,31 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, Header
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
-from app.database import get_db
+from sqlalchemy import select, insert, tuple_
+from typing import List, Optional
+from app.database import get_db, get_read_db
 from app.models import Store
 from app.schemas import StoreCreate, StoreResponse
+from app.services.jobs import enqueue_job
+from app.services.store_cache import store_cache, doc_etag, list_etag, etag_matches
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.utils.limiter import limiter
+from app.config import settings
+import datetime
 import uuid
 
 router = APIRouter()
 
+_store_list_adapter = TypeAdapter(List[StoreResponse])
+
+def _cached_response(etag: str, body: bytes, if_none_match: Optional[str], headers: Optional[dict] = None) -> Response:
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/", response_model=List[StoreResponse])
-async def list_stores(skip: int = 0, limit: int = 20, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Store).offset(skip).limit(limit))
-    stores = result.scalars().all()
-    return stores
+async def list_stores(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    engine: Optional[str] = None,
+    user_id: Optional[uuid.UUID] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=50),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Newest stores first, paginated by keyset on (created_at, id). Pass the
+    X-Next-Cursor response header back as `cursor` for the next page; it is
+    absent on the last page. Pages are served from the store read cache and
+    answer If-None-Match with 304.
+    """
+    key = (limit, cursor, tuple(sorted(status or [])), engine, str(user_id or ""), name_prefix)
+    cached = store_cache.get_list(key)
+    if cached:
+        etag, body, next_cursor = cached
+        return _cached_response(etag, body, if_none_match, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+    token = store_cache.list_token()
 
-from app.utils.limiter import limiter
-from app.config import settings
-from sqlalchemy import func
+    # Unclaimed warm-pool instances are platform capacity, not customer stores
+    stmt = select(Store).where(Store.pool_state.is_(None))
+    if status:
+        stmt = stmt.where(Store.status.in_(status))
+    if engine:
+        stmt = stmt.where(Store.engine == engine)
+    if user_id:
+        stmt = stmt.where(Store.user_id == user_id)
+    if name_prefix:
+        escaped = name_prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(Store.name.like(f"{escaped}%", escape="\\"))
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(Store.created_at, Store.id) < tuple_(created_at, last_id))
+
+    # One extra row tells us whether another page exists
+    stmt = stmt.order_by(Store.created_at.desc(), Store.id.desc()).limit(limit + 1)
+    result = await db.execute(stmt)
+    stores = result.scalars().all()
+    next_cursor = None
+    if len(stores) > limit:
+        stores = stores[:limit]
+        next_cursor = encode_cursor(stores[-1].created_at, stores[-1].id)
 
-from typing import Any
+    etag = list_etag(((s.id, s.updated_at) for s in stores), next_cursor)
+    body = _store_list_adapter.dump_json(_store_list_adapter.validate_python(stores, from_attributes=True))
+    store_cache.put_list(key, token, etag, body, next_cursor)
+    return _cached_response(etag, body, if_none_match, {"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @router.get("/audit-logs")
-async def get_audit_logs(limit: int = 50, db: AsyncSession = Depends(get_db)):
+async def get_audit_logs(limit: int = 50, db: AsyncSession = Depends(get_read_db)):
     from app.models import AuditLog
     # Fetch high-level audit logs (exclude technical activity logs)
-    stmt = select(AuditLog).where(~AuditLog.action.like('activity.%')).order_by(AuditLog.created_at.desc()).limit(limit)
+    # Bounded by time so only the recent partitions are read
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=settings.AUDIT_FEED_WINDOW_DAYS)
+    stmt = select(AuditLog).where(
+        AuditLog.category != "activity", AuditLog.created_at >= since
+    ).order_by(AuditLog.created_at.desc()).limit(limit)
     result = await db.execute(stmt)
     logs = result.scalars().all()
     
@@ -47,36 +110,85 @@ async def get_audit_logs(limit: int = 50, db: AsyncSession = Depends(get_db)):
 async def create_store(
     store_in: StoreCreate, 
     request: Request, 
-    background_tasks: BackgroundTasks, 
     db: AsyncSession = Depends(get_db)
 ):
     from app.models import AuditLog
-    # Quota Check
-    result = await db.execute(select(func.count()).select_from(Store).where(Store.status != "failed"))
-    count = result.scalar()
-    
-    if count >= settings.MAX_STORES_PER_USER:
+    from app.services.quota import reserve_quota, quota_used
+    # Quota: one atomic conditional increment of the tenant's usage counter,
+    # committed together with the store row below
+    new_store = Store(
+        name=store_in.name,
+        engine=store_in.engine,
+        namespace=f"store-{str(uuid.uuid4())[:8]}",
+        user_id=None
+    )
+    if not await reserve_quota(db, new_store):
+         await db.rollback()
          # Log quota failure
          log = AuditLog(
              action="quota.check.failed",
              resource_type="system",
              ip_address=request.client.host,
-             metadata_={"requested_name": store_in.name, "current_count": count}
+             metadata_={"requested_name": store_in.name, "current_count": await quota_used(db, new_store.user_id)}
          )
          db.add(log)
          await db.commit()
          raise HTTPException(status_code=403, detail=f"Quota exceeded. Max {settings.MAX_STORES_PER_USER} stores allowed.")
     
-    new_store = Store(
-        name=store_in.name,
-        engine=store_in.engine,
-        status="requested",
-        namespace=f"store-{str(uuid.uuid4())[:8]}",
-        user_id=None
+    # Fast path: take over an already-running warm-pool instance
+    from app.services.warm_pool import claim_pooled_store
+    claimed = await claim_pooled_store(db, store_in.name, store_in.engine)
+    if claimed:
+        # The slot moves onto the pool instance; new_store is never inserted
+        claimed.quota_reserved = True
+        log = AuditLog(
+            action="user.create_store",
+            resource_type="store",
+            resource_id=str(claimed.id),
+            ip_address=request.client.host,
+            metadata_={"name": store_in.name, "engine": store_in.engine, "warm_pool": True}
+        )
+        db.add(log)
+        enqueue_job(db, "personalize_store", claimed.id)
+        await db.commit()
+        # Don't wait for the NOTIFY round trip to drop this replica's copies
+        store_cache.invalidate(claimed.id)
+
+        return claimed
+
+    # Capacity admission: fail fast (or queue) instead of timing out in the
+    # operator. The admission lock is held until this store commits.
+    from app.services.capacity import check_admission, STATUS_WAITING
+    fits, headroom = await check_admission(db)
+    if not fits and settings.CAPACITY_ADMISSION_MODE == "reject":
+        # Drops the quota reservation with the rest of the transaction
+        await db.rollback()
+        log = AuditLog(
+            action="capacity.check.failed",
+            resource_type="system",
+            ip_address=request.client.host,
+            metadata_={"requested_name": store_in.name, "headroom": headroom}
+        )
+        db.add(log)
+        await db.commit()
+        raise HTTPException(
+            status_code=503,
+            detail="Insufficient cluster capacity for a new store. Try again later.",
+            headers={"Retry-After": str(settings.CAPACITY_QUEUE_RECHECK_SECONDS)}
+        )
+
+    # INSERT ... RETURNING hands back server defaults (created_at, ...) without a refresh
+    result = await db.execute(
+        insert(Store).values(
+            name=new_store.name,
+            engine=new_store.engine,
+            namespace=new_store.namespace,
+            user_id=new_store.user_id,
+            quota_reserved=new_store.quota_reserved,
+            status="requested" if fits else STATUS_WAITING,
+        ).returning(Store)
     )
-    db.add(new_store)
-    await db.commit()
-    await db.refresh(new_store)
+    new_store = result.scalars().one()
     
     # Audit Log: user.create_store
     log = AuditLog(
@@ -84,27 +196,48 @@ async def create_store(
         resource_type="store",
         resource_id=str(new_store.id),
         ip_address=request.client.host,
-        metadata_={"name": store_in.name, "engine": store_in.engine}
+        metadata_={"name": store_in.name, "engine": store_in.engine, "waiting_capacity": not fits}
     )
     db.add(log)
+    # Outbox record: the worker creates the CR once this commits. Store, quota,
+    # audit entry and job land in one transaction.
+    enqueue_job(db, "provision_store", new_store.id)
     await db.commit()
-    
-    # Trigger background provisioning task
-    from app.services.orchestrator import provision_store
-    background_tasks.add_task(provision_store, new_store.id)
+    store_cache.invalidate(new_store.id)
     
     return new_store
 
 @router.get("/{store_id}", response_model=StoreResponse)
-async def get_store(store_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Store).where(Store.id == store_id))
-    store = result.scalars().first()
+async def get_store(
+    store_id: uuid.UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Served from the store read cache; the ETag changes with updated_at.
+    Misses read the replica, falling back to the primary for a store the
+    replica has not seen yet (e.g. just created).
+    """
+    cached = store_cache.get_doc(store_id)
+    if cached:
+        return _cached_response(*cached, if_none_match)
+    token = store_cache.doc_token(store_id)
+
+    stmt = select(Store).where(Store.id == store_id, Store.pool_state.is_(None))
+    store = (await db.execute(stmt)).scalars().first()
+    if not store and settings.DATABASE_READ_URL:
+        from app.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as primary:
+            store = (await primary.execute(stmt)).scalars().first()
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
-    return store
+    etag = doc_etag(store.id, store.updated_at)
+    body = StoreResponse.model_validate(store).model_dump_json().encode()
+    store_cache.put_doc(store_id, token, etag, body)
+    return _cached_response(etag, body, if_none_match)
 
 @router.delete("/{store_id}")
-async def delete_store(store_id: uuid.UUID, request: Request, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def delete_store(store_id: uuid.UUID, request: Request, db: AsyncSession = Depends(get_db)):
     from app.models import AuditLog
     result = await db.execute(select(Store).where(Store.id == store_id))
     store = result.scalars().first()
@@ -112,6 +245,8 @@ async def delete_store(store_id: uuid.UUID, request: Request, background_tasks:
         raise HTTPException(status_code=404, detail="Store not found")
     
     store.status = "deleting"
+    from app.services.quota import release_quota
+    await release_quota(db, store.id)
     
     # Audit Log: user.delete_store
     log = AuditLog(
@@ -122,19 +257,15 @@ async def delete_store(store_id: uuid.UUID, request: Request, background_tasks:
         metadata_={"name": store.name}
     )
     db.add(log)
+    enqueue_job(db, "deprovision_store", store.id)
     await db.commit()
-    
-    # Trigger background deletion task here
-    from app.services.orchestrator import deprovision_store
-    
-    background_tasks.add_task(deprovision_store, store.id)
+    store_cache.invalidate(store.id)
     
     return {"message": "Store deletion initiated", "status": "deleting"}
 
 @router.post("/{store_id}/retry", response_model=StoreResponse)
 async def retry_store(
     store_id: uuid.UUID, 
-    background_tasks: BackgroundTasks, 
     db: AsyncSession = Depends(get_db)
 ):
     result = await db.execute(select(Store).where(Store.id == store_id))
@@ -145,24 +276,46 @@ async def retry_store(
         
     if store.status != "failed":
         raise HTTPException(status_code=400, detail="Only failed stores can be retried")
+
+    # Failed stores gave their quota slot back; take it again
+    from app.services.quota import reserve_quota
+    if not await reserve_quota(db, store):
+        await db.rollback()
+        raise HTTPException(status_code=403, detail=f"Quota exceeded. Max {settings.MAX_STORES_PER_USER} stores allowed.")
         
-    store.status = "requested"
+    from app.services.capacity import check_admission, STATUS_WAITING
+    fits, _ = await check_admission(db)
+    if not fits and settings.CAPACITY_ADMISSION_MODE == "reject":
+        await db.rollback()
+        raise HTTPException(
+            status_code=503,
+            detail="Insufficient cluster capacity to retry this store. Try again later.",
+            headers={"Retry-After": str(settings.CAPACITY_QUEUE_RECHECK_SECONDS)}
+        )
+
+    store.status = "requested" if fits else STATUS_WAITING
     store.error_message = None
+    # Set here rather than by onupdate, so the response needs no refresh
+    store.updated_at = datetime.datetime.now(datetime.timezone.utc)
+    enqueue_job(db, "provision_store", store.id)
     await db.commit()
-    await db.refresh(store)
-    
-    from app.services.orchestrator import provision_store
-    background_tasks.add_task(provision_store, store.id)
+    store_cache.invalidate(store.id)
     
     return store
 
 @router.get("/{store_id}/logs")
-async def get_store_logs(store_id: uuid.UUID, limit: int = 50, db: AsyncSession = Depends(get_db)):
+async def get_store_logs(store_id: uuid.UUID, limit: int = 50, db: AsyncSession = Depends(get_read_db)):
     from app.models import AuditLog
-    # Fetch technical activity logs for specific store
+    # Fetch technical activity logs for specific store. The timeline starts at
+    # created_at (claim time for warm-pool stores), which prunes older partitions.
+    created = await db.execute(select(Store.created_at).where(Store.id == store_id))
+    since = created.scalar() or (
+        datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=settings.AUDIT_FEED_WINDOW_DAYS)
+    )
     stmt = select(AuditLog).where(
-        AuditLog.resource_id == str(store_id),
-        (AuditLog.action.like('activity.%') | AuditLog.action.like('system.%'))
+        AuditLog.store_id == store_id,
+        AuditLog.category.in_(["activity", "system"]),
+        AuditLog.created_at >= since,
     ).order_by(AuditLog.created_at.asc()).limit(limit)
     result = await db.execute(stmt)
     logs = result.scalars().all()
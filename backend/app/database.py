@@ -1,13 +1,84 @@
+import time
+import uuid
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+POOL_SIZE = Gauge("urumi_db_pool_size", "Connections held open by the pool", ["pool"])
+POOL_CHECKED_OUT = Gauge("urumi_db_pool_checked_out", "Connections currently in use", ["pool"])
+POOL_OVERFLOW = Gauge("urumi_db_pool_overflow", "Connections open beyond DB_POOL_SIZE", ["pool"])
+POOL_ACQUIRE_SECONDS = Histogram(
+    "urumi_db_pool_acquire_seconds", "Time waiting for a pooled connection", ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+POOL_TIMEOUTS = Counter("urumi_db_pool_timeouts_total", "Connection acquires that hit DB_POOL_TIMEOUT_SECONDS", ["pool"])
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(pool=self.logging_name).inc()
+            raise
+        finally:
+            POOL_ACQUIRE_SECONDS.labels(pool=self.logging_name).observe(time.perf_counter() - started)
+
+def _create_engine(url: str, name: str):
+    url = make_url(url)
+    connect_args = {}
+    if settings.DB_COMMAND_TIMEOUT_SECONDS:
+        connect_args["command_timeout"] = settings.DB_COMMAND_TIMEOUT_SECONDS
+    if settings.DB_PGBOUNCER:
+        # Server-side prepared statements don't survive transaction pooling
+        url = url.update_query_dict({"prepared_statement_cache_size": "0"})
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+
+    created = create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    # Read through the engine so the gauges follow the pool across dispose()
+    POOL_SIZE.labels(pool=name).set_function(lambda: created.sync_engine.pool.size())
+    POOL_CHECKED_OUT.labels(pool=name).set_function(lambda: created.sync_engine.pool.checkedout())
+    POOL_OVERFLOW.labels(pool=name).set_function(lambda: max(0, created.sync_engine.pool.overflow()))
+    return created
+
+engine = _create_engine(settings.DATABASE_URL, "primary")
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read-only endpoints use the replica when one is configured, else the primary
+read_engine = _create_engine(settings.DATABASE_READ_URL, "replica") if settings.DATABASE_READ_URL else engine
+ReadSessionLocal = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+def listen_dsn() -> str:
+    """Plain asyncpg DSN for LISTEN connections."""
+    url = settings.DATABASE_LISTEN_URL or settings.DATABASE_URL
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
 class Base(DeclarativeBase):
     pass
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+        yield session
@@ -4,7 +4,7 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from prometheus_fastapi_instrumentator import Instrumentator
 from app.config import settings
-from app.api import stores, health, auth, observability
+from app.api import stores, health, auth, observability, events, batch
 from app.utils.limiter import limiter
 import structlog
 
@@ -34,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Observability
@@ -43,6 +44,8 @@ Instrumentator().instrument(app).expose(app)
 app.include_router(health.router, tags=["Health"])
 app.include_router(observability.router, prefix="/api/v1/observability", tags=["Observability"])
 app.include_router(stores.router, prefix="/api/v1/stores", tags=["Stores"])
+app.include_router(batch.router, prefix="/api/v1", tags=["Stores"])
+app.include_router(events.router, prefix="/api/v1/events", tags=["Events"])
 # app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"]) # Optional
 
 @app.on_event("startup")
@@ -50,11 +53,36 @@ async def startup_event():
     logger.info("application_startup", environment=settings.ENVIRONMENT)
     # Auto-create tables for local dev
     from app.database import engine, Base
-    from app.models import Store, AuditLog # Import models to register them
+    from app.models import Store, AuditLog, Job, TenantDatabase, QuotaUsage # Import models to register them
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        from app.services.audit_partitions import ensure_audit_partitions
+        await ensure_audit_partitions(conn)
+        # Store status / audit inserts -> NOTIFY store_events (SSE streams)
+        from app.services.events import install_notify_triggers
+        await install_notify_triggers(conn)
+        # Job inserts -> NOTIFY jobs_queued (wakes idle workers)
+        from app.services.jobs import install_job_triggers
+        await install_job_triggers(conn)
     logger.info("database_tables_created")
 
+    # Store read cache drops entries on store_events notifications
+    from app.services.events import broker
+    from app.services.store_cache import store_cache
+    broker.add_listener(store_cache.on_event)
+
+    # Single-process setups can run the job worker inside the API
+    if settings.JOB_WORKER_IN_API:
+        import asyncio
+        from app.services.jobs import run_worker
+        app.state.worker_stop = asyncio.Event()
+        app.state.worker_task = asyncio.create_task(run_worker(stop=app.state.worker_stop))
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    if settings.JOB_WORKER_IN_API:
+        app.state.worker_stop.set()
+        await app.state.worker_task
+    from app.services.events import broker
+    await broker.stop()
     logger.info("application_shutdown")
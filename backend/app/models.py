@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, Text, LargeBinary
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, Text, LargeBinary, Boolean, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, INET
 from sqlalchemy.sql import func
 from app.database import Base
@@ -21,7 +21,7 @@ class Store(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=True) # Check spec regarding nullable
     name = Column(String(255), nullable=False)
     engine = Column(String(50), nullable=False) # woocommerce, medusa
-    status = Column(String(50), nullable=False) # requested, provisioning, ready, failed, deleting
+    status = Column(String(50), nullable=False) # requested, provisioning, ready, hibernated, waking, failed, deleting
     namespace = Column(String(255), unique=True, nullable=False)
     domain = Column(String(255))
     admin_url = Column(String(255))
@@ -31,28 +31,117 @@ class Store(Base):
     error_message = Column(Text)
     provisioning_started_at = Column(DateTime(timezone=True))
     provisioning_completed_at = Column(DateTime(timezone=True))
+    # Operator checkpoints: {"uid": <Store CR uid>, "completed": [stage, ...]}
+    provisioning_stages = Column(JSONB)
+    # Warm pool: "warming" / "available" for generic pool instances, NULL for customer stores
+    pool_state = Column(String(20))
+    # Hibernation: last ingress request seen (Traefik metrics) and when scaled to zero
+    last_activity_at = Column(DateTime(timezone=True))
+    hibernated_at = Column(DateTime(timezone=True))
+    # Holds one slot of its tenant's QuotaUsage counter (released on failure/deletion)
+    quota_reserved = Column(Boolean, nullable=False, default=False, server_default=text("false"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     __table_args__ = (
-        Index('idx_stores_status', 'status'),
-        Index('idx_stores_user_id', 'user_id'),
+        # Keyset listing on (created_at, id), alone or behind an equality filter
+        Index('idx_stores_created_id', 'created_at', 'id'),
+        Index('idx_stores_status_created_id', 'status', 'created_at', 'id'),
+        Index('idx_stores_engine_created_id', 'engine', 'created_at', 'id'),
+        Index('idx_stores_user_created_id', 'user_id', 'created_at', 'id'),
+        Index('idx_stores_name_prefix', 'name', postgresql_ops={'name': 'varchar_pattern_ops'}),
+        Index('idx_stores_pool_state', 'pool_state', 'engine', postgresql_where=pool_state.isnot(None)),
+        # Covers the fleet metrics rollup (index-only scan over customer stores)
+        Index(
+            'idx_stores_metrics', 'engine', 'status',
+            postgresql_include=['provisioning_started_at', 'provisioning_completed_at'],
+            postgresql_where=pool_state.is_(None),
+        ),
     )
 
+class QuotaUsage(Base):
+    __tablename__ = "quota_usage"
+
+    # Tenant key: user id, or "default" for unauthenticated stores
+    tenant = Column(String(255), primary_key=True)
+    used = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+def _audit_category(context):
+    # Leading segment of the action: activity, system, user, operator, quota, ...
+    return context.get_current_parameters()["action"].split(".", 1)[0]
+
+def _audit_store_id(context):
+    params = context.get_current_parameters()
+    if params.get("resource_type") == "store" and params.get("resource_id"):
+        try:
+            return uuid.UUID(params["resource_id"])
+        except ValueError:
+            return None
+    return None
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
     id = Column(Integer, primary_key=True, autoincrement=True) # BigSerial equivalent
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    store_id = Column(UUID(as_uuid=True), ForeignKey("stores.id", ondelete="CASCADE"), nullable=True)
+    # No FK: a store's history outlives the store row (deprovisioning deletes it)
+    store_id = Column(UUID(as_uuid=True), nullable=True, default=_audit_store_id)
     action = Column(String(100), nullable=False)
+    category = Column(String(20), nullable=False, default=_audit_category)
     resource_type = Column(String(50))
     resource_id = Column(String(255))
     ip_address = Column(INET) # SQLAlchemy supports INET
     metadata_ = Column("metadata", JSONB) # Metadata is reserved in Base
+    # Partition key, so part of the primary key (app.services.audit_partitions)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+    __table_args__ = (
+        # Per-store timeline (get_store_logs) and global feed (get_audit_logs),
+        # each a single range scan
+        Index('idx_audit_logs_store_timeline', 'store_id', 'created_at', postgresql_where=text("category IN ('activity', 'system')")),
+        Index('idx_audit_logs_feed', 'created_at', postgresql_where=text("category <> 'activity'")),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False) # provision_store, deprovision_store, personalize_store
+    # No FK: deprovisioning deletes the store row the job refers to
+    store_id = Column(UUID(as_uuid=True), nullable=True)
+    payload = Column(JSONB)
+    status = Column(String(20), nullable=False, default="queued") # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String(255))
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # Workers only ever scan runnable jobs
+        Index('idx_jobs_runnable', 'run_after', 'id', postgresql_where=text("status = 'queued'")),
+        Index('idx_jobs_status', 'status'),
+    )
+
+class TenantDatabase(Base):
+    __tablename__ = "tenant_databases"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Keyed by store namespace: the store row is gone by the time the operator deprovisions
+    namespace = Column(String(255), unique=True, nullable=False)
+    store_id = Column(UUID(as_uuid=True), nullable=True)
+    instance = Column(String(255), nullable=False) # host:port of the shared MariaDB
+    database_name = Column(String(64), nullable=False)
+    username = Column(String(64), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    dropped_at = Column(DateTime(timezone=True))
 
     __table_args__ = (
-        Index('idx_audit_logs_store_id', 'store_id'),
-        Index('idx_audit_logs_created_at', 'created_at', postgresql_using='btree'), # desc handled in query usually, or specialized index
+        Index('idx_tenant_databases_instance', 'instance', postgresql_where=text("dropped_at IS NULL")),
     )
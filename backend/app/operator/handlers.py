@@ -1,41 +1,34 @@
 import kopf
 import asyncio
+import copy
+import os
 import structlog
 import secrets
 import datetime
 import uuid
 from sqlalchemy import select
-from app.models import Store, AuditLog
+from app.models import Store
 from app.database import AsyncSessionLocal
-from app.services.helm import helm_install, helm_uninstall
-from app.services.kubernetes import delete_namespace
+from app.services.helm import helm_install, helm_uninstall, ensure_wordpress_chart
+from app.services.manifests import render_chart, apply_store_manifests
+from app.services.shared_db import provision_tenant_database, drop_tenant_database
+from app.services.hibernation import check_idle_stores, remove_activator_route
+from app.services.audit_partitions import maintain_audit_logs
+from app.services.audit_sink import audit_sink
+from app.services.kubernetes import STORE_NAMESPACE_LABEL, create_namespace, delete_namespace, exec_in_pod, upload_to_pod, apply_manifest, close_clients
+from app.operator.wpcli import WpPlan, run_wp_plan
+from app.services.warm_pool import POOL_WARMING, POOL_AVAILABLE, replenish_pool
+from app.services.quota import reserve_quota, release_quota
+from app.operator.readiness import wait_for_pod_ready, wait_until, WaitTimeout
+from app.operator.woocommerce import PRODUCTS, build_plugins_plan, build_pages_plan, build_products_plan, build_payments_plan, seeded_products
+from app.operator.pipeline import Stage, run_stages, completed_stages, once
+from app.operator.snapshots import load_snapshot, capture_snapshot, restore_snapshot
+from app.operator.scheduler import scheduler, PRIORITY_NEW, PRIORITY_RETRY, PRIORITY_POOL
 from app.config import settings
+from prometheus_client import start_http_server
 
 logger = structlog.get_logger()
 
-# Helper to run kubectl commands
-async def run_kubectl(args, container=None, namespace=None):
-    cmd = ["kubectl"]
-    if namespace:
-        cmd.extend(["-n", namespace])
-    cmd.extend(args)
-    
-    proc = await asyncio.create_subprocess_exec(
-        *cmd, 
-        stdout=asyncio.subprocess.PIPE, 
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await proc.communicate()
-    output = stdout.decode().strip()
-    
-    # Filter out common noisy warnings
-    noise = ["Defaulted container", "Defaulting to user 'root'"]
-    lines = [l for l in output.splitlines() if not any(n in l for n in noise)]
-    clean_output = "\n".join(lines).strip()
-
-    if proc.returncode != 0:
-        raise Exception(stderr.decode() or clean_output)
-    return clean_output
 import yaml
 
 # Hardening Templates
@@ -56,6 +49,25 @@ spec:
     persistentvolumeclaims: "5"
 """
 
+# Hardening now runs concurrently with the chart install, so any container
+# without explicit resources must get defaults or the quota would reject it.
+LIMIT_RANGE_TEMPLATE = """
+apiVersion: v1
+kind: LimitRange
+metadata:
+  name: store-limits
+  namespace: {namespace}
+spec:
+  limits:
+  - type: Container
+    default:
+      cpu: "250m"
+      memory: "256Mi"
+    defaultRequest:
+      cpu: "25m"
+      memory: "64Mi"
+"""
+
 NETWORK_POLICY_TEMPLATE = """
 apiVersion: networking.k8s.io/v1
 kind: NetworkPolicy
@@ -80,6 +92,14 @@ spec:
     - namespaceSelector:
         matchLabels:
           kubernetes.io/metadata.name: {namespace}
+  - to:
+    - namespaceSelector: {{}}
+      podSelector:
+        matchLabels:
+          urumi.io/shared-db: "true"
+    ports:
+    - port: 3306
+      protocol: TCP
   - to:
     - ports:
       - port: 53
@@ -97,35 +117,140 @@ spec:
 
 async def apply_hardening(namespace: str):
     """
-    Apply ResourceQuota and NetworkPolicy to the store namespace.
+    Apply LimitRange, ResourceQuota and NetworkPolicy to the store namespace.
+    Any failure fails the applying_hardening stage: a store must not go
+    ready without its isolation.
     """
+    limits_yaml = LIMIT_RANGE_TEMPLATE.format(namespace=namespace)
     quota_yaml = RESOURCE_QUOTA_TEMPLATE.format(namespace=namespace)
     netpol_yaml = NETWORK_POLICY_TEMPLATE.format(namespace=namespace)
     
-    for manifest in [quota_yaml, netpol_yaml]:
+    for manifest in [limits_yaml, quota_yaml, netpol_yaml]:
         try:
-            # Use kubectl apply to ensure idempotency
-            await run_command_async(["kubectl", "apply", "-f", "-"], input_str=manifest)
+            # Server-side apply to ensure idempotency
+            await apply_manifest(yaml.safe_load(manifest))
         except Exception as e:
             logger.error("hardening_apply_failed", namespace=namespace, error=str(e))
+            raise
+
+@kopf.on.cleanup()
+async def close_kubernetes_clients(**kwargs):
+    await close_clients()
+
+# Background loops owned by the operator process
+_background_tasks = []
+
+# Shared (non per-store) values for the in-repo store chart. Requests fit the
+# store ResourceQuota applied by apply_hardening.
+STORE_ENGINE_VALUES = {
+    "wordpress": {
+        "resources": {"requests": {"cpu": "50m", "memory": "128Mi"}, "limits": {"cpu": "500m", "memory": "512Mi"}},
+        "persistence": {"size": "1Gi"},
+    },
+    "mysql": {
+        "resources": {"requests": {"cpu": "50m", "memory": "128Mi"}, "limits": {"cpu": "250m", "memory": "256Mi"}},
+        "storage": {"size": "1Gi"},
+    },
+    "redis": {
+        "resources": {"requests": {"cpu": "50m", "memory": "64Mi"}, "limits": {"cpu": "100m", "memory": "128Mi"}},
+    },
+}
+
+def store_engine_values() -> dict:
+    values = copy.deepcopy(STORE_ENGINE_VALUES)
+    values["mysql"]["enabled"] = settings.STORE_DB_MODE != "shared"
+    return values
+
+def store_engine_chart(engine: str) -> str:
+    # Engines without their own chart yet run on the WooCommerce stack
+    path = f"{settings.STORE_ENGINE_CHART_DIR}/{engine}"
+    return path if os.path.isdir(path) else f"{settings.STORE_ENGINE_CHART_DIR}/woocommerce"
+
+async def prefetch_charts():
+    try:
+        if settings.STORE_PROVISIONER == "manifests":
+            await render_chart(store_engine_chart("woocommerce"), store_engine_values())
+        else:
+            await ensure_wordpress_chart()
+    except Exception as e:
+        # Not fatal: the first install retries the pull / render
+        logger.error("store_chart_prefetch_failed", error=str(e))
+
+async def warm_pool_loop():
+    while True:
+        try:
+            await replenish_pool()
+        except Exception as e:
+            logger.error("pool_replenish_failed", error=str(e))
+        await asyncio.sleep(settings.WARM_POOL_CHECK_SECONDS)
+
+async def hibernation_loop():
+    while True:
+        try:
+            await check_idle_stores()
+        except Exception as e:
+            logger.error("hibernation_check_failed", error=str(e))
+        await asyncio.sleep(settings.HIBERNATION_CHECK_SECONDS)
+
+async def audit_maintenance_loop():
+    while True:
+        try:
+            await maintain_audit_logs()
+        except Exception as e:
+            logger.error("audit_maintenance_failed", error=str(e))
+        await asyncio.sleep(settings.AUDIT_MAINTENANCE_SECONDS)
+
+@kopf.on.startup()
+async def start_background_tasks(**kwargs):
+    # Scheduler (and later operator) metrics for Prometheus
+    start_http_server(settings.OPERATOR_METRICS_PORT)
+    audit_sink.start()
+    _background_tasks.append(asyncio.create_task(prefetch_charts()))
+    _background_tasks.append(asyncio.create_task(audit_maintenance_loop()))
+    if settings.WARM_POOL_SIZE > 0:
+        _background_tasks.append(asyncio.create_task(warm_pool_loop()))
+    if settings.HIBERNATION_ENABLED:
+        _background_tasks.append(asyncio.create_task(hibernation_loop()))
+
+@kopf.on.cleanup()
+async def stop_background_tasks(**kwargs):
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    # Write out buffered audit events before the process exits
+    await audit_sink.stop()
 
-async def run_command_async(cmd, input_str=None):
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdin=asyncio.subprocess.PIPE if input_str else None,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate(input=input_str.encode() if input_str else None)
-    if process.returncode != 0:
-        raise Exception(f"Command failed: {stderr.decode()}")
-    return stdout.decode()
 @kopf.on.create('stores.urumi.io')
 @kopf.on.resume('stores.urumi.io')
-async def create_store(spec, name, meta, status, **kwargs):
+async def create_store(spec, name, meta, status, patch, retry=0, **kwargs):
     """
     Operator Handler: Provision a new store.
+    Admission goes through the provisioning scheduler so bursts queue instead
+    of running N helm installs and wp-cli pipelines at once.
     """
+    labels = meta.get('labels', {})
+    store_id_str = labels.get('store_id')
+
+    # Finished stores (e.g. on operator resume) don't need a slot
+    if store_id_str:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Store.status).where(Store.id == uuid.UUID(store_id_str)))
+            if result.scalar() in ("ready", "personalizing", "hibernated", "waking"):
+                logger.info("operator_skip_ready", store=name)
+                return {"phase": "Ready", "message": "Already provisioned"}
+
+    if labels.get('urumi.io/pool') == "true":
+        priority = PRIORITY_POOL
+    elif retry or status.get('provisioning'):
+        priority = PRIORITY_RETRY
+    else:
+        priority = PRIORITY_NEW
+
+    async with scheduler.slot(labels.get('tenant', 'default'), priority):
+        return await run_provisioning(spec, name, meta, status, patch)
+
+async def run_provisioning(spec, name, meta, status, patch):
     namespace = name
     store_id_str = meta.get('labels', {}).get('store_id')
     
@@ -138,28 +263,43 @@ async def create_store(spec, name, meta, status, **kwargs):
             result = await db.execute(stmt)
             store = result.scalars().first()
         
-        if store and store.status == "ready":
+        # Claimed warm-pool stores are finished by the personalize handler;
+        # hibernated stores are brought back by the activator
+        if store and store.status in ("ready", "personalizing", "hibernated", "waking"):
             logger.info("operator_skip_ready", store=name)
             return {"phase": "Ready", "message": "Already provisioned"}
             
+        # Stages run concurrently but share one session; serialize DB writes
+        db_lock = asyncio.Lock()
+
         async def log_step(action, metadata=None):
             if not store: return
-            try:
-                log = AuditLog(
-                    action=action, 
-                    resource_type="store", 
-                    resource_id=str(store.id), 
-                    metadata_=metadata or {}
-                )
-                db.add(log)
-                await db.commit()
-            except: pass
+            # Buffered: written in batches by the audit sink, off the stage path
+            await audit_sink.emit(action, "store", str(store.id), metadata)
+
+        # Stages completed by earlier attempts on this CR (DB row and CR status)
+        cr_uid = meta.get('uid')
+        completed = completed_stages([
+            store.provisioning_stages if store else None,
+            status.get('provisioning'),
+        ], cr_uid)
+
+        async def checkpoint(stage_name):
+            record = {"uid": cr_uid, "completed": sorted(completed)}
+            patch.status['provisioning'] = record
+            if store:
+                async with db_lock:
+                    store.provisioning_stages = record
+                    await db.commit()
 
         if store:
             store.status = "provisioning"
-            store.provisioning_started_at = datetime.datetime.now(datetime.timezone.utc)
+            # A kopf retry revives a store that released its slot on failure
+            await reserve_quota(db, store, enforce=False)
+            if not completed or not store.provisioning_started_at:
+                store.provisioning_started_at = datetime.datetime.now(datetime.timezone.utc)
             await db.commit()
-            await log_step("activity.provision_started", {"crd_name": name})
+            await log_step("activity.provision_started", {"crd_name": name, "resumed_stages": sorted(completed)})
 
         try:
             engine = spec.get('engine', 'woocommerce')
@@ -173,280 +313,234 @@ async def create_store(spec, name, meta, status, **kwargs):
                 logger.error("missing_spec_passwords", store=name)
                 raise Exception("Passwords missing from Store spec")
             
-            chart_path = "oci://registry-1.docker.io/bitnamicharts/wordpress"
             release_name = name
             
             values = {
-                 "wordpressUsername": spec.get('adminUser', 'admin'),
-                 "wordpressPassword": wp_password,
-                 "wordpressEmail": f"admin@{namespace}.local",
-                 "wordpressBlogName": spec.get('name', 'My Store'),
-                 "service.type": "ClusterIP",
-                 "ingress.enabled": "true",
-                 "ingress.ingressClassName": "traefik",
-                 "ingress.hostname": f"{namespace}.{base_domain}",
-                 "mariadb.enabled": "true",
-                 "mariadb.auth.rootPassword": root_password,
-                 "mariadb.auth.password": db_password,
-                 "mariadb.primary.persistence.enabled": "true",
-                 "mariadb.primary.persistence.size": "1Gi",
-                 "mysql.enabled": "false",
-                 "resources.requests.cpu": "50m",
-                 "resources.requests.memory": "128Mi",
-                 "resources.limits.memory": "512Mi",
-                 "mariadb.primary.resources.requests.cpu": "50m",
-                 "mariadb.primary.resources.requests.memory": "128Mi",
-                 "mariadb.primary.resources.limits.memory": "256Mi",
+                "wordpressUsername": spec.get('adminUser', 'admin'),
+                "wordpressPassword": wp_password,
+                "wordpressEmail": f"admin@{namespace}.local",
+                "wordpressBlogName": spec.get('name', 'My Store'),
+                "service": {"type": "ClusterIP"},
+                "ingress": {
+                    "enabled": True,
+                    "ingressClassName": "traefik",
+                    "hostname": f"{namespace}.{base_domain}",
+                },
+                "resources": {
+                    "requests": {"cpu": "50m", "memory": "128Mi"},
+                    "limits": {"cpu": "500m", "memory": "512Mi"},
+                },
+                "mariadb": {
+                    "enabled": True,
+                    "auth": {"rootPassword": root_password, "password": db_password},
+                    "primary": {
+                        "persistence": {"enabled": True, "size": "1Gi"},
+                        "resources": {
+                            "requests": {"cpu": "50m", "memory": "128Mi"},
+                            "limits": {"cpu": "250m", "memory": "256Mi"},
+                        },
+                    },
+                },
+                "mysql": {"enabled": False},
             }
-            
-            await log_step("activity.helm_install")
-            await helm_install(
-                release_name=release_name,
-                chart_path=chart_path,
-                namespace=namespace,
-                values=values,
-                timeout=f"{settings.PROVISIONING_TIMEOUT_MINUTES}m",
-                wait=True,
-                create_namespace=True
-            )
+            shared_db = settings.STORE_DB_MODE == "shared"
+            waits = {}
+
+            async def ensure_namespace():
+                await create_namespace(namespace, labels={STORE_NAMESPACE_LABEL: "true"})
+
+            @once
+            async def tenant_database():
+                """
+                Database + user on a shared MariaDB instance. Idempotent, so a
+                resumed run re-resolves the connection details cheaply.
+                """
+                return await provision_tenant_database(
+                    namespace, uuid.UUID(store_id_str) if store_id_str else None, db_password
+                )
+
+            async def ensure_database():
+                tenant = await tenant_database()
+                await log_step("activity.tenant_database_ready", {"host": tenant["host"], "database": tenant["database"]})
+
+            async def install_chart():
+                tenant = await tenant_database() if shared_db else None
+                if settings.STORE_PROVISIONER == "manifests":
+                    db_values = {}
+                    if tenant:
+                        db_values = {"db_host": tenant["host"], "db_port": tenant["port"], "db_name": tenant["database"], "db_user": tenant["user"]}
+                    await apply_store_manifests(store_engine_chart(engine), store_engine_values(), {
+                        **db_values,
+                        "namespace": namespace,
+                        "store_id": name,
+                        "store_name": spec.get('name', 'My Store'),
+                        "host": f"{namespace}.{base_domain}",
+                        "admin_user": spec.get('adminUser', 'admin'),
+                        "admin_password": wp_password,
+                        "admin_email": f"admin@{namespace}.local",
+                        "db_password": db_password,
+                        "root_password": root_password,
+                    })
+                    return
+                if tenant:
+                    values["mariadb"] = {"enabled": False}
+                    values["externalDatabase"] = {
+                        "host": tenant["host"],
+                        "port": tenant["port"],
+                        "user": tenant["user"],
+                        "password": db_password,
+                        "database": tenant["database"],
+                    }
+                await helm_install(
+                    release_name=release_name,
+                    chart_path=await ensure_wordpress_chart(),
+                    namespace=namespace,
+                    values=values,
+                    timeout=f"{settings.PROVISIONING_TIMEOUT_MINUTES}m",
+                    wait=True,
+                    create_namespace=True
+                )
 
             # Apply Expert Hardening
-            await log_step("activity.applying_hardening")
-            await apply_hardening(namespace)
-            
-            if engine == "woocommerce":
-                await log_step("activity.configure_woocommerce")
-                
-                pod_name = ""
-                for _ in range(40):
-                    try:
-                        pod_name = await run_kubectl(["get", "pods", "-n", namespace, "-l", "app.kubernetes.io/name=wordpress", "-o", "jsonpath={.items[0].metadata.name}"])
-                        if pod_name: break
-                    except: pass
-                    await asyncio.sleep(2)
-
-                if not pod_name:
+            async def harden():
+                await apply_hardening(namespace)
+
+            @once
+            async def wordpress_pod():
+                """
+                Locate the WordPress pod and wait for wp core.
+                Resolved lazily so resumed runs skip it when no in-pod stage is left.
+                """
+                try:
+                    pod_name, waits["wordpress_pod"] = await wait_for_pod_ready(
+                        namespace, "app.kubernetes.io/name=wordpress", container="wordpress",
+                        timeout=settings.READINESS_POD_TIMEOUT_SECONDS,
+                    )
+                except WaitTimeout:
                     raise kopf.TemporaryError("Waiting for WordPress pod...", delay=10)
 
-                async def exec_wp(wp_args):
-                    return await run_kubectl(["exec", "-n", namespace, pod_name, "-c", "wordpress", "--"] + wp_args)
-
                 await log_step("activity.waiting_wp_core")
-                core_ready = False
-                for _ in range(30):
-                    try:
-                        await exec_wp(["wp", "core", "is-installed", "--allow-root"])
-                        core_ready = True
-                        break
-                    except:
-                        await asyncio.sleep(3)
-                
-                if not core_ready:
+                try:
+                    _, waits["wp_core"] = await wait_until(
+                        lambda: exec_in_pod(namespace, pod_name, ["wp", "core", "is-installed", "--allow-root"], container="wordpress"),
+                        "wp_core", timeout=settings.READINESS_PROBE_TIMEOUT_SECONDS,
+                    )
+                except WaitTimeout:
                     raise kopf.TemporaryError("WordPress core not ready yet", delay=20)
+                return pod_name
 
-                await log_step("activity.installing_plugins")
-                # Install and activate. Using install --activate to be idempotent and safe.
-                await exec_wp(["wp", "plugin", "install", "woocommerce", "--activate", "--allow-root"])
-                await exec_wp(["wp", "theme", "install", "storefront", "--activate", "--allow-root"])
-                
+            async def wordpress_exec():
+                pod_name = await wordpress_pod()
+
+                async def exec_wp(wp_args):
+                    return await exec_in_pod(namespace, pod_name, wp_args, container="wordpress")
+                return exec_wp
+
+            @once
+            async def woocommerce_exec():
                 # CRITICAL: Wait for WooCommerce to be CLI-ready (it takes time after activation)
+                exec_wp = await wordpress_exec()
                 await log_step("activity.waiting_woocommerce_api")
-                wc_ready = False
-                for _ in range(30):
-                    try:
-                        await exec_wp(["wp", "wc", "product", "list", "--format=count", "--user=admin", "--allow-root"])
-                        wc_ready = True
-                        break
-                    except:
-                        await asyncio.sleep(3)
-                
-                if not wc_ready:
-                    logger.warning("woocommerce_api_timeout", store=name)
-                    # We'll try to continue, but seeding might fail if WC tables aren't indexed yet
+                count, waits["woocommerce_api"] = await wait_until(
+                    lambda: exec_wp(["wp", "wc", "product", "list", "--format=count", "--user=admin", "--allow-root"]),
+                    "woocommerce_api", timeout=settings.READINESS_PROBE_TIMEOUT_SECONDS,
+                )
+                logger.info("woocommerce_ready", existing_products=count)
+                return exec_wp
 
-                await asyncio.sleep(5)
+            async def install_plugins():
+                # Install and activate in a single wp-cli process. Using install --activate to be idempotent and safe.
+                await run_wp_plan(await wordpress_exec(), build_plugins_plan())
 
-                await exec_wp(["wp", "wc", "tool", "run", "install_pages", "--user=admin", "--allow-root"])
-                page_ids = await exec_wp(["wp", "post", "list", "--post_type=page", "--format=ids", "--allow-root"])
-                if page_ids:
-                    for pid in page_ids.split():
-                        await exec_wp(["wp", "post", "update", pid, "--post_status=publish", "--allow-root"])
-                
-                shop_id = await exec_wp(["wp", "post", "list", "--post_type=page", "--name=shop", "--field=ID", "--allow-root"])
-                if shop_id:
-                    await exec_wp(["wp", "option", "update", "show_on_front", "page", "--allow-root"])
-                    await exec_wp(["wp", "option", "update", "page_on_front", shop_id, "--allow-root"])
+            async def configure_pages():
+                await run_wp_plan(await woocommerce_exec(), build_pages_plan())
 
-                try: await exec_wp(["wp", "post", "delete", "1", "--force", "--allow-root"])
-                except: pass
-                
-                try:
-                    widgets = await exec_wp(["wp", "widget", "list", "sidebar-1", "--format=ids", "--allow-root"])
-                    if widgets:
-                        await exec_wp(["wp", "widget", "delete"] + widgets.split() + ["--allow-root"])
-                except: pass
+            async def seed_products():
+                results = await run_wp_plan(await woocommerce_exec(), build_products_plan())
 
-                await log_step("activity.seeding_products")
-
-                # First, ensure WooCommerce CLI package is installed
-                try:
-                    await exec_wp(["wp", "package", "install", "woocommerce/woocommerce-cli:dev-main", "--allow-root"])
-                    logger.info("woocommerce_cli_installed")
-                except Exception as e:
-                    logger.info("woocommerce_cli_already_installed", error=str(e))
-
-                # Verify WooCommerce is ready before creating products
-                wc_ready = False
-                for attempt in range(30):
-                    try:
-                        count = await exec_wp(["wp", "wc", "product", "list", "--format=count", "--user=admin", "--allow-root"])
-                        wc_ready = True
-                        logger.info("woocommerce_ready", attempt=attempt, existing_products=count)
-                        break
-                    except Exception as e:
-                        logger.info("waiting_for_woocommerce", attempt=attempt, error=str(e))
-                        await asyncio.sleep(2)
-
-                if not wc_ready:
-                    raise Exception("WooCommerce not ready after 60 seconds")
-
-                # Create products with proper visibility settings
-                products = [
-                    {"name": "Premium Cotton T-Shirt", "type": "simple", "regular_price": "25", "description": "High quality cotton t-shirt", "short_description": "Comfortable everyday wear"},
-                    {"name": "Wireless Headphones", "type": "simple", "regular_price": "199", "description": "Immersive sound experience with noise cancellation", "short_description": "Premium audio quality"},
-                    {"name": "Ceramic Coffee Mug", "type": "simple", "regular_price": "15", "description": "Perfect for your morning brew", "short_description": "12oz capacity"},
-                    {"name": "Eco-Friendly Yoga Mat", "type": "simple", "regular_price": "30", "description": "Non-slip surface for yoga practice", "short_description": "Sustainable materials"},
-                    {"name": "Running Shoes", "type": "simple", "regular_price": "85", "description": "Lightweight and durable running shoes", "short_description": "Performance footwear"},
-                ]
-
-                created_count = 0
-                failed_products = []
-
-                for prod in products:
-                    try:
-                        # Check if product already exists
-                        existing = await exec_wp([
-                            "wp", "wc", "product", "list",
-                            f"--search={prod['name']}",
-                            "--format=ids",
-                            "--user=admin",
-                            "--allow-root"
-                        ])
-                        
-                        if existing.strip():
-                            logger.info("product_exists", name=prod['name'], id=existing.strip())
-                            created_count += 1
-                            continue
-                        
-                        # Create product with all required fields
-                        cmd = [
-                            "wp", "wc", "product", "create",
-                            f"--name={prod['name']}",
-                            f"--type={prod['type']}",
-                            f"--regular_price={prod['regular_price']}",
-                            f"--description={prod['description']}",
-                            f"--short_description={prod.get('short_description', '')}",
-                            "--status=publish",
-                            "--catalog_visibility=visible",
-                            "--manage_stock=false",
-                            "--user=admin",
-                            "--porcelain",
-                            "--allow-root"
-                        ]
-                        
-                        result = await exec_wp(cmd)
-                        product_id = result.strip()
-                        
-                        if product_id and product_id.isdigit():
-                            logger.info("product_created", name=prod['name'], id=product_id)
-                            created_count += 1
-                        else:
-                            logger.warning("product_create_no_id", name=prod['name'], result=result)
-                            failed_products.append(prod['name'])
-                            
-                    except Exception as e:
-                        logger.error("product_create_failed", product=prod['name'], error=str(e), error_type=type(e).__name__)
-                        failed_products.append(prod['name'])
-
-                logger.info("products_seeded", created=created_count, total=len(products), failed=failed_products)
+                created_count, failed_products = seeded_products(results)
+                logger.info("products_seeded", created=created_count, total=len(PRODUCTS), failed=failed_products)
 
                 # Fail provisioning if NO products were created
                 if created_count == 0:
-                    raise Exception(f"Failed to create any products (0/{len(products)}). WooCommerce may not be properly configured.")
+                    raise Exception(f"Failed to create any products (0/{len(PRODUCTS)}). WooCommerce may not be properly configured.")
 
                 await log_step("activity.products_created", {"count": created_count, "failed": failed_products})
 
-                php_fix = """
-if (!function_exists('WC')) {
-    include_once(ABSPATH . 'wp-content/plugins/woocommerce/woocommerce.php');
-}
-if (function_exists('WC')) {
-    $gateways = WC()->payment_gateways->get_available_payment_gateways();
-    foreach ($gateways as $id => $gateway) {
-        if ($id === 'cod') {
-            update_option('woocommerce_cod_settings', array(
-                'enabled' => 'yes', 
-                'title' => 'Cash on Delivery', 
-                'description' => 'Pay with cash upon delivery.', 
-                'instructions' => 'Pay with cash upon delivery.', 
-                'enable_for_methods' => array(), 
-                'enable_for_virtual' => 'yes'
-            ));
-            update_option('woocommerce_cod_enabled', 'yes');
-        } else {
-            update_option('woocommerce_' . $id . '_settings', array('enabled' => 'no'));
-            update_option('woocommerce_' . $id . '_enabled', 'no');
-        }
-    }
-    // Set COD as the order gateway
-    update_option('woocommerce_gateway_order', array('cod'));
-}
+            async def configure_payments():
+                results = await run_wp_plan(await woocommerce_exec(), build_payments_plan())
+                payment_errors = {k: v["error"] for k, v in results.items() if not v["ok"]}
+                if payment_errors:
+                    logger.error("payment_config_failed", error=payment_errors)
 
-try {
-    $zones = WC_Shipping_Zones::get_zones();
-    $zones[] = array('id' => 0);
-    foreach ($zones as $zone_data) {
-        $zone = new WC_Shipping_Zone($zone_data['id']);
-        $methods = $zone->get_shipping_methods();
-        $has_free = false;
-        foreach($methods as $instance_id => $method) {
-            if ($method->id === 'free_shipping') {
-                $has_free = true;
-                update_option('woocommerce_free_shipping_' . $instance_id . '_settings', array('enabled' => 'yes', 'title' => 'Free Shipping'));
-            } else {
-                $zone->delete_shipping_method($instance_id);
-            }
-        }
-        if (!$has_free) { $zone->add_shipping_method('free_shipping'); }
-        $zone->save();
-    }
-} catch (Exception $e) {}
-wc_delete_product_transients();
-"""
-                import base64
-                b64_script = base64.b64encode(php_fix.encode('utf-8')).decode('utf-8')
-                await exec_wp(["sh", "-c", f"echo {b64_script} | base64 -d > /tmp/fix_store.php"])
-                await log_step("activity.configuring_payments")
+            site_url = f"http://{namespace}.{base_domain}"
+            blog_name = spec.get('name', 'My Store')
+            admin_email = f"admin@{namespace}.local"
+
+            async def restore_template():
+                pod_name = await wordpress_pod()
+
+                async def upload(path, data):
+                    await upload_to_pod(namespace, pod_name, path, data, container="wordpress")
+
+                await restore_snapshot(
+                    snapshot, await wordpress_exec(), upload,
+                    site_url=site_url, blog_name=blog_name, admin_email=admin_email,
+                    admin_user=spec.get('adminUser', 'admin'), admin_password=wp_password,
+                )
+                await log_step("activity.snapshot_restored", {"version": snapshot["version"], "captured_at": snapshot["captured_at"]})
+
+            async def capture_template():
+                # Best effort: the first cold-provisioned store becomes the golden snapshot
                 try:
-                    # Run the shipping/gateway cleanup script
-                    await exec_wp(["wp", "eval-file", "/tmp/fix_store.php", "--allow-root"])
-                    
-                    # Explicitly enable COD via WC-CLI for absolute reliability
-                    await exec_wp(["wp", "wc", "payment_gateway", "update", "cod", "--enabled=true", "--user=admin", "--allow-root"])
-                    
-                    # Final safety check on the option
-                    await exec_wp(["wp", "option", "update", "woocommerce_cod_enabled", "yes", "--allow-root"])
+                    await capture_snapshot(engine, await wordpress_exec(), site_url, blog_name, admin_email)
                 except Exception as e:
-                    logger.error("payment_config_failed", error=str(e))
+                    logger.warning("snapshot_capture_failed", engine=engine, error=str(e))
+
+            # Quota/NetworkPolicy go in while the chart installs; pages, products
+            # and payments only need WooCommerce active, not each other.
+            stages = [
+                Stage("creating_namespace", ensure_namespace),
+                Stage("applying_hardening", harden, after=["creating_namespace"]),
+            ]
+            if shared_db:
+                stages += [
+                    Stage("provisioning_database", ensure_database),
+                    Stage("helm_install", install_chart, after=["creating_namespace", "provisioning_database"]),
+                ]
+            else:
+                stages.append(Stage("helm_install", install_chart, after=["creating_namespace"]))
+            cold_stages = ["installing_plugins", "configure_woocommerce", "seeding_products", "configuring_payments"]
+            # Stores that already started a cold configuration finish it that way
+            snapshot = load_snapshot(engine) if not completed.intersection(cold_stages) else None
+            if engine == "woocommerce" and (snapshot or "restoring_snapshot" in completed):
+                stages.append(Stage("restoring_snapshot", restore_template, after=["helm_install"]))
+            elif engine == "woocommerce":
+                stages += [
+                    Stage("installing_plugins", install_plugins, after=["helm_install"]),
+                    Stage("configure_woocommerce", configure_pages, after=["installing_plugins"]),
+                    Stage("seeding_products", seed_products, after=["installing_plugins"]),
+                    Stage("configuring_payments", configure_payments, after=["installing_plugins"]),
+                ]
+                if settings.STORE_TEMPLATES_ENABLED and not load_snapshot(engine):
+                    stages.append(Stage("capturing_snapshot", capture_template, after=cold_stages[1:]))
+
+            async def stage_started(stage_name):
+                await log_step(f"activity.{stage_name}")
 
-                await log_step("activity.configuration_completed")
+            await run_stages(stages, completed, stage_started, checkpoint, max_parallel=settings.PROVISIONING_MAX_PARALLEL_STAGES)
+
+            if engine == "woocommerce":
+                await log_step("activity.configuration_completed", {"waits_seconds": waits})
 
             if store:
                 if store.status != "ready":
                     store.status = "ready"
                     store.provisioning_completed_at = datetime.datetime.now(datetime.timezone.utc)
+                if store.pool_state == POOL_WARMING:
+                    store.pool_state = POOL_AVAILABLE
                 
-                store.storefront_url = f"http://{namespace}.{base_domain}"
+                store.storefront_url = site_url
                 store.admin_url = f"http://{namespace}.{base_domain}/wp-admin"
                 store.admin_password = wp_password
                 await db.commit()
@@ -459,24 +553,106 @@ wc_delete_product_transients();
             
             return {"phase": "Ready", "url": f"http://{namespace}.{base_domain}", "message": "Store provisioned successfully"}
 
+        except kopf.TemporaryError:
+            # Still coming up (pod / wp core not ready): kopf retries with the
+            # stage's own delay; the store keeps its status and quota slot
+            raise
         except Exception as e:
-            logger.error("operator_failed", error=str(e))
+            logger.error("operator_failed", error=str(e), completed_stages=sorted(completed))
             if store:
                 store.status = "failed"
                 store.error_message = str(e)
+                await release_quota(db, store.id)
                 await db.commit()
             
             if "timed out" in str(e).lower() or "timeout" in str(e).lower():
                 await log_step("system.timeout.triggered", {"error": str(e)})
             
+            # Retries resume after the last checkpointed stage
             raise kopf.TemporaryError(f"Provisioning failed: {e}", delay=60)
 
+@kopf.on.update('stores.urumi.io', field='spec.personalize')
+async def personalize_store(spec, name, meta, **kwargs):
+    """
+    Operator Handler: Hand a claimed warm-pool store to its new owner.
+    The store is already running; only the store-specific values change.
+    """
+    namespace = name
+    store_id_str = meta.get('labels', {}).get('store_id')
+    personalize = spec.get('personalize') or {}
+    if not personalize:
+        return
+
+    logger.info("operator_personalize_event", store=name, store_id=store_id_str)
+
+    async with AsyncSessionLocal() as db:
+        store = None
+        if store_id_str:
+            result = await db.execute(select(Store).where(Store.id == uuid.UUID(store_id_str)))
+            store = result.scalars().first()
+
+        async def log_step(action, metadata=None):
+            if not store: return
+            await audit_sink.emit(action, "store", str(store.id), metadata)
+
+        try:
+            await log_step("activity.personalizing", {"crd_name": name})
+            pod_name, waited = await wait_for_pod_ready(
+                namespace, "app.kubernetes.io/name=wordpress", container="wordpress",
+                timeout=settings.READINESS_POD_TIMEOUT_SECONDS,
+            )
+
+            async def exec_wp(wp_args):
+                return await exec_in_pod(namespace, pod_name, wp_args, container="wordpress")
+
+            plan = (
+                WpPlan("personalize")
+                .cli("blogname", ["option", "update", "blogname", personalize.get('name', 'My Store')])
+                .cli("admin_user", ["user", "update", spec.get('adminUser', 'admin'), f"--user_pass={personalize['adminPassword']}", "--skip-email"])
+                .cli("flush_cache", ["cache", "flush"], optional=True)
+            )
+            await run_wp_plan(exec_wp, plan)
+
+            if store:
+                store.status = "ready"
+                await reserve_quota(db, store, enforce=False)
+                store.admin_password = personalize['adminPassword']
+                store.provisioning_completed_at = datetime.datetime.now(datetime.timezone.utc)
+                await db.commit()
+                await log_step("activity.completed", {
+                    "url": store.storefront_url,
+                    "admin_user": "admin",
+                    "warm_pool": True,
+                    "completed_at": store.provisioning_completed_at.isoformat()
+                })
+
+        except Exception as e:
+            logger.error("operator_personalize_failed", error=str(e))
+            if store:
+                store.status = "failed"
+                store.error_message = str(e)
+                await release_quota(db, store.id)
+                await db.commit()
+            raise kopf.TemporaryError(f"Personalization failed: {e}", delay=30)
+
 @kopf.on.delete('stores.urumi.io')
 async def delete_store(spec, name, **kwargs):
     namespace = name
     logger.info("operator_delete_event", store=name)
     try:
-        await helm_uninstall(namespace, namespace)
+        # Shared-tenancy stores only own a database on the shared instance
+        await drop_tenant_database(namespace)
+    except Exception as e:
+        logger.error("tenant_database_drop_failed", store=name, error=str(e))
+    try:
+        # A hibernated store's hosts are routed through the activator
+        await remove_activator_route(namespace)
+    except Exception as e:
+        logger.error("activator_route_cleanup_failed", store=name, error=str(e))
+    try:
+        if settings.STORE_PROVISIONER == "helm":
+            await helm_uninstall(namespace, namespace)
+        # Namespace deletion removes every applied store object
         await delete_namespace(namespace)
     except Exception as e:
         logger.error("delete_failed", error=str(e))
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, Optional, Set
+import structlog
+
+logger = structlog.get_logger()
+
+class Stage:
+    """
+    A named provisioning step. Completed stages are checkpointed so retries
+    and operator restarts resume after the last successful stage. `after`
+    lists the stages that must complete before this one may start.
+    """
+    def __init__(self, name: str, fn: Callable[[], Awaitable[None]], after: Optional[List[str]] = None):
+        self.name = name
+        self.fn = fn
+        self.after = after or []
+
+async def run_stages(
+    stages: List[Stage],
+    completed: Set[str],
+    on_start: Callable[[str], Awaitable[None]],
+    on_complete: Callable[[str], Awaitable[None]],
+    max_parallel: int = 1,
+) -> None:
+    """
+    Run the stage graph, starting each stage as soon as its dependencies are
+    in `completed` and running at most `max_parallel` stages at once.
+    Stages already in `completed` are skipped. On failure no new stages are
+    started; stages in flight finish (and checkpoint) before the first error
+    is raised.
+    """
+    pending = {}
+    for stage in stages:
+        if stage.name in completed:
+            logger.info("stage_skipped", stage=stage.name)
+        else:
+            pending[stage.name] = stage
+
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+    running = {}
+    errors = []
+
+    async def run(stage: Stage):
+        async with semaphore:
+            await on_start(stage.name)
+            await stage.fn()
+        completed.add(stage.name)
+        await on_complete(stage.name)
+
+    while pending or running:
+        if not errors:
+            for stage in [s for s in pending.values() if all(dep in completed for dep in s.after)]:
+                del pending[stage.name]
+                running[asyncio.ensure_future(run(stage))] = stage
+
+        if not running:
+            if errors:
+                break
+            raise Exception(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            stage = running.pop(task)
+            if task.exception():
+                logger.error("stage_failed", stage=stage.name, error=str(task.exception()))
+                errors.append(task.exception())
+
+    if errors:
+        raise errors[0]
+
+def completed_stages(checkpoints: Iterable[dict], uid: str) -> Set[str]:
+    """
+    Merge checkpoint records (DB row, CR status) that belong to this CR instance.
+    A re-created CR (new uid) carries new credentials and starts from scratch.
+    """
+    completed = set()
+    for checkpoint in checkpoints:
+        if checkpoint and checkpoint.get("uid") == uid:
+            completed.update(checkpoint.get("completed", []))
+    return completed
+
+def once(fn: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+    """
+    Memoize an async prerequisite (pod lookup, readiness wait) so it runs at
+    most once per handler invocation, and only if a stage needs it.
+    """
+    task = None
+    async def wrapper():
+        nonlocal task
+        if task is None:
+            task = asyncio.ensure_future(fn())
+        return await task
+    return wrapper
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import structlog
+from kubernetes_asyncio import client, watch
+from kubernetes_asyncio.client.rest import ApiException
+from app.services.kubernetes import get_api_client
+
+logger = structlog.get_logger()
+
+class WaitTimeout(Exception):
+    pass
+
+def _pod_ready(pod, container: Optional[str] = None) -> bool:
+    if pod.metadata.deletion_timestamp or not pod.status or pod.status.phase != "Running":
+        return False
+    statuses = pod.status.container_statuses or []
+    if container:
+        statuses = [s for s in statuses if s.name == container]
+    return bool(statuses) and all(s.ready for s in statuses)
+
+async def wait_for_pod_ready(
+    namespace: str,
+    label_selector: str,
+    container: Optional[str] = None,
+    timeout: float = 120,
+) -> Tuple[str, float]:
+    """
+    Wait until a pod matching the selector is Running with ready containers.
+    Lists once, then follows a watch stream so the wait ends on the event that
+    makes the pod ready. Returns (pod_name, seconds_waited).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    core = client.CoreV1Api(await get_api_client())
+
+    while True:
+        remaining = timeout - (loop.time() - started)
+        if remaining <= 0:
+            raise WaitTimeout(f"Timed out after {timeout}s waiting for pod '{label_selector}' in {namespace}")
+
+        pods = await core.list_namespaced_pod(namespace, label_selector=label_selector)
+        for pod in pods.items:
+            if _pod_ready(pod, container):
+                return pod.metadata.name, _report("pod_ready", started, namespace=namespace, pod=pod.metadata.name)
+
+        # Watches expire server-side; re-list and resume until the deadline
+        try:
+            async with watch.Watch().stream(
+                core.list_namespaced_pod, namespace,
+                label_selector=label_selector,
+                resource_version=pods.metadata.resource_version,
+                timeout_seconds=max(1, int(min(remaining, 60))),
+            ) as stream:
+                async for event in stream:
+                    pod = event["object"]
+                    if event["type"] in ("ADDED", "MODIFIED") and _pod_ready(pod, container):
+                        return pod.metadata.name, _report("pod_ready", started, namespace=namespace, pod=pod.metadata.name)
+        except ApiException as e:
+            # 410 Gone: resource version expired, fall through to a fresh list
+            if e.status != 410:
+                raise
+
+async def wait_until(
+    probe: Callable[[], Awaitable[Any]],
+    name: str,
+    timeout: float = 90,
+    initial_delay: float = 0.5,
+    max_delay: float = 5.0,
+    factor: float = 1.6,
+) -> Tuple[Any, float]:
+    """
+    Call `probe` until it stops raising, backing off exponentially between
+    attempts. Returns (probe_result, seconds_waited).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    delay = initial_delay
+    attempt = 0
+
+    while True:
+        attempt += 1
+        try:
+            result = await probe()
+            return result, _report(name, started, attempts=attempt)
+        except Exception as e:
+            last_error = e
+
+        elapsed = loop.time() - started
+        if elapsed + delay > timeout:
+            raise WaitTimeout(f"Timed out after {round(elapsed, 1)}s waiting for {name}: {last_error}")
+        logger.debug("wait_retry", wait=name, attempt=attempt, delay=round(delay, 2), error=str(last_error))
+        await asyncio.sleep(delay)
+        delay = min(delay * factor, max_delay)
+
+def _report(name: str, started: float, **fields) -> float:
+    waited = round(asyncio.get_running_loop().time() - started, 2)
+    logger.info("wait_completed", wait=name, seconds=waited, **fields)
+    return waited
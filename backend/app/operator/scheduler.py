@@ -0,0 +1,121 @@
+import asyncio
+import collections
+import contextlib
+from typing import Deque, Dict
+import structlog
+from prometheus_client import Gauge, Histogram
+from app.config import settings
+
+logger = structlog.get_logger()
+
+# Lower value = served first
+PRIORITY_NEW = 0
+PRIORITY_RETRY = 1
+PRIORITY_POOL = 2
+PRIORITY_NAMES = {PRIORITY_NEW: "new", PRIORITY_RETRY: "retry", PRIORITY_POOL: "pool_refill"}
+
+QUEUE_DEPTH = Gauge("urumi_provisioning_queue_depth", "Provisioning requests waiting for a slot", ["priority"])
+RUNNING = Gauge("urumi_provisioning_running", "Provisioning requests holding a slot")
+QUEUE_WAIT = Histogram(
+    "urumi_provisioning_queue_wait_seconds", "Time spent waiting for a provisioning slot", ["priority"],
+    buckets=(0.1, 1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+
+class ProvisioningScheduler:
+    """
+    Admission control for the operator's provisioning handler.
+
+    At most `max_concurrent` stores provision at once. Waiters are served by
+    priority class first; within a class, the tenant with the fewest running
+    provisions goes next, with round-robin between equals, so one tenant's
+    burst cannot starve the others.
+    """
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.running = 0
+        self.running_by_tenant: Dict[str, int] = collections.Counter()
+        # priority -> tenant -> waiters (in arrival order)
+        self.waiting: Dict[int, "collections.OrderedDict[str, Deque[asyncio.Future]]"] = collections.defaultdict(collections.OrderedDict)
+
+    def depth(self, priority: int) -> int:
+        return sum(len(q) for q in self.waiting[priority].values())
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant: str, priority: int = PRIORITY_NEW):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        label = PRIORITY_NAMES.get(priority, str(priority))
+
+        if self.running < self.max_concurrent and not any(self.waiting.values()):
+            self._grant(tenant)
+        else:
+            future = loop.create_future()
+            self.waiting[priority].setdefault(tenant, collections.deque()).append(future)
+            QUEUE_DEPTH.labels(priority=label).set(self.depth(priority))
+            logger.info("provisioning_queued", tenant=tenant, priority=label, running=self.running, queued=self.depth(priority))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Slot was granted just as we were cancelled; hand it on
+                    self._release(tenant)
+                else:
+                    self._discard(priority, tenant, future)
+                raise
+            finally:
+                QUEUE_DEPTH.labels(priority=label).set(self.depth(priority))
+
+        waited = loop.time() - started
+        QUEUE_WAIT.labels(priority=label).observe(waited)
+        logger.info("provisioning_admitted", tenant=tenant, priority=label, waited_seconds=round(waited, 2), running=self.running)
+        try:
+            yield waited
+        finally:
+            self._release(tenant)
+
+    def _grant(self, tenant: str):
+        self.running += 1
+        self.running_by_tenant[tenant] += 1
+        RUNNING.set(self.running)
+
+    def _release(self, tenant: str):
+        self.running -= 1
+        self.running_by_tenant[tenant] -= 1
+        if self.running_by_tenant[tenant] <= 0:
+            del self.running_by_tenant[tenant]
+        RUNNING.set(self.running)
+        self._dispatch()
+
+    def _discard(self, priority: int, tenant: str, future: asyncio.Future):
+        queue = self.waiting[priority].get(tenant)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self.waiting[priority][tenant]
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            picked = self._next()
+            if picked is None:
+                return
+            tenant, future = picked
+            self._grant(tenant)
+            future.set_result(None)
+
+    def _next(self):
+        for priority in sorted(self.waiting):
+            tenants = self.waiting[priority]
+            if not tenants:
+                continue
+            # Fewest running first; OrderedDict order breaks ties round-robin
+            tenant = min(tenants, key=lambda t: self.running_by_tenant.get(t, 0))
+            queue = tenants.pop(tenant)
+            future = queue.popleft()
+            if queue:
+                tenants[tenant] = queue  # re-append: back of the round-robin line
+            if future.cancelled():
+                return self._next()
+            return tenant, future
+        return None
+
+scheduler = ProvisioningScheduler(settings.PROVISIONING_MAX_CONCURRENT)
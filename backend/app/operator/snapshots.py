@@ -0,0 +1,154 @@
+import asyncio
+import base64
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+import structlog
+from app.config import settings
+from app.operator.wpcli import WpPlan, run_wp_plan
+
+logger = structlog.get_logger()
+
+# Bitnami WordPress keeps persisted content under /bitnami/wordpress
+CONTENT_ROOT = "/bitnami/wordpress"
+DB_FILE = "db.sql.gz"
+CONTENT_FILE = "wp-content.tar.gz"
+MANIFEST_FILE = "manifest.json"
+
+# Oldest administrator: the account the golden install was set up with
+ADMIN_LOOKUP = ["wp", "user", "list", "--role=administrator", "--field=user_login", "--orderby=ID", "--order=ASC", "--number=1", "--allow-root"]
+
+# The golden admin takes the store's admin login. user_login cannot be changed
+# through wp-cli, so it is renamed in place.
+RENAME_ADMIN_PHP = """
+global $wpdb;
+$user = get_user_by('login', $args['from']);
+if (!$user) {
+    throw new Exception('Golden admin not found: ' . $args['from']);
+}
+$wpdb->update($wpdb->users, array('user_login' => $args['to'], 'user_nicename' => sanitize_title($args['to'])), array('ID' => $user->ID));
+clean_user_cache($user);
+return (string) $user->ID;
+"""
+
+ExecFn = Callable[[List[str]], Awaitable[str]]
+UploadFn = Callable[[str, bytes], Awaitable[None]]
+
+_capture_lock = asyncio.Lock()
+
+def snapshot_dir(engine: str) -> Path:
+    return Path(settings.STORE_TEMPLATE_DIR) / f"{engine}-{settings.STORE_TEMPLATE_VERSION}"
+
+def load_snapshot(engine: str) -> Optional[Dict]:
+    """
+    Return the golden snapshot manifest for an engine, or None if no complete
+    snapshot exists for the configured template version.
+    """
+    if not settings.STORE_TEMPLATES_ENABLED:
+        return None
+    path = snapshot_dir(engine)
+    try:
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("engine") != engine or manifest.get("version") != settings.STORE_TEMPLATE_VERSION:
+        return None
+    if not all((path / f).exists() for f in (DB_FILE, CONTENT_FILE)):
+        return None
+    manifest["path"] = str(path)
+    return manifest
+
+async def capture_snapshot(engine: str, exec_wp: ExecFn, site_url: str, blog_name: str, admin_email: str) -> Optional[Dict]:
+    """
+    Export a fully configured store (database + wp-content) as the golden
+    snapshot for this engine version. A no-op if one already exists.
+    """
+    async with _capture_lock:
+        existing = load_snapshot(engine)
+        if existing:
+            return existing
+
+        db_b64 = await exec_wp(["sh", "-c", "wp db export - --allow-root | gzip -c | base64 -w0"])
+        content_b64 = await exec_wp(["sh", "-c", f"tar czf - -C {CONTENT_ROOT} wp-content | base64 -w0"])
+        admin_user = await _golden_admin(exec_wp)
+        files = {DB_FILE: base64.b64decode(db_b64), CONTENT_FILE: base64.b64decode(content_b64)}
+
+        manifest = {
+            "engine": engine,
+            "version": settings.STORE_TEMPLATE_VERSION,
+            "site_url": site_url,
+            "blog_name": blog_name,
+            "admin_email": admin_email,
+            "admin_user": admin_user,
+            "captured_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "sha256": {name: hashlib.sha256(data).hexdigest() for name, data in files.items()},
+            "bytes": {name: len(data) for name, data in files.items()},
+        }
+
+        # Write into a scratch dir and rename so readers never see a partial snapshot
+        final = snapshot_dir(engine)
+        scratch = final.with_name(final.name + ".tmp")
+        shutil.rmtree(scratch, ignore_errors=True)
+        scratch.mkdir(parents=True)
+        for name, data in files.items():
+            (scratch / name).write_bytes(data)
+        (scratch / MANIFEST_FILE).write_text(json.dumps(manifest))
+        shutil.rmtree(final, ignore_errors=True)
+        os.rename(scratch, final)
+
+        logger.info("snapshot_captured", engine=engine, version=settings.STORE_TEMPLATE_VERSION, bytes=manifest["bytes"])
+        manifest["path"] = str(final)
+        return manifest
+
+async def restore_snapshot(
+    snapshot: Dict,
+    exec_wp: ExecFn,
+    upload: UploadFn,
+    site_url: str,
+    blog_name: str,
+    admin_email: str,
+    admin_user: str,
+    admin_password: str,
+) -> Dict:
+    """
+    Bulk-restore the golden database and wp-content into a fresh store, then
+    rewrite the store-specific values (URL, blog name, admin credentials).
+    The golden admin account becomes `admin_user`, whatever its golden login.
+    """
+    path = Path(snapshot["path"])
+    for name in (DB_FILE, CONTENT_FILE):
+        await upload(f"/tmp/urumi-{name}", (path / name).read_bytes())
+
+    await exec_wp(["sh", "-c", f"gunzip -c /tmp/urumi-{DB_FILE} | wp db import - --allow-root"])
+    await exec_wp(["sh", "-c", f"tar xzf /tmp/urumi-{CONTENT_FILE} -C {CONTENT_ROOT} && rm -f /tmp/urumi-{DB_FILE} /tmp/urumi-{CONTENT_FILE}"])
+
+    # Snapshots captured before the login was recorded: find it by role
+    golden_admin = snapshot.get("admin_user") or await _golden_admin(exec_wp) or admin_user
+
+    plan = WpPlan("personalize")
+    if snapshot["site_url"] != site_url:
+        plan.cli("search_replace_url", ["search-replace", snapshot["site_url"], site_url, "--all-tables", "--skip-columns=guid"])
+    (
+        plan
+        .cli("blogname", ["option", "update", "blogname", blog_name])
+        .cli("admin_email", ["option", "update", "admin_email", admin_email])
+        .cli("admin_user", ["user", "update", golden_admin, f"--user_pass={admin_password}", f"--user_email={admin_email}", "--skip-email"])
+    )
+    if golden_admin != admin_user:
+        plan.php("rename_admin", RENAME_ADMIN_PHP, {"from": golden_admin, "to": admin_user})
+    (
+        plan
+        .cli("flush_rewrite", ["rewrite", "flush"], optional=True)
+        .cli("flush_transients", ["transient", "delete", "--all"], optional=True)
+        .cli("flush_cache", ["cache", "flush"], optional=True)
+    )
+    # The runner logs in as the golden admin; the rename does not affect it
+    return await run_wp_plan(exec_wp, plan, user=golden_admin)
+
+async def _golden_admin(exec_wp: ExecFn) -> Optional[str]:
+    lines = (await exec_wp(ADMIN_LOOKUP)).strip().splitlines()
+    return lines[-1].strip() if lines else None
@@ -0,0 +1,154 @@
+from app.operator.wpcli import WpPlan
+
+# Sample catalogue seeded into every new store
+PRODUCTS = [
+    {"name": "Premium Cotton T-Shirt", "type": "simple", "regular_price": "25", "description": "High quality cotton t-shirt", "short_description": "Comfortable everyday wear"},
+    {"name": "Wireless Headphones", "type": "simple", "regular_price": "199", "description": "Immersive sound experience with noise cancellation", "short_description": "Premium audio quality"},
+    {"name": "Ceramic Coffee Mug", "type": "simple", "regular_price": "15", "description": "Perfect for your morning brew", "short_description": "12oz capacity"},
+    {"name": "Eco-Friendly Yoga Mat", "type": "simple", "regular_price": "30", "description": "Non-slip surface for yoga practice", "short_description": "Sustainable materials"},
+    {"name": "Running Shoes", "type": "simple", "regular_price": "85", "description": "Lightweight and durable running shoes", "short_description": "Performance footwear"},
+]
+
+PUBLISH_PAGES_PHP = """
+$ids = get_posts(array('post_type' => 'page', 'post_status' => 'any', 'numberposts' => -1, 'fields' => 'ids'));
+foreach ($ids as $id) {
+    wp_update_post(array('ID' => $id, 'post_status' => 'publish'));
+}
+$shop = get_page_by_path('shop');
+if ($shop) {
+    update_option('show_on_front', 'page');
+    update_option('page_on_front', $shop->ID);
+}
+return implode(' ', $ids);
+"""
+
+DELETE_WIDGETS_PHP = """
+$ids = WP_CLI::runcommand('widget list sidebar-1 --format=ids', array('return' => true, 'exit_error' => false, 'launch' => false));
+if (trim($ids) !== '') {
+    WP_CLI::runcommand('widget delete ' . trim($ids), array('return' => true, 'exit_error' => false, 'launch' => false));
+}
+return trim($ids);
+"""
+
+# Idempotent: an existing product with the same name counts as seeded
+SEED_PRODUCT_PHP = """
+$existing = wc_get_products(array('name' => $args['name'], 'limit' => 1, 'return' => 'ids'));
+if (!empty($existing)) {
+    return 'exists:' . $existing[0];
+}
+$product = new WC_Product_Simple();
+$product->set_name($args['name']);
+$product->set_regular_price($args['regular_price']);
+$product->set_description($args['description']);
+$product->set_short_description($args['short_description']);
+$product->set_status('publish');
+$product->set_catalog_visibility('visible');
+$product->set_manage_stock(false);
+$id = $product->save();
+if (!$id) {
+    throw new Exception('Product save returned no ID');
+}
+return (string) $id;
+"""
+
+PAYMENTS_FIX_PHP = """
+if (!function_exists('WC')) {
+    include_once(ABSPATH . 'wp-content/plugins/woocommerce/woocommerce.php');
+}
+if (function_exists('WC')) {
+    $gateways = WC()->payment_gateways->get_available_payment_gateways();
+    foreach ($gateways as $id => $gateway) {
+        if ($id === 'cod') {
+            update_option('woocommerce_cod_settings', array(
+                'enabled' => 'yes',
+                'title' => 'Cash on Delivery',
+                'description' => 'Pay with cash upon delivery.',
+                'instructions' => 'Pay with cash upon delivery.',
+                'enable_for_methods' => array(),
+                'enable_for_virtual' => 'yes'
+            ));
+            update_option('woocommerce_cod_enabled', 'yes');
+        } else {
+            update_option('woocommerce_' . $id . '_settings', array('enabled' => 'no'));
+            update_option('woocommerce_' . $id . '_enabled', 'no');
+        }
+    }
+    // Set COD as the order gateway
+    update_option('woocommerce_gateway_order', array('cod'));
+}
+
+try {
+    $zones = WC_Shipping_Zones::get_zones();
+    $zones[] = array('id' => 0);
+    foreach ($zones as $zone_data) {
+        $zone = new WC_Shipping_Zone($zone_data['id']);
+        $methods = $zone->get_shipping_methods();
+        $has_free = false;
+        foreach($methods as $instance_id => $method) {
+            if ($method->id === 'free_shipping') {
+                $has_free = true;
+                update_option('woocommerce_free_shipping_' . $instance_id . '_settings', array('enabled' => 'yes', 'title' => 'Free Shipping'));
+            } else {
+                $zone->delete_shipping_method($instance_id);
+            }
+        }
+        if (!$has_free) { $zone->add_shipping_method('free_shipping'); }
+        $zone->save();
+    }
+} catch (Exception $e) {}
+wc_delete_product_transients();
+"""
+
+def build_plugins_plan() -> WpPlan:
+    """
+    Plugin/theme installation. Runs in its own process because WooCommerce
+    only registers its CLI commands on the next WordPress bootstrap.
+    """
+    return (
+        WpPlan("plugins")
+        .cli("plugin_woocommerce", ["plugin", "install", "woocommerce", "--activate"])
+        .cli("theme_storefront", ["theme", "install", "storefront", "--activate"])
+        .cli("package_wc_cli", ["package", "install", "woocommerce/woocommerce-cli:dev-main"], optional=True)
+    )
+
+def build_pages_plan() -> WpPlan:
+    """
+    WooCommerce pages, shop as front page, and removal of WordPress sample content.
+    """
+    return (
+        WpPlan("pages")
+        .cli("install_pages", ["wc", "tool", "run", "install_pages"])
+        .php("publish_pages", PUBLISH_PAGES_PHP)
+        .cli("delete_sample_post", ["post", "delete", "1", "--force"], optional=True)
+        .php("delete_widgets", DELETE_WIDGETS_PHP, optional=True)
+    )
+
+def build_products_plan() -> WpPlan:
+    plan = WpPlan("products")
+    for prod in PRODUCTS:
+        plan.php(f"product:{prod['name']}", SEED_PRODUCT_PHP, args=prod, optional=True)
+    return plan
+
+def build_payments_plan() -> WpPlan:
+    """
+    Cash on Delivery as the only gateway, free shipping in every zone.
+    """
+    return (
+        WpPlan("payments")
+        .php("payments_fix", PAYMENTS_FIX_PHP, optional=True)
+        .cli("payments_enable_cod", ["wc", "payment_gateway", "update", "cod", "--enabled=true"], optional=True)
+        .cli("payments_cod_option", ["option", "update", "woocommerce_cod_enabled", "yes"], optional=True)
+    )
+
+def seeded_products(results: dict) -> tuple:
+    """
+    Split product step results into (created_count, failed_names).
+    """
+    created, failed = 0, []
+    for prod in PRODUCTS:
+        res = results.get(f"product:{prod['name']}")
+        if res and res["ok"]:
+            created += 1
+        else:
+            failed.append(prod["name"])
+    return created, failed
@@ -0,0 +1,114 @@
+import base64
+import json
+import shlex
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+RESULT_MARKER = "__URUMI_WP_PLAN__"
+
+class WpPlanError(Exception):
+    def __init__(self, message: str, results: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.results = results or []
+
+# Executed once per plan through `wp eval-file -`. Every step shares the same
+# WordPress bootstrap; per-step results are echoed as one JSON line after the marker.
+PLAN_RUNNER = r"""<?php
+$__plan = json_decode(base64_decode('__PLAN__'), true);
+$__results = array();
+foreach ($__plan as $__step) {
+    $__started = microtime(true);
+    $__result = array('name' => $__step['name'], 'ok' => false, 'output' => '', 'error' => '');
+    if ($__step['kind'] === 'cli') {
+        $__run = WP_CLI::runcommand($__step['command'], array(
+            'return' => 'all',
+            'exit_error' => false,
+            'launch' => false,
+        ));
+        $__result['ok'] = $__run->return_code === 0;
+        $__result['output'] = trim($__run->stdout);
+        $__result['error'] = trim($__run->stderr);
+    } else {
+        $args = $__step['args'];
+        ob_start();
+        try {
+            $__value = eval($__step['php']);
+            $__result['ok'] = true;
+            if ($__value !== null) { $__result['output'] = (string) $__value; }
+        } catch (Throwable $__e) {
+            $__result['error'] = $__e->getMessage();
+        }
+        $__buffer = trim(ob_get_clean());
+        if ($__result['output'] === '' && $__buffer !== '') { $__result['output'] = $__buffer; }
+    }
+    $__result['duration_ms'] = (int) round((microtime(true) - $__started) * 1000);
+    $__results[] = $__result;
+    if (!$__result['ok'] && !$__step['optional']) { break; }
+}
+echo "\n__MARKER__" . json_encode($__results) . "\n";
+"""
+
+class WpPlan:
+    """
+    An ordered list of wp-cli commands and PHP snippets executed in a single
+    wp-cli process inside the WordPress pod.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: List[Dict[str, Any]] = []
+
+    def cli(self, name: str, args: List[str], optional: bool = False) -> "WpPlan":
+        """
+        Add a wp-cli command, e.g. ["plugin", "install", "woocommerce"].
+        Global flags (--allow-root, --user) are set once on the runner.
+        """
+        self.steps.append({"name": name, "kind": "cli", "command": shlex.join(args), "optional": optional})
+        return self
+
+    def php(self, name: str, code: str, args: Optional[Dict[str, Any]] = None, optional: bool = False) -> "WpPlan":
+        """
+        Add a PHP snippet. `$args` is available inside the snippet and its
+        return value (if any) becomes the step output.
+        """
+        self.steps.append({"name": name, "kind": "php", "php": code, "args": args or {}, "optional": optional})
+        return self
+
+    def render(self) -> str:
+        plan_b64 = base64.b64encode(json.dumps(self.steps).encode("utf-8")).decode("ascii")
+        return PLAN_RUNNER.replace("__PLAN__", plan_b64).replace("__MARKER__", RESULT_MARKER)
+
+    def command(self, user: str = "admin") -> List[str]:
+        """
+        Shell command that ships the rendered runner into the pod and executes it.
+        """
+        script_b64 = base64.b64encode(self.render().encode("utf-8")).decode("ascii")
+        return ["sh", "-c", f"echo {script_b64} | base64 -d | wp eval-file - --allow-root --user={shlex.quote(user)}"]
+
+def parse_plan_output(output: str) -> List[Dict[str, Any]]:
+    for line in reversed(output.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise WpPlanError(f"No plan result found in wp-cli output: {output[-500:]}")
+
+async def run_wp_plan(exec_fn: Callable[[List[str]], Awaitable[str]], plan: WpPlan, user: str = "admin") -> Dict[str, Dict[str, Any]]:
+    """
+    Run a plan with a single exec and return results keyed by step name.
+    Raises WpPlanError if a required step failed.
+    """
+    output = await exec_fn(plan.command(user=user))
+    results = parse_plan_output(output)
+
+    for res in results:
+        log = logger.info if res["ok"] else logger.warning
+        log("wp_plan_step", plan=plan.name, step=res["name"], ok=res["ok"], duration_ms=res.get("duration_ms"), error=res.get("error") or None)
+
+    failed = [r for r in results if not r["ok"] and not _is_optional(plan, r["name"])]
+    if failed:
+        raise WpPlanError(f"wp plan '{plan.name}' failed at step '{failed[0]['name']}': {failed[0]['error']}", results)
+
+    return {r["name"]: r for r in results}
+
+def _is_optional(plan: WpPlan, step_name: str) -> bool:
+    return any(s["name"] == step_name and s["optional"] for s in plan.steps)
@@ -32,12 +32,37 @@ class StoreResponse(StoreBase):
     updated_at: datetime
     provisioning_started_at: Optional[datetime] = None
     provisioning_completed_at: Optional[datetime] = None
+    last_activity_at: Optional[datetime] = None
+    hibernated_at: Optional[datetime] = None
     provisioning_timeline: Optional[List[dict]] = None
     activity_log: Optional[List[dict]] = None
 
     class Config:
         from_attributes = True
 
+# --- Batch Models ---
+
+class StoreBatchCreate(BaseModel):
+    # Items are validated one by one so a bad entry only fails itself
+    stores: List[dict] = Field(..., min_length=1)
+
+class StoreBatchDelete(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1)
+
+class StoreBatchItem(BaseModel):
+    index: int
+    # created, claimed, waiting_capacity, deleting | invalid, quota_exceeded,
+    # capacity_exceeded, not_found, already_deleting
+    result: str
+    store_id: Optional[uuid.UUID] = None
+    store: Optional[StoreResponse] = None
+    error: Optional[str] = None
+
+class StoreBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[StoreBatchItem]
+
 class StoreUpdate(BaseModel):
     pass # Currently only status updates happen internally
 
@@ -0,0 +1,154 @@
+import datetime
+import re
+from typing import List, Tuple
+import structlog
+from sqlalchemy import text
+from app.config import settings
+
+logger = structlog.get_logger()
+
+# audit_logs is range-partitioned by created_at, one partition per month,
+# plus a default partition so an insert never fails for lack of a range.
+DEFAULT_PARTITION = "audit_logs_default"
+
+_IS_PARTITIONED = text(
+    "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs')"
+)
+_PARTITIONS = text("""
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'audit_logs'::regclass
+""")
+_UPPER_BOUND = re.compile(r"TO \('(\d{4}-\d{2}-\d{2})")
+
+# Folds the activity.* steps of one store into a single activity.summary row
+_COMPACT_STORE = text("""
+    WITH moved AS (
+        DELETE FROM audit_logs
+        WHERE store_id = :store_id AND category = 'activity'
+          AND action <> 'activity.summary'
+          AND created_at < :cutoff
+        RETURNING action, created_at, metadata
+    )
+    INSERT INTO audit_logs (action, category, resource_type, resource_id, store_id, metadata, created_at)
+    SELECT 'activity.summary', 'activity', 'store', :resource_id, :store_id,
+           jsonb_build_object(
+               'count', count(*),
+               'steps', jsonb_agg(jsonb_build_object('action', action, 'at', created_at, 'metadata', metadata) ORDER BY created_at)
+           ),
+           max(created_at)
+    FROM moved
+    HAVING count(*) > 0
+""")
+# Stores whose provisioning history is settled: ready/hibernated, or deleted
+_COMPACTABLE = text("""
+    SELECT DISTINCT a.store_id
+    FROM audit_logs a
+    LEFT JOIN stores s ON s.id = a.store_id
+    WHERE a.store_id IS NOT NULL AND a.category = 'activity'
+      AND a.action <> 'activity.summary'
+      AND a.created_at < :cutoff
+      AND (s.id IS NULL OR s.status IN ('ready', 'hibernated'))
+    LIMIT :batch
+""")
+
+def month_start(day: datetime.date, offset: int = 0) -> datetime.date:
+    index = day.year * 12 + day.month - 1 + offset
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: datetime.date) -> str:
+    return f"audit_logs_p{month:%Y%m}"
+
+async def is_partitioned(conn) -> bool:
+    return (await conn.execute(_IS_PARTITIONED)).first() is not None
+
+async def ensure_audit_partitions(conn, start: datetime.date = None) -> List[str]:
+    """
+    Create the default partition and monthly partitions from `start` (default:
+    this month) through AUDIT_PARTITION_PREMAKE_MONTHS ahead. Works on a
+    connection or session; the caller commits.
+    """
+    if not await is_partitioned(conn):
+        logger.warning("audit_logs_not_partitioned", hint="run partition_audit_logs.py")
+        return []
+
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    first = start or month_start(today)
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"))
+    existing = {name for name, _ in (await conn.execute(_PARTITIONS)).all()}
+    created = []
+    month = first
+    while month <= month_start(today, settings.AUDIT_PARTITION_PREMAKE_MONTHS):
+        name = partition_name(month)
+        if name not in existing:
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        month = month_start(month, 1)
+    if created:
+        logger.info("audit_partitions_created", partitions=created)
+    return created
+
+async def expired_partitions(conn) -> List[Tuple[str, datetime.date]]:
+    """
+    Partitions whose whole range is older than AUDIT_RETENTION_MONTHS.
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    cutoff = month_start(today, -settings.AUDIT_RETENTION_MONTHS)
+    expired = []
+    for name, bound in (await conn.execute(_PARTITIONS)).all():
+        match = _UPPER_BOUND.search(bound or "")
+        if match and datetime.date.fromisoformat(match.group(1)) <= cutoff:
+            expired.append((name, datetime.date.fromisoformat(match.group(1))))
+    return expired
+
+async def apply_retention(conn) -> List[str]:
+    """
+    Drop expired partitions, or detach them into AUDIT_ARCHIVE_SCHEMA when set.
+    Either way old data leaves with a catalog change, not row deletes.
+    """
+    if settings.AUDIT_RETENTION_MONTHS <= 0:
+        return []
+    removed = []
+    for name, upper in await expired_partitions(conn):
+        if settings.AUDIT_ARCHIVE_SCHEMA:
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {settings.AUDIT_ARCHIVE_SCHEMA}"))
+            await conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+            await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {settings.AUDIT_ARCHIVE_SCHEMA}"))
+        else:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+        logger.info(
+            "audit_partition_retired", partition=name, until=upper.isoformat(),
+            archived_to=settings.AUDIT_ARCHIVE_SCHEMA or None,
+        )
+    return removed
+
+async def compact_activity_logs(conn) -> int:
+    """
+    Replace the step-by-step activity.* rows of settled stores (older than
+    AUDIT_COMPACT_AFTER_HOURS) with one activity.summary row each.
+    """
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=settings.AUDIT_COMPACT_AFTER_HOURS)
+    result = await conn.execute(_COMPACTABLE, {"cutoff": cutoff, "batch": settings.AUDIT_COMPACT_BATCH})
+    store_ids = [row[0] for row in result.all()]
+    for store_id in store_ids:
+        await conn.execute(_COMPACT_STORE, {"store_id": store_id, "resource_id": str(store_id), "cutoff": cutoff})
+    if store_ids:
+        logger.info("audit_activity_compacted", stores=len(store_ids))
+    return len(store_ids)
+
+async def maintain_audit_logs():
+    """
+    Periodic audit storage upkeep: premake partitions, retire expired ones,
+    compact activity rows. Each step commits on its own.
+    """
+    from app.database import engine
+    async with engine.begin() as conn:
+        await ensure_audit_partitions(conn)
+    async with engine.begin() as conn:
+        await apply_retention(conn)
+    async with engine.begin() as conn:
+        await compact_activity_logs(conn)
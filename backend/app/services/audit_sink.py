@@ -0,0 +1,127 @@
+import asyncio
+import datetime
+from typing import Any, Dict, List, Optional
+import structlog
+from prometheus_client import Counter, Gauge
+from sqlalchemy import insert
+from app.models import AuditLog
+from app.config import settings
+
+logger = structlog.get_logger()
+
+EVENTS_WRITTEN = Counter("urumi_audit_events_written_total", "Audit events written by the batching sink")
+EVENTS_DROPPED = Counter("urumi_audit_events_dropped_total", "Audit events lost by the batching sink", ["reason"])
+BUFFERED = Gauge("urumi_audit_events_buffered", "Audit events waiting to be flushed")
+
+class AuditSink:
+    """
+    Buffers audit events in memory and writes them as multi-row inserts, one
+    transaction per batch of up to `batch_size` events or every
+    `flush_seconds`, whichever comes first.
+
+    The buffer is bounded: `emit` waits up to `enqueue_timeout` for room and
+    then drops the event (counted in urumi_audit_events_dropped_total), so a
+    slow database never stalls provisioning for long.
+    """
+    def __init__(self, batch_size: int, flush_seconds: float, max_buffer: int, enqueue_timeout: float):
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=self.max_buffer)
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything buffered, then stop the writer."""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def emit(
+        self,
+        action: str,
+        resource_type: Optional[str] = None,
+        resource_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        event = {
+            "action": action,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "metadata": metadata or {},
+            # Stamped now, not at flush, so timelines keep their order
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+        if self.task is None:
+            # Sink not running (e.g. one-off scripts): write through
+            await self._write([event])
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(event), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                EVENTS_DROPPED.labels(reason="buffer_full").inc()
+                logger.warning("audit_event_dropped", action=action, reason="buffer_full")
+                return
+        BUFFERED.set(self.queue.qsize())
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            item = await self.queue.get()
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+            deadline = asyncio.get_running_loop().time() + self.flush_seconds
+            while not stopping and len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if stopping:
+                # Drain whatever arrived before the stop marker
+                while not self.queue.empty():
+                    item = self.queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+            BUFFERED.set(self.queue.qsize())
+            for start in range(0, len(batch), self.batch_size):
+                await self._write(batch[start:start + self.batch_size])
+
+    async def _write(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        from app.database import engine
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(insert(AuditLog.__table__), events)
+        except Exception as e:
+            EVENTS_DROPPED.labels(reason="write_failed").inc(len(events))
+            logger.error("audit_batch_write_failed", events=len(events), error=str(e))
+            return
+        EVENTS_WRITTEN.inc(len(events))
+
+audit_sink = AuditSink(
+    settings.AUDIT_SINK_BATCH_SIZE,
+    settings.AUDIT_SINK_FLUSH_SECONDS,
+    settings.AUDIT_SINK_MAX_BUFFER,
+    settings.AUDIT_SINK_ENQUEUE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+import structlog
+from kubernetes import client, config
+from kubernetes.utils import parse_quantity
+from prometheus_client import Gauge
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Store
+from app.config import settings
+from app.services.kubernetes import STORE_NAMESPACE_LABEL
+
+logger = structlog.get_logger()
+
+# Stores waiting in queue mode hold no reservation until admitted
+STATUS_WAITING = "waiting_capacity"
+# Statuses that no longer (or not yet) hold cluster resources
+NON_COMMITTED_STATUSES = ["failed", "deleting", STATUS_WAITING]
+
+HEADROOM_CPU = Gauge("urumi_cluster_headroom_cpu_millicores", "Allocatable CPU left after committed store reservations")
+HEADROOM_MEMORY = Gauge("urumi_cluster_headroom_memory_bytes", "Allocatable memory left after committed store reservations")
+HEADROOM_STORES = Gauge("urumi_cluster_headroom_stores", "Additional stores the cluster can admit")
+WAITING_STORES = Gauge("urumi_stores_waiting_capacity", "Stores queued for cluster capacity")
+
+# Cached cluster view, refreshed at most every CAPACITY_CACHE_SECONDS
+_cache: Dict[str, Any] = {}
+_cache_lock = asyncio.Lock()
+_config_loaded = False
+# Transaction-scoped advisory lock that serializes admission decisions
+# across API replicas and workers
+ADMISSION_LOCK_KEY = 0x75727563
+
+def store_reservation() -> Tuple[int, int]:
+    """
+    (cpu millicores, memory bytes) reserved per store. Defaults match the
+    requests.* ceiling of the store ResourceQuota.
+    """
+    return max(1, settings.STORE_RESERVED_CPU_MILLICORES), max(1, settings.STORE_RESERVED_MEMORY_MB) * 1024 * 1024
+
+def _pod_requests(pod) -> Tuple[int, int]:
+    cpu, memory = 0, 0
+    for container in pod.spec.containers or []:
+        requests = (container.resources and container.resources.requests) or {}
+        if "cpu" in requests:
+            cpu += int(parse_quantity(requests["cpu"]) * 1000)
+        if "memory" in requests:
+            memory += int(parse_quantity(requests["memory"]))
+    return cpu, memory
+
+def _read_cluster() -> Dict[str, Any]:
+    """
+    Sum allocatable CPU/memory over schedulable, Ready nodes, minus what
+    non-store workloads (platform, system pods) already request. Only
+    namespaces without the store label are listed, so the read does not grow
+    with the fleet: the stores' share is accounted from the database.
+    """
+    global _config_loaded
+    if not _config_loaded:
+        try:
+            config.load_incluster_config()
+        except config.ConfigException:
+            config.load_kube_config()
+        _config_loaded = True
+
+    core = client.CoreV1Api()
+    allocatable_cpu, allocatable_memory, nodes = 0, 0, 0
+    for node in core.list_node(timeout_seconds=5).items:
+        if node.spec.unschedulable:
+            continue
+        ready = any(c.type == "Ready" and c.status == "True" for c in node.status.conditions or [])
+        if not ready:
+            continue
+        nodes += 1
+        allocatable_cpu += int(parse_quantity(node.status.allocatable["cpu"]) * 1000)
+        allocatable_memory += int(parse_quantity(node.status.allocatable["memory"]))
+
+    other_cpu, other_memory = 0, 0
+    namespaces = core.list_namespace(label_selector=f"!{STORE_NAMESPACE_LABEL}", timeout_seconds=5)
+    for namespace in namespaces.items:
+        # Store namespaces created before they were labelled
+        if namespace.metadata.name.startswith("store-"):
+            continue
+        pods = core.list_namespaced_pod(
+            namespace.metadata.name,
+            field_selector="status.phase!=Succeeded,status.phase!=Failed",
+            timeout_seconds=10,
+        )
+        for pod in pods.items:
+            cpu, memory = _pod_requests(pod)
+            other_cpu += cpu
+            other_memory += memory
+
+    return {
+        "nodes": nodes,
+        "allocatable_cpu_millicores": allocatable_cpu,
+        "allocatable_memory_bytes": allocatable_memory,
+        "other_cpu_millicores": other_cpu,
+        "other_memory_bytes": other_memory,
+        "fetched_at": time.monotonic(),
+    }
+
+def _fresh(snapshot: Dict[str, Any]) -> bool:
+    return bool(snapshot) and time.monotonic() - snapshot["fetched_at"] < settings.CAPACITY_CACHE_SECONDS
+
+async def get_cluster_capacity(force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Cached cluster capacity. Returns the last good reading if a refresh fails,
+    or None if the cluster has never been reachable.
+    """
+    if not force and _fresh(_cache):
+        return _cache
+    async with _cache_lock:
+        if not force and _fresh(_cache):
+            return _cache
+        try:
+            _cache.update(await asyncio.to_thread(_read_cluster))
+        except Exception as e:
+            logger.warning("cluster_capacity_refresh_failed", error=str(e))
+            return _cache or None
+    return _cache
+
+async def lock_admission(db: AsyncSession):
+    """
+    Hold the admission lock until the caller's transaction ends. Whoever
+    holds it sees every store admitted before it, committed, in the counts.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(ADMISSION_LOCK_KEY)))
+
+async def get_store_counts(db: AsyncSession) -> Dict[str, int]:
+    """
+    Stores holding (or about to hold) a reservation, and stores waiting for
+    capacity, counted in the caller's transaction in one query.
+    """
+    result = await db.execute(
+        select(
+            func.count().filter(Store.status.notin_(NON_COMMITTED_STATUSES)),
+            func.count().filter(Store.status == STATUS_WAITING),
+        ).select_from(Store)
+    )
+    committed, waiting = result.one()
+    return {"committed": committed or 0, "waiting": waiting or 0}
+
+async def get_headroom(db: AsyncSession, lock: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Capacity left for new stores: allocatable minus other workloads minus the
+    reservation of every store (pool instances included) that holds or is
+    about to hold resources. Also refreshes the headroom gauges.
+
+    With `lock`, the admission lock is taken first and held until the caller
+    commits the stores it admits, so concurrent admissions on other replicas
+    cannot spend the same headroom. Read-only callers pass lock=False.
+    """
+    cluster = await get_cluster_capacity()
+    if cluster is None:
+        return None
+
+    if lock:
+        await lock_admission(db)
+    counts = await get_store_counts(db)
+    committed_stores = counts["committed"]
+    waiting_stores = counts["waiting"]
+
+    cpu_per_store, memory_per_store = store_reservation()
+    usable_cpu = cluster["allocatable_cpu_millicores"] * settings.CAPACITY_TARGET_UTILIZATION - cluster["other_cpu_millicores"]
+    usable_memory = cluster["allocatable_memory_bytes"] * settings.CAPACITY_TARGET_UTILIZATION - cluster["other_memory_bytes"]
+    free_cpu = int(usable_cpu - committed_stores * cpu_per_store)
+    free_memory = int(usable_memory - committed_stores * memory_per_store)
+    free_stores = max(0, min(free_cpu // cpu_per_store, free_memory // memory_per_store))
+
+    HEADROOM_CPU.set(free_cpu)
+    HEADROOM_MEMORY.set(free_memory)
+    HEADROOM_STORES.set(free_stores)
+    WAITING_STORES.set(waiting_stores)
+
+    return {
+        "nodes": cluster["nodes"],
+        "committed_stores": committed_stores,
+        "waiting_stores": waiting_stores,
+        "free_cpu_millicores": free_cpu,
+        "free_memory_bytes": free_memory,
+        "free_stores": free_stores,
+    }
+
+async def check_admission(db: AsyncSession) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Whether one more store fits right now, behind any stores already waiting.
+    Fails open (admits) when admission is disabled or the cluster view is
+    unavailable. The caller commits (or rolls back) to release the lock.
+    """
+    if settings.CAPACITY_ADMISSION_MODE == "off":
+        return True, None
+    headroom = await get_headroom(db)
+    if headroom is None:
+        return True, None
+    return headroom["free_stores"] > headroom["waiting_stores"], headroom
+
+async def admit_waiting_store(db: AsyncSession, store: Store) -> bool:
+    """
+    Queue mode: a waiting store is admitted once it is among the oldest
+    `free_stores` waiters, so stores leave the queue in arrival order. The
+    caller commits the admitted store's new status to release the lock.
+    """
+    headroom = await get_headroom(db)
+    if headroom is None:
+        return True
+    if headroom["free_stores"] < 1:
+        return False
+    ahead = await db.execute(
+        select(func.count()).select_from(Store).where(
+            Store.status == STATUS_WAITING, Store.created_at < store.created_at
+        )
+    )
+    return (ahead.scalar() or 0) < headroom["free_stores"]
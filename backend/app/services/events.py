@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import datetime
+import json
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import asyncpg
+import structlog
+from prometheus_client import Gauge
+from sqlalchemy import select, text
+from app.models import Store, AuditLog
+from app.config import settings
+
+logger = structlog.get_logger()
+
+# Postgres channel carrying store changes (status and other client-visible
+# fields) and audit events. Both are
+# published by triggers, so every writer (API, worker, operator, hibernation)
+# is covered without changes at the call sites.
+CHANNEL = "store_events"
+
+SUBSCRIBERS = Gauge("urumi_event_stream_subscribers", "Open store event streams")
+
+# Event ids are microseconds since the epoch of the row's timestamp, so any
+# API replica can resume a stream from the database.
+NOTIFY_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION urumi_notify_store_status() RETURNS trigger AS $$
+    DECLARE rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSIF TG_OP = 'UPDATE' AND
+              (NEW.status, NEW.name, NEW.pool_state, NEW.error_message, NEW.domain, NEW.storefront_url, NEW.admin_url,
+               NEW.admin_password, NEW.provisioning_started_at, NEW.provisioning_completed_at, NEW.hibernated_at)
+              IS NOT DISTINCT FROM
+              (OLD.status, OLD.name, OLD.pool_state, OLD.error_message, OLD.domain, OLD.storefront_url, OLD.admin_url,
+               OLD.admin_password, OLD.provisioning_started_at, OLD.provisioning_completed_at, OLD.hibernated_at) THEN
+            -- Only changes a client can see (not last_activity_at, checkpoints, ...)
+            RETURN NULL;
+        ELSE
+            rec := NEW;
+        END IF;
+        PERFORM pg_notify('{CHANNEL}', json_build_object(
+            'id', (extract(epoch FROM CASE WHEN TG_OP = 'DELETE' THEN clock_timestamp() ELSE COALESCE(rec.updated_at, clock_timestamp()) END) * 1000000)::bigint,
+            'type', 'status',
+            'store_id', rec.id,
+            'status', CASE WHEN TG_OP = 'DELETE' THEN 'deleted' ELSE rec.status END,
+            'pool', rec.pool_state IS NOT NULL
+        )::text);
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS stores_notify_status ON stores",
+    "CREATE TRIGGER stores_notify_status AFTER INSERT OR UPDATE OR DELETE ON stores "
+    "FOR EACH ROW EXECUTE FUNCTION urumi_notify_store_status()",
+    f"""
+    CREATE OR REPLACE FUNCTION urumi_notify_audit() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CHANNEL}', json_build_object(
+            'id', (extract(epoch FROM NEW.created_at) * 1000000)::bigint,
+            'type', 'audit',
+            'store_id', NEW.store_id,
+            'action', NEW.action,
+            'category', NEW.category,
+            'created_at', NEW.created_at,
+            -- NOTIFY payloads are capped at 8000 bytes
+            'metadata', CASE WHEN octet_length(NEW.metadata::text) < 4000 THEN NEW.metadata END
+        )::text);
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS audit_logs_notify ON audit_logs",
+    "CREATE TRIGGER audit_logs_notify AFTER INSERT ON audit_logs "
+    "FOR EACH ROW EXECUTE FUNCTION urumi_notify_audit()",
+]
+
+# Sent when a subscriber may have missed events; clients refetch their state
+RESET = {"type": "reset"}
+
+async def install_notify_triggers(conn):
+    for statement in NOTIFY_DDL:
+        await conn.execute(text(statement))
+
+def _event_id(moment: datetime.datetime) -> int:
+    return int(moment.timestamp() * 1_000_000)
+
+def status_event(store: Store) -> Dict[str, Any]:
+    return {
+        "id": _event_id(store.updated_at or store.created_at),
+        "type": "status",
+        "store_id": str(store.id),
+        "status": store.status,
+        "pool": store.pool_state is not None,
+    }
+
+def audit_event(log: AuditLog) -> Dict[str, Any]:
+    return {
+        "id": _event_id(log.created_at),
+        "type": "audit",
+        "store_id": str(log.store_id) if log.store_id else None,
+        "action": log.action,
+        "category": log.category,
+        "created_at": log.created_at.isoformat(),
+        "metadata": log.metadata_,
+    }
+
+def event_key(event: Dict[str, Any]) -> Tuple:
+    return (event.get("id"), event.get("type"), event.get("store_id"), event.get("action") or event.get("status"))
+
+class Subscription:
+    """
+    One open stream: a store's events, or (store_id None) the fleet feed of
+    customer status changes and non-activity audit events.
+    """
+    def __init__(self, store_id: Optional[uuid.UUID]):
+        self.store_id = str(store_id) if store_id else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_SUBSCRIBER_BUFFER)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if event is RESET:
+            return True
+        if self.store_id:
+            return event.get("store_id") == self.store_id
+        if event["type"] == "status":
+            return not event.get("pool")
+        return event.get("category") != "activity"
+
+    def offer(self, event: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog and tell it to resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+class EventBroker:
+    """
+    Per-process fan-out of the store_events channel. A single dedicated
+    LISTEN connection is opened on the first subscription and re-established
+    if it drops; subscribers then receive a reset.
+    """
+    def __init__(self):
+        self.subscriptions: Set[Subscription] = set()
+        # In-process consumers (e.g. the store read cache) called for every event
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.get("store_id") is not None:
+            event["store_id"] = str(event["store_id"])
+        self._publish(event)
+
+    def _publish(self, event: Dict[str, Any]):
+        for listener in self.listeners:
+            listener(event)
+        for subscription in list(self.subscriptions):
+            if subscription.matches(event):
+                subscription.offer(event)
+
+    async def _listen(self):
+        from app.database import listen_dsn
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(listen_dsn())
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(CHANNEL, self._on_notify)
+                logger.info("event_listener_connected", channel=CHANNEL)
+                await closed.wait()
+                logger.warning("event_listener_disconnected", channel=CHANNEL)
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception as e:
+                logger.error("event_listener_failed", error=str(e))
+            self._publish(RESET)
+            await asyncio.sleep(settings.EVENTS_RECONNECT_SECONDS)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._listen())
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        self.listeners.append(callback)
+        self.start()
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, store_id: Optional[uuid.UUID] = None):
+        self.start()
+        subscription = Subscription(store_id)
+        self.subscriptions.add(subscription)
+        SUBSCRIBERS.set(len(self.subscriptions))
+        try:
+            yield subscription
+        finally:
+            self.subscriptions.discard(subscription)
+            SUBSCRIBERS.set(len(self.subscriptions))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+broker = EventBroker()
+
+async def replay_events(store_id: Optional[uuid.UUID], last_event_id: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Events after `last_event_id`, read back from the database, oldest first.
+    Returns (events, complete); incomplete means the gap is older than
+    EVENTS_REPLAY_MAX_SECONDS or longer than EVENTS_REPLAY_LIMIT and the
+    client should resync.
+    """
+    from app.database import AsyncSessionLocal
+    since = datetime.datetime.fromtimestamp(last_event_id / 1_000_000, tz=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if (now - since).total_seconds() > settings.EVENTS_REPLAY_MAX_SECONDS:
+        return [], False
+
+    limit = settings.EVENTS_REPLAY_LIMIT
+    async with AsyncSessionLocal() as db:
+        logs = select(AuditLog).where(AuditLog.created_at > since)
+        stores = select(Store).where(Store.updated_at > since)
+        if store_id:
+            logs = logs.where(AuditLog.store_id == store_id)
+            stores = stores.where(Store.id == store_id)
+        else:
+            logs = logs.where(AuditLog.category != "activity")
+            stores = stores.where(Store.pool_state.is_(None))
+        log_rows = (await db.execute(logs.order_by(AuditLog.created_at).limit(limit + 1))).scalars().all()
+        store_rows = (await db.execute(stores.limit(limit + 1))).scalars().all()
+
+    events = [audit_event(log) for log in log_rows] + [status_event(store) for store in store_rows]
+    events.sort(key=lambda e: e["id"])
+    complete = len(log_rows) <= limit and len(store_rows) <= limit
+    return events[:limit], complete
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import select, func, and_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Store
+from app.config import settings
+
+# Last computed metrics, shared by every dashboard poll within the TTL
+_cache: Dict[str, Any] = {}
+_cache_lock = asyncio.Lock()
+
+def _seconds(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+async def _aggregate(db: AsyncSession) -> Dict[str, Any]:
+    """
+    One GROUP BY ROLLUP(engine) over customer stores: per-engine rows plus the
+    fleet total (engine NULL). Served from the idx_stores_metrics covering index.
+    """
+    # NULL unless the store is ready with both timestamps; aggregates skip NULLs
+    duration = case((
+        and_(
+            Store.status == "ready",
+            Store.provisioning_started_at.isnot(None),
+            Store.provisioning_completed_at.isnot(None),
+        ),
+        func.extract("epoch", Store.provisioning_completed_at - Store.provisioning_started_at),
+    ))
+    stmt = (
+        select(
+            Store.engine,
+            func.count().label("total"),
+            func.count().filter(Store.status == "failed").label("failed"),
+            func.count().filter(Store.status == "ready").label("ready"),
+            func.avg(duration).label("avg"),
+            func.percentile_cont(0.5).within_group(duration).label("p50"),
+            func.percentile_cont(0.95).within_group(duration).label("p95"),
+        )
+        .where(Store.pool_state.is_(None))
+        .group_by(func.rollup(Store.engine))
+    )
+    rows = (await db.execute(stmt)).all()
+
+    def summary(row) -> Dict[str, Any]:
+        total = row.total if row else 0
+        failed = row.failed if row else 0
+        return {
+            "total_stores": total,
+            "failed_stores": failed,
+            "ready_stores": row.ready if row else 0,
+            "avg_provisioning_time_seconds": _seconds(row.avg if row else None) or 0,
+            "p50_provisioning_time_seconds": _seconds(row.p50 if row else None),
+            "p95_provisioning_time_seconds": _seconds(row.p95 if row else None),
+            "success_rate": round((total - failed) / total * 100, 1) if total > 0 else 100,
+        }
+
+    fleet = next((row for row in rows if row.engine is None), None)
+    metrics = summary(fleet)
+    # Namespaces are unique per store
+    metrics["active_namespaces"] = metrics["ready_stores"]
+    metrics["by_engine"] = {row.engine: summary(row) for row in rows if row.engine is not None}
+    return metrics
+
+async def get_fleet_metrics(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Fleet metrics cached for METRICS_CACHE_SECONDS. Concurrent misses share a
+    single query.
+    """
+    if _cache and time.monotonic() - _cache["fetched_at"] < settings.METRICS_CACHE_SECONDS:
+        return _cache["metrics"]
+    async with _cache_lock:
+        if _cache and time.monotonic() - _cache["fetched_at"] < settings.METRICS_CACHE_SECONDS:
+            return _cache["metrics"]
+        metrics = await _aggregate(db)
+        _cache.update(metrics=metrics, fetched_at=time.monotonic())
+    return metrics
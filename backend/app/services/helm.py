@@ -1,13 +1,132 @@
 import subprocess
 import asyncio
-from typing import Dict, Any, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
 import structlog
+import yaml
+from app.config import settings
 
 logger = structlog.get_logger()
 
 class HelmInstallError(Exception):
     pass
 
+INDEX_FILE = "index.json"
+
+# One lock per chart reference so concurrent installs share a single pull
+_chart_locks: Dict[str, asyncio.Lock] = {}
+# chart key -> verified archive path, for this process
+_verified: Dict[str, str] = {}
+
+async def _run_helm(cmd, stdin: Optional[bytes] = None) -> Tuple[int, str, str]:
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate(input=stdin)
+    return process.returncode, stdout.decode(), stderr.decode()
+
+def _cache_dir() -> Path:
+    path = Path(settings.HELM_CHART_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _read_index() -> Dict[str, Any]:
+    try:
+        return json.loads((_cache_dir() / INDEX_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _write_index(index: Dict[str, Any]):
+    path = _cache_dir() / INDEX_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index, indent=2))
+    os.replace(tmp, path)
+
+def _lookup(key: str, digest: Optional[str]) -> Optional[str]:
+    """
+    Find a cached archive for `key` (or directly by pinned digest) and verify
+    its content hash once per process.
+    """
+    if key in _verified and os.path.exists(_verified[key]):
+        return _verified[key]
+    cache = _cache_dir()
+    if digest:
+        candidate = cache / f"sha256-{digest}.tgz"
+    else:
+        entry = _read_index().get(key)
+        if not entry:
+            return None
+        digest, candidate = entry["digest"], cache / entry["file"]
+    if not candidate.exists():
+        return None
+    if _sha256(candidate) != digest:
+        logger.warning("helm_chart_cache_corrupt", chart=key, file=str(candidate))
+        candidate.unlink(missing_ok=True)
+        return None
+    _verified[key] = str(candidate)
+    return _verified[key]
+
+async def ensure_chart(ref: str, version: Optional[str] = None, digest: Optional[str] = None) -> str:
+    """
+    Return the path of a locally cached chart archive, pulling it once if needed.
+    Archives are stored by sha256 and, when `digest` is given, must match it.
+    Without a version the chart resolved on first pull stays pinned for the
+    lifetime of the cache.
+    """
+    key = f"{ref}@{version or 'latest'}"
+    digest = digest.removeprefix("sha256:") if digest else None
+    lock = _chart_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _lookup(key, digest)
+        if cached:
+            return cached
+
+        started = time.monotonic()
+        cache = _cache_dir()
+        with tempfile.TemporaryDirectory(dir=cache) as tmp:
+            cmd = ["helm", "pull", ref, "--destination", tmp]
+            if version:
+                cmd.extend(["--version", version])
+            returncode, _, stderr = await _run_helm(cmd)
+            if returncode != 0:
+                logger.error("helm_chart_pull_failed", chart=key, stderr=stderr)
+                raise HelmInstallError(stderr)
+            archive = next(Path(tmp).glob("*.tgz"))
+            actual = _sha256(archive)
+            if digest and actual != digest:
+                raise HelmInstallError(f"Chart digest mismatch for {key}: expected {digest}, got {actual}")
+            target = cache / f"sha256-{actual}.tgz"
+            os.replace(archive, target)
+
+        index = _read_index()
+        index[key] = {"digest": actual, "file": target.name, "source": archive.name}
+        _write_index(index)
+        _verified[key] = str(target)
+        logger.info("helm_chart_cached", chart=key, digest=actual, seconds=round(time.monotonic() - started, 2))
+        return str(target)
+
+async def ensure_wordpress_chart() -> str:
+    return await ensure_chart(
+        settings.WORDPRESS_CHART_REF,
+        settings.WORDPRESS_CHART_VERSION or None,
+        settings.WORDPRESS_CHART_DIGEST or None,
+    )
+
 async def helm_install(
     release_name: str,
     chart_path: str,
@@ -18,12 +137,14 @@ async def helm_install(
     create_namespace: bool = True
 ) -> subprocess.CompletedProcess:
     """
-    Install Helm chart using CLI
+    Install Helm chart using CLI. Values go in as one YAML document on stdin,
+    so nothing secret ends up on the command line or in logs.
     """
     cmd = [
         "helm", "upgrade", "--install", release_name, chart_path,
         "--namespace", namespace,
         "--timeout", timeout,
+        "--values", "-",
     ]
     
     if create_namespace:
@@ -32,31 +153,21 @@ async def helm_install(
     if wait:
         cmd.append("--wait")
     
-    # Add values
-    for key, val in values.items():
-        cmd.extend(["--set", f"{key}={val}"])
-    
     logger.info("helm_install_started", release_name=release_name, cmd=" ".join(cmd))
     
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
+    returncode, stdout, stderr = await _run_helm(cmd, stdin=yaml.safe_dump(values).encode())
     
-    stdout, stderr = await process.communicate()
-    
-    if process.returncode != 0:
-        logger.error("helm_install_failed", stderr=stderr.decode())
-        raise HelmInstallError(stderr.decode())
+    if returncode != 0:
+        logger.error("helm_install_failed", stderr=stderr)
+        raise HelmInstallError(stderr)
         
-    logger.info("helm_install_success", stdout=stdout.decode())
+    logger.info("helm_install_success", stdout=stdout)
 
     return subprocess.CompletedProcess(
         args=cmd,
-        returncode=process.returncode,
-        stdout=stdout.decode(),
-        stderr=stderr.decode()
+        returncode=returncode,
+        stdout=stdout,
+        stderr=stderr
     )
 
 async def helm_uninstall(release_name: str, namespace: str) -> None:
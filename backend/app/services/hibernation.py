@@ -0,0 +1,319 @@
+import asyncio
+import datetime
+import json
+import re
+from typing import Any, Dict, List, Optional
+import httpx
+import structlog
+from kubernetes_asyncio import client
+from kubernetes_asyncio.client.rest import ApiException
+from sqlalchemy import select, update
+from app.models import Store, AuditLog
+from app.config import settings
+from app.services.kubernetes import get_api_client, apply_manifest
+
+logger = structlog.get_logger()
+
+STATUS_HIBERNATED = "hibernated"
+STATUS_WAKING = "waking"
+
+REPLICAS_ANNOTATION = "urumi.io/hibernated-replicas"
+ORIGINAL_INGRESS_ANNOTATION = "urumi.io/original-ingress"
+ACTIVATOR_LABEL = "urumi.io/activator-for"
+
+_SAMPLE = re.compile(r'^traefik_service_requests_total\{([^}]*)\}\s+([0-9.eE+-]+)')
+_SERVICE_LABEL = re.compile(r'service="([^"]+)"')
+
+# Traefik service -> last seen request counter (per operator process)
+_last_counts: Dict[str, float] = {}
+# namespace -> in-flight wake, so concurrent requests share one wake-up
+_wakes: Dict[str, asyncio.Task] = {}
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def activator_ingress_name(namespace: str) -> str:
+    return f"wake-{namespace}"
+
+async def scrape_request_counts() -> Dict[str, float]:
+    """
+    Total requests per Traefik service from Traefik's Prometheus endpoint.
+    Kubernetes Ingress services are named <namespace>-<service>-<port>@kubernetes.
+    """
+    async with httpx.AsyncClient(timeout=10) as http:
+        response = await http.get(settings.TRAEFIK_METRICS_URL)
+        response.raise_for_status()
+    counts: Dict[str, float] = {}
+    for line in response.text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        service = _SERVICE_LABEL.search(match.group(1))
+        if service:
+            counts[service.group(1)] = counts.get(service.group(1), 0) + float(match.group(2))
+    return counts
+
+def _active_namespaces(counts: Dict[str, float], namespaces: List[str]) -> List[str]:
+    """
+    Namespaces whose Traefik services served requests since the last scrape.
+    The first scrape only establishes the baseline.
+    """
+    active = set()
+    first = not _last_counts
+    for service, total in counts.items():
+        previous = _last_counts.get(service)
+        if not first and (previous is None or total > previous):
+            for namespace in namespaces:
+                if service.startswith(namespace + "-"):
+                    active.add(namespace)
+                    break
+    _last_counts.clear()
+    _last_counts.update(counts)
+    return list(active)
+
+async def _scale_workloads(namespace: str, to_zero: bool) -> Dict[str, int]:
+    """
+    Scale every Deployment/StatefulSet in the store namespace to zero,
+    remembering the previous replica count in an annotation, or restore it.
+    """
+    apps = client.AppsV1Api(await get_api_client())
+    scaled = {}
+    kinds = [
+        (apps.list_namespaced_deployment, apps.patch_namespaced_deployment),
+        (apps.list_namespaced_stateful_set, apps.patch_namespaced_stateful_set),
+    ]
+    for list_fn, patch_fn in kinds:
+        for workload in (await list_fn(namespace)).items:
+            annotations = workload.metadata.annotations or {}
+            if to_zero:
+                if not workload.spec.replicas:
+                    continue
+                body = {
+                    "metadata": {"annotations": {REPLICAS_ANNOTATION: str(workload.spec.replicas)}},
+                    "spec": {"replicas": 0},
+                }
+            else:
+                if REPLICAS_ANNOTATION not in annotations:
+                    continue
+                body = {
+                    "metadata": {"annotations": {REPLICAS_ANNOTATION: None}},
+                    "spec": {"replicas": int(annotations[REPLICAS_ANNOTATION])},
+                }
+            await patch_fn(workload.metadata.name, namespace, body)
+            scaled[workload.metadata.name] = body["spec"]["replicas"]
+    return scaled
+
+def _clean_ingress(ingress: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = ingress["metadata"]
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "Ingress",
+        "metadata": {
+            "name": metadata["name"],
+            "namespace": metadata["namespace"],
+            "labels": metadata.get("labels") or {},
+            "annotations": {k: v for k, v in (metadata.get("annotations") or {}).items() if not k.startswith("kubectl.kubernetes.io/")},
+        },
+        "spec": ingress["spec"],
+    }
+
+async def store_backend(namespace: str) -> Optional[str]:
+    """
+    In-cluster base URL of the service behind the store's (restored) Ingress.
+    """
+    networking = client.NetworkingV1Api(await get_api_client())
+    for ingress in (await networking.list_namespaced_ingress(namespace)).items:
+        for rule in ingress.spec.rules or []:
+            for path in (rule.http.paths if rule.http else []):
+                service = path.backend.service
+                if service:
+                    return f"http://{service.name}.{namespace}.svc.cluster.local:{service.port.number or 80}"
+    return None
+
+async def hibernate_store(namespace: str):
+    """
+    Route the store's hosts to the activator, then scale its workloads to zero.
+    The original Ingresses are kept on the activator Ingress so wake-up can
+    restore them exactly.
+    """
+    api = await get_api_client()
+    networking = client.NetworkingV1Api(api)
+    ingresses = [
+        _clean_ingress(api.sanitize_for_serialization(i))
+        for i in (await networking.list_namespaced_ingress(namespace)).items
+    ]
+    rules = [
+        {
+            "host": rule["host"],
+            "http": {"paths": [{
+                "path": "/",
+                "pathType": "Prefix",
+                "backend": {"service": {"name": settings.ACTIVATOR_SERVICE, "port": {"number": 80}}},
+            }]},
+        }
+        for ingress in ingresses for rule in ingress["spec"].get("rules", []) if rule.get("host")
+    ]
+    if rules:
+        await apply_manifest({
+            "apiVersion": "networking.k8s.io/v1",
+            "kind": "Ingress",
+            "metadata": {
+                "name": activator_ingress_name(namespace),
+                "namespace": settings.PLATFORM_NAMESPACE,
+                "labels": {ACTIVATOR_LABEL: namespace},
+                "annotations": {
+                    "traefik.ingress.kubernetes.io/router.entrypoints": "web",
+                    ORIGINAL_INGRESS_ANNOTATION: json.dumps(ingresses),
+                },
+            },
+            "spec": {"ingressClassName": "traefik", "rules": rules},
+        })
+        deleted = []
+        try:
+            for ingress in ingresses:
+                await networking.delete_namespaced_ingress(ingress["metadata"]["name"], namespace)
+                deleted.append(ingress)
+        except Exception:
+            # Back to the store's own routes so its hosts never serve both
+            for ingress in deleted:
+                await apply_manifest(ingress)
+            await remove_activator_route(namespace)
+            raise
+
+    scaled = await _scale_workloads(namespace, to_zero=True)
+    logger.info("store_hibernated", namespace=namespace, workloads=scaled)
+
+async def remove_activator_route(namespace: str) -> List[Dict[str, Any]]:
+    """
+    Delete the activator Ingress for a store; returns the original Ingresses it held.
+    """
+    networking = client.NetworkingV1Api(await get_api_client())
+    try:
+        ingress = await networking.read_namespaced_ingress(activator_ingress_name(namespace), settings.PLATFORM_NAMESPACE)
+    except ApiException as e:
+        if e.status == 404:
+            return []
+        raise
+    originals = json.loads((ingress.metadata.annotations or {}).get(ORIGINAL_INGRESS_ANNOTATION, "[]"))
+    try:
+        await networking.delete_namespaced_ingress(activator_ingress_name(namespace), settings.PLATFORM_NAMESPACE)
+    except ApiException as e:
+        if e.status != 404:
+            raise
+    return originals
+
+async def restore_store_routes(namespace: str) -> List[Dict[str, Any]]:
+    """
+    Re-create the store's own Ingresses from the activator route, then drop
+    the activator route. If a restore fails, the Ingresses restored so far
+    are removed again, so the hosts stay on the activator (which retries the
+    wake on the next request) instead of being split between the two.
+    """
+    networking = client.NetworkingV1Api(await get_api_client())
+    try:
+        held = await networking.read_namespaced_ingress(activator_ingress_name(namespace), settings.PLATFORM_NAMESPACE)
+    except ApiException as e:
+        if e.status == 404:
+            return []
+        raise
+    originals = json.loads((held.metadata.annotations or {}).get(ORIGINAL_INGRESS_ANNOTATION, "[]"))
+    restored = []
+    try:
+        for ingress in originals:
+            await apply_manifest(ingress)
+            restored.append(ingress)
+    except Exception:
+        for ingress in restored:
+            try:
+                await networking.delete_namespaced_ingress(ingress["metadata"]["name"], namespace)
+            except ApiException as e:
+                logger.warning("store_route_rollback_failed", namespace=namespace, ingress=ingress["metadata"]["name"], error=str(e))
+        raise
+    await remove_activator_route(namespace)
+    return originals
+
+async def _wake(namespace: str):
+    from app.database import AsyncSessionLocal
+    from app.operator.readiness import wait_for_pod_ready
+
+    started = asyncio.get_running_loop().time()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Store).where(Store.namespace == namespace, Store.status == STATUS_HIBERNATED).values(status=STATUS_WAKING)
+        )
+        await db.commit()
+
+    await _scale_workloads(namespace, to_zero=False)
+    await wait_for_pod_ready(
+        namespace, "app.kubernetes.io/name=wordpress", container="wordpress",
+        timeout=settings.ACTIVATOR_WAKE_TIMEOUT_SECONDS,
+    )
+
+    await restore_store_routes(namespace)
+
+    seconds = round(asyncio.get_running_loop().time() - started, 2)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Store).where(Store.namespace == namespace))
+        store = result.scalars().first()
+        if store:
+            store.status = "ready"
+            store.hibernated_at = None
+            store.last_activity_at = _now()
+            db.add(AuditLog(action="system.store_woken", resource_type="store", resource_id=str(store.id), metadata_={"seconds": seconds}))
+            await db.commit()
+    logger.info("store_woken", namespace=namespace, seconds=seconds)
+
+async def wake_store(namespace: str):
+    """
+    Bring a hibernated store back. Concurrent callers share one wake-up.
+    """
+    task = _wakes.get(namespace)
+    if task is None or task.done():
+        task = asyncio.create_task(_wake(namespace))
+        _wakes[namespace] = task
+        task.add_done_callback(lambda _: _wakes.pop(namespace, None) if _wakes.get(namespace) is task else None)
+    await asyncio.shield(task)
+
+async def check_idle_stores():
+    """
+    Record ingress activity from Traefik and hibernate stores that have been
+    idle for HIBERNATE_AFTER_MINUTES. Skips hibernation entirely if Traefik's
+    metrics cannot be read, so an outage never looks like idleness.
+    """
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Store).where(Store.status == "ready", Store.pool_state.is_(None))
+        )
+        stores = result.scalars().all()
+        if not stores:
+            return
+
+        counts = await scrape_request_counts()
+        now = _now()
+        active = set(_active_namespaces(counts, [s.namespace for s in stores]))
+        cutoff = now - datetime.timedelta(minutes=settings.HIBERNATE_AFTER_MINUTES)
+
+        idle = []
+        for store in stores:
+            if store.namespace in active:
+                store.last_activity_at = now
+            elif (store.last_activity_at or store.provisioning_completed_at or now) < cutoff:
+                idle.append(store)
+        await db.commit()
+
+        for store in idle:
+            try:
+                await hibernate_store(store.namespace)
+            except Exception as e:
+                logger.error("store_hibernate_failed", namespace=store.namespace, error=str(e))
+                continue
+            store.status = STATUS_HIBERNATED
+            store.hibernated_at = now
+            db.add(AuditLog(
+                action="system.store_hibernated",
+                resource_type="store",
+                resource_id=str(store.id),
+                metadata_={"idle_since": (store.last_activity_at or store.provisioning_completed_at).isoformat()},
+            ))
+            await db.commit()
@@ -0,0 +1,293 @@
+import asyncio
+import datetime
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+import structlog
+import asyncpg
+from sqlalchemy import select, update, insert, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Job, Store
+from app.config import settings
+
+logger = structlog.get_logger()
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _handlers():
+    from app.services import orchestrator
+    return {
+        "provision_store": orchestrator.provision_store,
+        "deprovision_store": orchestrator.deprovision_store,
+        "personalize_store": orchestrator.personalize_store,
+    }
+
+# Job kinds whose final failure leaves the store in 'failed'
+STORE_FAILURE_KINDS = {"provision_store", "personalize_store"}
+
+# The jobs table doubles as the transactional outbox: a job row commits with
+# the store change that needs it, and a statement trigger wakes idle workers
+# right away instead of at their next poll.
+JOBS_CHANNEL = "jobs_queued"
+
+JOBS_NOTIFY_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION urumi_notify_jobs() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{JOBS_CHANNEL}', '');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS jobs_notify_queued ON jobs",
+    "CREATE TRIGGER jobs_notify_queued AFTER INSERT ON jobs "
+    "FOR EACH STATEMENT EXECUTE FUNCTION urumi_notify_jobs()",
+]
+
+async def install_job_triggers(conn):
+    for statement in JOBS_NOTIFY_DDL:
+        await conn.execute(text(statement))
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    store_id: Optional[uuid.UUID] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    delay_seconds: float = 0,
+) -> Job:
+    """
+    Add a job to the session. It becomes visible to workers when the caller
+    commits, so it is durable together with the rows that triggered it.
+    """
+    job = Job(
+        kind=kind,
+        store_id=store_id,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_after=_now() + datetime.timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    return job
+
+async def enqueue_jobs(db: AsyncSession, kind: str, store_ids: List[uuid.UUID]):
+    """
+    enqueue_job for many stores as one multi-row insert in the caller's
+    transaction.
+    """
+    if not store_ids:
+        return
+    run_after = _now()
+    await db.execute(insert(Job), [
+        {
+            "kind": kind,
+            "store_id": store_id,
+            "payload": {},
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": settings.JOB_MAX_ATTEMPTS,
+            "run_after": run_after,
+        }
+        for store_id in store_ids
+    ])
+
+async def claim_jobs(limit: int) -> List[Dict[str, Any]]:
+    """
+    Lock up to `limit` runnable jobs with SELECT ... FOR UPDATE SKIP LOCKED and
+    mark them running, so concurrent workers never pick the same job.
+    """
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        stmt = (
+            select(Job)
+            .where(Job.status == "queued", Job.run_after <= func.now())
+            .order_by(Job.run_after, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(stmt)
+        jobs = result.scalars().all()
+        now = _now()
+        claimed = []
+        for job in jobs:
+            job.status = "running"
+            job.attempts += 1
+            job.locked_by = WORKER_ID
+            job.locked_at = now
+            job.started_at = now
+            claimed.append({
+                "id": job.id,
+                "kind": job.kind,
+                "store_id": job.store_id,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "queued_seconds": (now - job.created_at).total_seconds() if job.created_at else None,
+            })
+        await db.commit()
+        return claimed
+
+async def requeue_stale_jobs() -> int:
+    """
+    Put jobs back in the queue whose worker died mid-run (lease expired).
+    """
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        cutoff = _now() - datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        result = await db.execute(
+            update(Job)
+            .where(Job.status == "running", Job.locked_at < cutoff)
+            .values(status="queued", locked_by=None, locked_at=None, run_after=func.now())
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.warning("jobs_requeued", count=result.rowcount)
+        return result.rowcount
+
+async def _finish(job: Dict[str, Any], error: Optional[str] = None):
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        values = {"locked_by": None, "locked_at": None, "last_error": error}
+        if error is None:
+            values.update(status="done", finished_at=_now())
+        elif job["attempts"] >= job["max_attempts"]:
+            values.update(status="failed", finished_at=_now())
+        else:
+            backoff = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1), settings.JOB_RETRY_MAX_SECONDS)
+            values.update(status="queued", run_after=_now() + datetime.timedelta(seconds=backoff))
+        await db.execute(update(Job).where(Job.id == job["id"]).values(**values))
+
+        if values["status"] == "failed" and job["kind"] in STORE_FAILURE_KINDS and job["store_id"]:
+            await db.execute(
+                update(Store).where(Store.id == job["store_id"]).values(status="failed", error_message=error)
+            )
+            from app.services.quota import release_quota
+            await release_quota(db, job["store_id"])
+        elif values["status"] == "failed" and job["store_id"]:
+            # A delete that ran out of retries keeps the store in 'deleting'
+            # with the reason; its CR and quota are still held
+            await db.execute(update(Store).where(Store.id == job["store_id"]).values(error_message=error))
+        await db.commit()
+        return values["status"]
+
+async def run_job(job: Dict[str, Any]):
+    handler = _handlers().get(job["kind"])
+    log = logger.bind(job_id=job["id"], kind=job["kind"], store_id=str(job["store_id"]), attempt=job["attempts"])
+    log.info("job_started", queued_seconds=job["queued_seconds"])
+    try:
+        if handler is None:
+            raise Exception(f"Unknown job kind '{job['kind']}'")
+        await handler(job["store_id"])
+    except Exception as e:
+        status = await _finish(job, error=str(e))
+        log.error("job_failed", error=str(e), next_status=status)
+        return
+    await _finish(job)
+    log.info("job_completed")
+
+async def _listen_for_jobs(wake: asyncio.Event):
+    """
+    Set `wake` on every jobs_queued notification. Reconnects on failure;
+    polling covers the gap meanwhile.
+    """
+    from app.database import listen_dsn
+    dsn = listen_dsn()
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(JOBS_CHANNEL, lambda *_: wake.set())
+            await closed.wait()
+        except asyncio.CancelledError:
+            if connection is not None:
+                await connection.close()
+            raise
+        except Exception as e:
+            logger.warning("job_listener_failed", error=str(e))
+        await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+
+async def run_worker(concurrency: Optional[int] = None, stop: Optional[asyncio.Event] = None):
+    """
+    Run up to `concurrency` jobs at once until `stop` is set. Idle workers wake
+    on jobs_queued notifications and otherwise poll every
+    JOB_POLL_INTERVAL_SECONDS (delayed retries, missed notifications).
+    In-flight jobs are allowed to finish on shutdown.
+    """
+    concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+    stop = stop or asyncio.Event()
+    in_flight = set()
+    last_recovery = 0.0
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    listener = asyncio.create_task(_listen_for_jobs(wake))
+    stopper = asyncio.create_task(stop.wait())
+    stopper.add_done_callback(lambda _: wake.set())
+    logger.info("job_worker_started", worker=WORKER_ID, concurrency=concurrency)
+
+    while not stop.is_set():
+        # Cleared before claiming, so a job queued during the claim still wakes us
+        wake.clear()
+        claimed = []
+        try:
+            if loop.time() - last_recovery > settings.JOB_LEASE_SECONDS / 2:
+                await requeue_stale_jobs()
+                last_recovery = loop.time()
+            capacity = concurrency - len(in_flight)
+            if capacity > 0:
+                claimed = await claim_jobs(capacity)
+        except Exception as e:
+            logger.error("job_claim_failed", error=str(e))
+
+        for job in claimed:
+            task = asyncio.create_task(run_job(job))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            # A freed slot can take the next queued job straight away
+            task.add_done_callback(lambda _: wake.set())
+
+        if not claimed:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    if in_flight:
+        logger.info("job_worker_draining", in_flight=len(in_flight))
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    logger.info("job_worker_stopped", worker=WORKER_ID)
+
+async def queue_stats(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Queue depth per status plus wait/latency figures for the last hour.
+    """
+    depth_rows = await db.execute(select(Job.status, func.count()).group_by(Job.status))
+    depth = {status: count for status, count in depth_rows.all()}
+
+    oldest = await db.execute(
+        select(func.extract("epoch", func.now() - func.min(Job.created_at))).where(Job.status == "queued")
+    )
+    since = _now() - datetime.timedelta(hours=1)
+    latency = await db.execute(
+        select(
+            func.avg(func.extract("epoch", Job.started_at - Job.created_at)),
+            func.avg(func.extract("epoch", Job.finished_at - Job.created_at)),
+        ).where(Job.status == "done", Job.finished_at >= since)
+    )
+    avg_wait, avg_total = latency.one()
+    oldest_age = oldest.scalar()
+
+    return {
+        "depth": depth,
+        "queued": depth.get("queued", 0),
+        "running": depth.get("running", 0),
+        "oldest_queued_seconds": round(float(oldest_age), 2) if oldest_age is not None else None,
+        "avg_queue_wait_seconds_1h": round(float(avg_wait), 2) if avg_wait is not None else None,
+        "avg_completion_seconds_1h": round(float(avg_total), 2) if avg_total is not None else None,
+    }
@@ -1,19 +1,185 @@
 import asyncio
-import subprocess
-from typing import Tuple, Optional
+import json
+import shlex
+from typing import Any, Dict, List, Tuple, Optional
 import structlog
+from kubernetes_asyncio import client, config
+from kubernetes_asyncio.client.rest import ApiException
+from kubernetes_asyncio.stream import WsApiClient
+from app.config import settings
 
 logger = structlog.get_logger()
 
-async def create_namespace(name: str):
-    cmd = ["kubectl", "create", "namespace", name]
-    process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-    await process.communicate()
+FIELD_MANAGER = "urumi-operator"
+# Marks store namespaces, so capacity reads can list everything else cheaply
+STORE_NAMESPACE_LABEL = "urumi.io/store"
+
+# Exec websocket channels (v4.channel.k8s.io)
+STDIN_CHANNEL = 0
+STDOUT_CHANNEL = 1
+STDERR_CHANNEL = 2
+ERROR_CHANNEL = 3
+
+# kind -> (plural, namespaced) for the resources the platform applies
+KIND_RESOURCES = {
+    "Namespace": ("namespaces", False),
+    "ResourceQuota": ("resourcequotas", True),
+    "LimitRange": ("limitranges", True),
+    "NetworkPolicy": ("networkpolicies", True),
+    "Secret": ("secrets", True),
+    "ConfigMap": ("configmaps", True),
+    "Service": ("services", True),
+    "ServiceAccount": ("serviceaccounts", True),
+    "PersistentVolumeClaim": ("persistentvolumeclaims", True),
+    "Deployment": ("deployments", True),
+    "StatefulSet": ("statefulsets", True),
+    "Ingress": ("ingresses", True),
+}
+
+class KubernetesExecError(Exception):
+    pass
+
+# Shared, keep-alive clients. One aiohttp session each for REST and websocket
+# traffic, created lazily on first use and reused by every handler.
+_api_client: Optional[client.ApiClient] = None
+_ws_client: Optional[WsApiClient] = None
+_client_lock = asyncio.Lock()
+
+async def _load_configuration() -> client.Configuration:
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        await config.load_kube_config()
+    conf = client.Configuration.get_default_copy()
+    conf.connection_pool_maxsize = settings.K8S_CONNECTION_POOL_SIZE
+    return conf
+
+async def get_api_client() -> client.ApiClient:
+    global _api_client, _ws_client
+    if _api_client is None:
+        async with _client_lock:
+            if _api_client is None:
+                conf = await _load_configuration()
+                _ws_client = WsApiClient(configuration=conf)
+                _api_client = client.ApiClient(configuration=conf)
+    return _api_client
+
+async def get_ws_client() -> WsApiClient:
+    await get_api_client()
+    return _ws_client
+
+async def close_clients():
+    global _api_client, _ws_client
+    async with _client_lock:
+        for api in (_api_client, _ws_client):
+            if api is not None:
+                await api.close()
+        _api_client = None
+        _ws_client = None
+
+async def create_namespace(name: str, labels: Optional[Dict[str, str]] = None):
+    core = client.CoreV1Api(await get_api_client())
+    try:
+        await core.create_namespace(body={"metadata": {"name": name, "labels": labels or {}}})
+    except ApiException as e:
+        if e.status != 409:
+            raise
 
 async def delete_namespace(name: str):
-    cmd = ["kubectl", "delete", "namespace", name, "--wait=false"] # Don't block
-    process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-    await process.communicate()
+    core = client.CoreV1Api(await get_api_client())
+    try:
+        # Don't block on finalizers; the namespace terminates in the background
+        await core.delete_namespace(name, propagation_policy="Background")
+    except ApiException as e:
+        if e.status != 404:
+            raise
+
+async def list_pods(namespace: str, label_selector: str) -> List[Any]:
+    core = client.CoreV1Api(await get_api_client())
+    result = await core.list_namespaced_pod(namespace, label_selector=label_selector)
+    return result.items
+
+async def exec_in_pod(
+    namespace: str,
+    pod: str,
+    command: List[str],
+    container: Optional[str] = None,
+    stdin: Optional[bytes] = None,
+    timeout: float = 600,
+) -> str:
+    """
+    Run a command in a pod over the exec websocket and return its stdout.
+    Raises KubernetesExecError on a non-zero exit code or a missing exit status.
+    """
+    core = client.CoreV1Api(await get_ws_client())
+    kwargs = {"command": command, "stderr": True, "stdout": True, "stdin": stdin is not None, "tty": False}
+    if container:
+        kwargs["container"] = container
+
+    stdout, stderr, status = [], [], None
+
+    async def _run():
+        nonlocal status
+        websocket = await core.connect_get_namespaced_pod_exec(pod, namespace, _preload_content=False, **kwargs)
+        async with websocket as ws:
+            if stdin is not None:
+                for i in range(0, len(stdin), 64 * 1024):
+                    await ws.send_bytes(bytes([STDIN_CHANNEL]) + stdin[i:i + 64 * 1024])
+            async for msg in ws:
+                data = msg.data
+                if not isinstance(data, bytes) or not data:
+                    continue
+                channel, payload = data[0], data[1:]
+                if channel == STDOUT_CHANNEL:
+                    stdout.append(payload)
+                elif channel == STDERR_CHANNEL:
+                    stderr.append(payload)
+                elif channel == ERROR_CHANNEL and payload:
+                    status = json.loads(payload.decode())
+
+    await asyncio.wait_for(_run(), timeout=timeout)
+
+    output = b"".join(stdout).decode(errors="replace").strip()
+    # The API server always ends an exec with a status frame; a stream that
+    # closes without one (dropped connection, killed container) did not succeed
+    if not status or status.get("status") != "Success":
+        error = b"".join(stderr).decode(errors="replace").strip()
+        message = status.get("message") if status else "exec stream closed without a status"
+        raise KubernetesExecError(error or message or output)
+    return output
+
+async def upload_to_pod(namespace: str, pod: str, path: str, data: bytes, container: Optional[str] = None):
+    """
+    Write bytes to a file in the pod over exec stdin. `head -c` consumes exactly
+    len(data) bytes, so no stdin close frame is needed.
+    """
+    await exec_in_pod(namespace, pod, ["sh", "-c", f"head -c {len(data)} > {shlex.quote(path)}"], container=container, stdin=data)
+
+def _resource_path(manifest: Dict[str, Any]) -> Tuple[str, str]:
+    api_version = manifest["apiVersion"]
+    kind = manifest["kind"]
+    plural, namespaced = KIND_RESOURCES.get(kind, (kind.lower() + "s", True))
+    base = f"/api/{api_version}" if "/" not in api_version else f"/apis/{api_version}"
+    name = manifest["metadata"]["name"]
+    if namespaced:
+        return base, f"/namespaces/{manifest['metadata']['namespace']}/{plural}/{name}"
+    return base, f"/{plural}/{name}"
+
+async def apply_manifest(manifest: Dict[str, Any], force: bool = True) -> Dict[str, Any]:
+    """
+    Server-side apply a single manifest (the in-process equivalent of kubectl apply).
+    """
+    api = await get_api_client()
+    base, path = _resource_path(manifest)
+    return await api.call_api(
+        base + path, "PATCH",
+        query_params=[("fieldManager", FIELD_MANAGER), ("force", str(force).lower())],
+        header_params={"Content-Type": "application/apply-patch+yaml", "Accept": "application/json"},
+        body=manifest,
+        auth_settings=["BearerToken"],
+        response_types_map={200: "object", 201: "object"},
+        _return_http_data_only=True,
+    )
 
 async def get_store_urls(namespace: str) -> Tuple[Optional[str], Optional[str]]:
     """
@@ -21,20 +187,12 @@ async def get_store_urls(namespace: str) -> Tuple[Optional[str], Optional[str]]:
     """
     # This is a bit tricky depending on how ingress is set up.
     # We can inspect the ingress object.
-    
-    cmd = ["kubectl", "get", "ingress", "-n", namespace, "-o", "jsonpath='{.items[0].spec.rules[*].host}'"]
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        shell=True # Shell=True needed for complex jsonpath sometimes, but be careful
-    )
-    
+
     # Actually, simpler to just reconstruct it if we know the domain.
     # But let's try to get it from k8s to be sure.
-    
-    # For now, let's return None and rely on the Orchestrator to construct them 
+
+    # For now, let's return None and rely on the Orchestrator to construct them
     # based on the convention: namespace.k8s.local and namespace-admin.k8s.local
     # fetching from k8s is safer but requires parsing.
-    
+
     return None, None
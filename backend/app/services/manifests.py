@@ -0,0 +1,152 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+import structlog
+import yaml
+from app.config import settings
+from app.services.kubernetes import apply_manifest
+
+logger = structlog.get_logger()
+
+class ManifestRenderError(Exception):
+    pass
+
+# Per-store fields are rendered as these tokens and substituted at apply time.
+# Tokens are valid DNS labels so names built from them still render.
+PLACEHOLDERS = {
+    "namespace": "urumi-ph-namespace",
+    "store_id": "urumi-ph-store-id",
+    "store_name": "urumi-ph-store-name",
+    "host": "urumi-ph-host",
+    "admin_user": "urumi-ph-admin-user",
+    "admin_password": "urumi-ph-admin-password",
+    "admin_email": "urumi-ph-admin-email",
+    "db_password": "urumi-ph-db-password",
+    "root_password": "urumi-ph-root-password",
+    # Shared MariaDB tenancy only (externalDatabase.*)
+    "db_host": "urumi-ph-db-host",
+    "db_port": "urumi-ph-db-port",
+    "db_name": "urumi-ph-db-name",
+    "db_user": "urumi-ph-db-user",
+}
+
+# Applied in two waves: everything pods depend on, then the workloads
+WORKLOAD_KINDS = {"Deployment", "StatefulSet", "Ingress"}
+
+# chart fingerprint -> rendered documents (with placeholders)
+_rendered: Dict[str, List[Dict[str, Any]]] = {}
+_render_lock = asyncio.Lock()
+
+def placeholder_values(static_values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chart values with every per-store field replaced by its placeholder.
+    `static_values` (resources, sizes) are shared by all stores and become
+    part of the render cache key.
+    """
+    values = copy.deepcopy(static_values)
+    values["storeId"] = PLACEHOLDERS["store_id"]
+    values["storeName"] = PLACEHOLDERS["store_name"]
+    values["domain"] = PLACEHOLDERS["host"]
+    wordpress = values.setdefault("wordpress", {})
+    wordpress.update(
+        adminUser=PLACEHOLDERS["admin_user"],
+        adminPassword=PLACEHOLDERS["admin_password"],
+        adminEmail=PLACEHOLDERS["admin_email"],
+    )
+    mysql = values.setdefault("mysql", {})
+    mysql.update(password=PLACEHOLDERS["db_password"], rootPassword=PLACEHOLDERS["root_password"])
+    values["externalDatabase"] = {
+        "host": PLACEHOLDERS["db_host"],
+        "port": PLACEHOLDERS["db_port"],
+        "user": PLACEHOLDERS["db_user"],
+        "database": PLACEHOLDERS["db_name"],
+    }
+    ingress = values.setdefault("ingress", {})
+    ingress["hosts"] = [{"host": PLACEHOLDERS["host"], "paths": [{"path": "/", "pathType": "ImplementationSpecific"}]}]
+    return values
+
+def chart_fingerprint(chart_dir: str, values: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    root = Path(chart_dir)
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        h.update(str(path.relative_to(root)).encode())
+        h.update(path.read_bytes())
+    h.update(json.dumps(values, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+async def _helm_template(chart_dir: str, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    cmd = [
+        "helm", "template", "store", chart_dir,
+        "--namespace", PLACEHOLDERS["namespace"],
+        "--values", "-",
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate(input=yaml.safe_dump(values).encode())
+    if process.returncode != 0:
+        raise ManifestRenderError(stderr.decode())
+    return [doc for doc in yaml.safe_load_all(stdout.decode()) if doc]
+
+async def render_chart(chart_dir: str, static_values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Render the store chart once per chart content + static values and cache the
+    placeholder manifests in memory and under STORE_ENGINE_RENDER_DIR, so a
+    restarted operator does not need to render again.
+    """
+    values = placeholder_values(static_values)
+    key = chart_fingerprint(chart_dir, values)
+    if key in _rendered:
+        return _rendered[key]
+
+    async with _render_lock:
+        if key in _rendered:
+            return _rendered[key]
+
+        cache_file = Path(settings.STORE_ENGINE_RENDER_DIR) / f"{key}.json"
+        try:
+            docs = json.loads(cache_file.read_text())
+        except (OSError, ValueError):
+            started = time.monotonic()
+            docs = await _helm_template(chart_dir, values)
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(docs))
+            os.replace(tmp, cache_file)
+            logger.info("store_chart_rendered", chart=chart_dir, fingerprint=key, documents=len(docs), seconds=round(time.monotonic() - started, 2))
+
+        _rendered[key] = docs
+        return docs
+
+def personalize(docs: List[Dict[str, Any]], store_values: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Substitute per-store values for the placeholders. Values are JSON-escaped
+    so any character is safe inside the rendered strings. Fields a chart mode
+    does not use may be omitted.
+    """
+    text = json.dumps(docs)
+    # Longest token first so no placeholder is a prefix-match of another
+    for field, token in sorted(PLACEHOLDERS.items(), key=lambda item: -len(item[1])):
+        text = text.replace(token, json.dumps(str(store_values.get(field, "")))[1:-1])
+    return json.loads(text)
+
+async def apply_store_manifests(chart_dir: str, static_values: Dict[str, Any], store_values: Dict[str, str]) -> int:
+    """
+    Render (cached) and server-side apply the store chart for one store.
+    Returns the number of objects applied.
+    """
+    docs = personalize(await render_chart(chart_dir, static_values), store_values)
+    supporting = [d for d in docs if d["kind"] not in WORKLOAD_KINDS]
+    workloads = [d for d in docs if d["kind"] in WORKLOAD_KINDS]
+    for wave in (supporting, workloads):
+        await asyncio.gather(*(apply_manifest(doc) for doc in wave))
+    logger.info("store_manifests_applied", namespace=store_values["namespace"], objects=len(docs))
+    return len(docs)
@@ -4,7 +4,8 @@ import datetime
 import secrets
 import asyncio
 from kubernetes import client, config
-from sqlalchemy import select
+from kubernetes.client.rest import ApiException
+from sqlalchemy import select, update, delete, case
 from app.models import Store, AuditLog
 from app.config import settings
 
@@ -37,25 +38,28 @@ async def provision_store(store_id: uuid.UUID):
             logger.error("store_not_found", store_id=str(store_id))
             return
 
-        # 2. Update Status
-        store.status = "provisioning_requested"
-        store.provisioning_started_at = datetime.datetime.now(datetime.timezone.utc)
-        await db.commit()
-        
-        # 3. Create CR
+        # Queue-mode admission: hold the store until the cluster has room
+        from app.services.capacity import STATUS_WAITING, admit_waiting_store
+        if store.status == STATUS_WAITING:
+            if not await admit_waiting_store(db, store):
+                from app.services.jobs import enqueue_job
+                enqueue_job(db, "provision_store", store.id, delay_seconds=settings.CAPACITY_QUEUE_RECHECK_SECONDS)
+                await db.commit()
+                logger.info("store_waiting_capacity", store_id=str(store_id))
+                return
+            # Commit the admission now: it releases the admission lock before
+            # the CR round trip, and a retry of this job skips the queue
+            store.status = "requested"
+            await db.commit()
+
+        # 2. Create CR. The store row, its audit entry and this job (the
+        # outbox record) were committed together by the API; this worker is
+        # the relay, and everything it records lands in one commit after the CR exists.
+        started_at = datetime.datetime.now(datetime.timezone.utc)
         try:
             api = client.CustomObjectsApi()
-            
-            # Use defaults / secrets
-            # We don't store passwords in DB usually, generate them here and pass to Operator?
-            # Or generate in Operator.
-            # If we generate here, we can save them?
-            # Existing logic generated them in Orchestrator.
-            # If Operator generates them, it updates DB?
-            # Operator `handlers.py` updates DB.
-            # So let Operator generate them.
-            
-            # Generate Passwords
+
+            # Passwords go to the Operator through the CR spec
             admin_password = secrets.token_urlsafe(16)
             db_password = secrets.token_urlsafe(16)
 
@@ -67,26 +71,23 @@ async def provision_store(store_id: uuid.UUID):
                     "namespace": "urumi-platform", # Operator watches this namespace
                     "labels": {
                         "store_id": str(store.id),
-                        "managed-by": "urumi-api"
+                        "managed-by": "urumi-api",
+                        "tenant": str(store.user_id) if store.user_id else "default",
+                        "urumi.io/pool": "true" if store.pool_state else "false"
                     }
                 },
                 "spec": {
                     "name": store.name,
                     "engine": store.engine,
                     "namespace": store.namespace, # Target namespace for resources
-                    "namespace": store.namespace, # Target namespace for resources
                     "adminUser": "admin",
                     "adminPassword": admin_password,
                     "dbUser": "urumi",
                     "dbPassword": db_password
                 }
             }
-            
-            # Save admin password immediately
-            store.admin_password = admin_password
-            await db.commit()
-            
-            # Sync wrapper
+
+            # Sync wrappers
             def create_cr():
                 return api.create_namespaced_custom_object(
                     group="urumi.io",
@@ -95,13 +96,99 @@ async def provision_store(store_id: uuid.UUID):
                     plural="stores",
                     body=resource_body
                 )
-            
-            await asyncio.to_thread(create_cr)
-            
-            # Log
+
+            def get_cr():
+                return api.get_namespaced_custom_object(
+                    group="urumi.io",
+                    version="v1",
+                    namespace="urumi-platform",
+                    plural="stores",
+                    name=store.namespace
+                )
+
+            try:
+                await asyncio.to_thread(create_cr)
+            except ApiException as e:
+                # A retried job may find the CR from an earlier attempt; keep
+                # the password it was created with
+                if e.status != 409:
+                    raise
+                existing = await asyncio.to_thread(get_cr)
+                admin_password = existing.get("spec", {}).get("adminPassword") or admin_password
+                logger.info("cr_already_exists", store_id=str(store.id))
+
+            # 3. Record it. The Operator may already have moved the store on
+            # to 'provisioning'; only a store still waiting on us changes status.
+            pending = Store.status.in_(["requested", STATUS_WAITING])
+            await db.execute(
+                update(Store)
+                .where(Store.id == store.id)
+                .values(
+                    admin_password=admin_password,
+                    status=case((pending, "provisioning_requested"), else_=Store.status),
+                    provisioning_started_at=case((pending, started_at), else_=Store.provisioning_started_at),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.add(AuditLog(
+                action="operator.cr_created",
+                resource_type="store",
+                resource_id=str(store.id),
+                metadata_={"crd": store.namespace}
+            ))
+            await db.commit()
+
+        except Exception as e:
+            # Re-raised so the job queue retries; the final attempt marks the store failed
+            logger.error("cr_creation_failed", error=str(e))
+            await db.rollback()
+            await db.execute(update(Store).where(Store.id == store_id).values(error_message=str(e)))
+            await db.commit()
+            raise
+
+async def personalize_store(store_id: uuid.UUID):
+    """
+    Hand a claimed warm-pool store over to its new owner.
+    Patches the 'Store' Custom Resource; the Operator applies the changes in-pod.
+    """
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        stmt = select(Store).where(Store.id == store_id)
+        result = await db.execute(stmt)
+        store = result.scalars().first()
+
+        if not store: return
+
+        try:
+            api = client.CustomObjectsApi()
+
+            body = {
+                "metadata": {"labels": {"urumi.io/pool": "claimed"}},
+                "spec": {
+                    "name": store.name,
+                    "personalize": {
+                        "name": store.name,
+                        "adminPassword": store.admin_password,
+                        "requestedAt": datetime.datetime.now(datetime.timezone.utc).isoformat()
+                    }
+                }
+            }
+
+            def patch_cr():
+                return api.patch_namespaced_custom_object(
+                    group="urumi.io",
+                    version="v1",
+                    namespace="urumi-platform",
+                    plural="stores",
+                    name=store.namespace,
+                    body=body
+                )
+
+            await asyncio.to_thread(patch_cr)
+
             log = AuditLog(
-                action="operator.cr_created", 
-                resource_type="store", 
+                action="operator.cr_personalize_requested",
+                resource_type="store",
                 resource_id=str(store.id),
                 metadata_={"crd": store.namespace}
             )
@@ -109,10 +196,10 @@ async def provision_store(store_id: uuid.UUID):
             await db.commit()
 
         except Exception as e:
-            logger.error("cr_creation_failed", error=str(e))
-            store.status = "failed"
+            logger.error("cr_personalize_failed", error=str(e))
             store.error_message = str(e)
             await db.commit()
+            raise
 
 async def deprovision_store(store_id: uuid.UUID):
     """
@@ -126,7 +213,7 @@ async def deprovision_store(store_id: uuid.UUID):
         store = result.scalars().first()
         
         if not store: return
-        
+
         crd_name = store.namespace
         
         try:
@@ -142,28 +229,18 @@ async def deprovision_store(store_id: uuid.UUID):
                 )
             
             await asyncio.to_thread(delete_cr)
-            
-            # DB deletion is handled after CR deletion? 
-            # Or allow Operator to "finalize"?
-            # For "3 days" approach: Delete CR, then Delete DB immediately?
-            # Operator handles k8s cleanup asynchronously.
-            # We mark store as "deleting" in DB.
-            
-            # Actually, `api/stores.py` calls this and then deletes from DB?
-            # Check usage.
-            # If we delete from DB, audit log for Operator won't work (no foreign key).
-            # But `deprovision_store` in old Logic updated DB.
-            # Let's keep store but mark "deleting".
-            # Clean up DB when Operator finishes?
-            # Operator doesn't know about DB entry removal request.
-            # Simple: Delete CR, Delete DB. Operator cleans up K8s eventually.
-            # Audit logs are kept?
-            
-            await db.delete(store)
-            await db.commit()
-            
-        except Exception as e:
-             # If CR not found, proceed to delete DB
-             logger.error("cr_delete_failed", error=str(e))
-             await db.delete(store)
-             await db.commit()
+        except ApiException as e:
+            # Only a CR that is already gone lets the row go; anything else
+            # (unreachable, 403, 5xx) is retried by the job queue so the
+            # namespace and tenant database are not orphaned
+            if e.status != 404:
+                logger.error("cr_delete_failed", error=str(e))
+                raise
+            logger.info("cr_already_deleted", store_id=str(store.id))
+
+        # One transaction: quota (a no-op when the delete request already
+        # released the slot) and the row itself
+        from app.services.quota import release_quota
+        await release_quota(db, store.id)
+        await db.execute(delete(Store).where(Store.id == store.id))
+        await db.commit()
@@ -0,0 +1,124 @@
+import collections
+import uuid
+from typing import List, Optional
+import structlog
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Store, QuotaUsage
+from app.config import settings
+
+logger = structlog.get_logger()
+
+def tenant_key(user_id: Optional[uuid.UUID]) -> str:
+    # Same tenant label the Store CR carries
+    return str(user_id) if user_id else "default"
+
+async def reserve_quota(db: AsyncSession, store: Store, enforce: bool = True) -> bool:
+    """
+    Take one quota slot for `store` in the caller's transaction. The counter
+    row is incremented only while under the limit; the upsert locks the row,
+    so concurrent creates for one tenant serialize here and cannot overshoot.
+    `enforce=False` records a store that is already running (operator retry).
+    Pool instances never hold quota. The caller commits.
+    """
+    if store.quota_reserved or store.pool_state:
+        return True
+    limit = settings.MAX_STORES_PER_USER
+    if enforce and limit < 1:
+        return False
+
+    stmt = insert(QuotaUsage).values(tenant=tenant_key(store.user_id), used=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[QuotaUsage.tenant],
+        set_={"used": QuotaUsage.used + 1, "updated_at": func.now()},
+        where=(QuotaUsage.used < limit) if enforce else None,
+    ).returning(QuotaUsage.used)
+    result = await db.execute(stmt)
+    if result.first() is None:
+        return False
+    store.quota_reserved = True
+    return True
+
+async def release_quota(db: AsyncSession, store_id: uuid.UUID) -> bool:
+    """
+    Give back the store's slot, at most once: the flag flip and the decrement
+    happen in the caller's transaction. The caller commits.
+    """
+    result = await db.execute(
+        update(Store)
+        .where(Store.id == store_id, Store.quota_reserved.is_(True))
+        .values(quota_reserved=False)
+        .returning(Store.user_id)
+    )
+    row = result.first()
+    if row is None:
+        return False
+    await db.execute(
+        update(QuotaUsage)
+        .where(QuotaUsage.tenant == tenant_key(row.user_id))
+        .values(used=func.greatest(QuotaUsage.used - 1, 0), updated_at=func.now())
+    )
+    logger.info("quota_released", store_id=str(store_id))
+    return True
+
+async def reserve_quota_slots(db: AsyncSession, user_id: Optional[uuid.UUID], count: int) -> int:
+    """
+    Take up to `count` slots for one tenant at once; returns how many were
+    granted. The counter row is locked for the rest of the caller's
+    transaction, so concurrent batches and single creates cannot overshoot.
+    The caller marks the stores quota_reserved and commits.
+    """
+    limit = settings.MAX_STORES_PER_USER
+    if count < 1 or limit < 1:
+        return 0
+    tenant = tenant_key(user_id)
+    await db.execute(insert(QuotaUsage).values(tenant=tenant, used=0).on_conflict_do_nothing())
+    result = await db.execute(select(QuotaUsage.used).where(QuotaUsage.tenant == tenant).with_for_update())
+    granted = max(0, min(count, limit - (result.scalar() or 0)))
+    if granted:
+        await db.execute(
+            update(QuotaUsage)
+            .where(QuotaUsage.tenant == tenant)
+            .values(used=QuotaUsage.used + granted, updated_at=func.now())
+        )
+    return granted
+
+async def release_quota_slots(db: AsyncSession, user_id: Optional[uuid.UUID], count: int):
+    """
+    Hand back slots taken by reserve_quota_slots that no store ended up
+    using. The caller commits.
+    """
+    if count < 1:
+        return
+    await db.execute(
+        update(QuotaUsage)
+        .where(QuotaUsage.tenant == tenant_key(user_id))
+        .values(used=func.greatest(QuotaUsage.used - count, 0), updated_at=func.now())
+    )
+
+async def release_quota_many(db: AsyncSession, store_ids: List[uuid.UUID]) -> int:
+    """
+    Bulk release_quota: one flag update plus one decrement per tenant.
+    The caller commits.
+    """
+    if not store_ids:
+        return 0
+    result = await db.execute(
+        update(Store)
+        .where(Store.id.in_(store_ids), Store.quota_reserved.is_(True))
+        .values(quota_reserved=False)
+        .returning(Store.user_id)
+    )
+    released = collections.Counter(tenant_key(row.user_id) for row in result.all())
+    for tenant, count in released.items():
+        await db.execute(
+            update(QuotaUsage)
+            .where(QuotaUsage.tenant == tenant)
+            .values(used=func.greatest(QuotaUsage.used - count, 0), updated_at=func.now())
+        )
+    return sum(released.values())
+
+async def quota_used(db: AsyncSession, user_id: Optional[uuid.UUID]) -> int:
+    result = await db.execute(select(QuotaUsage.used).where(QuotaUsage.tenant == tenant_key(user_id)))
+    return result.scalar() or 0
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import aiomysql
+import structlog
+from sqlalchemy import select, func
+from app.models import TenantDatabase
+from app.config import settings
+
+logger = structlog.get_logger()
+
+class SharedDbCapacityError(Exception):
+    pass
+
+# Serializes placement so concurrent provisions in this operator spread out
+_placement_lock = asyncio.Lock()
+
+def shared_instances() -> List[str]:
+    return [i.strip() for i in settings.SHARED_DB_INSTANCES.split(",") if i.strip()]
+
+def _host_port(instance: str) -> Tuple[str, int]:
+    host, _, port = instance.partition(":")
+    return host, int(port or 3306)
+
+def tenant_identifiers(namespace: str) -> Tuple[str, str]:
+    """
+    Database and user names for a store. Namespaces are store-<hex>, so the
+    result is always a plain identifier within MariaDB's length limits.
+    """
+    ident = re.sub(r"[^a-z0-9_]", "_", namespace.lower())
+    return f"wp_{ident}"[:64], f"u_{ident}"[:32]
+
+async def _execute(instance: str, statements: List[Tuple[str, Optional[tuple]]]):
+    host, port = _host_port(instance)
+    conn = await aiomysql.connect(
+        host=host, port=port,
+        user=settings.SHARED_DB_ADMIN_USER, password=settings.SHARED_DB_ADMIN_PASSWORD,
+        autocommit=True, connect_timeout=10,
+    )
+    try:
+        async with conn.cursor() as cur:
+            for sql, args in statements:
+                await cur.execute(sql, args)
+    finally:
+        conn.close()
+
+async def _place(db) -> str:
+    """
+    Least-loaded shared instance with room for another tenant.
+    """
+    instances = shared_instances()
+    if not instances:
+        raise SharedDbCapacityError("STORE_DB_MODE=shared but SHARED_DB_INSTANCES is empty")
+    rows = await db.execute(
+        select(TenantDatabase.instance, func.count())
+        .where(TenantDatabase.dropped_at.is_(None))
+        .group_by(TenantDatabase.instance)
+    )
+    load = {instance: 0 for instance in instances}
+    load.update({instance: count for instance, count in rows.all() if instance in load})
+    instance = min(instances, key=lambda i: load[i])
+    if load[instance] >= settings.SHARED_DB_MAX_TENANTS_PER_INSTANCE:
+        raise SharedDbCapacityError(f"All {len(instances)} shared database instances are full")
+    return instance
+
+async def provision_tenant_database(namespace: str, store_id: Optional[uuid.UUID], password: str) -> Dict[str, Any]:
+    """
+    Create (or re-sync) the store's database and user on a shared MariaDB
+    instance. Idempotent: a retried provision reuses the recorded placement
+    and resets the password to the one in the Store spec.
+    """
+    from app.database import AsyncSessionLocal
+    database, user = tenant_identifiers(namespace)
+    async with AsyncSessionLocal() as db:
+        async with _placement_lock:
+            result = await db.execute(select(TenantDatabase).where(TenantDatabase.namespace == namespace))
+            tenant = result.scalars().first()
+            if tenant is None or tenant.dropped_at is not None:
+                instance = await _place(db)
+                if tenant is None:
+                    tenant = TenantDatabase(namespace=namespace)
+                    db.add(tenant)
+                tenant.store_id = store_id
+                tenant.instance = instance
+                tenant.database_name = database
+                tenant.username = user
+                tenant.dropped_at = None
+                await db.commit()
+
+        await _execute(tenant.instance, [
+            (f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci", None),
+            ("CREATE USER IF NOT EXISTS %s@'%%' IDENTIFIED BY %s", (user, password)),
+            (f"ALTER USER %s@'%%' IDENTIFIED BY %s WITH MAX_USER_CONNECTIONS {int(settings.SHARED_DB_MAX_USER_CONNECTIONS)}", (user, password)),
+            (f"GRANT ALL PRIVILEGES ON `{database}`.* TO %s@'%%'", (user,)),
+        ])
+        host, port = _host_port(tenant.instance)
+        logger.info("tenant_database_ready", namespace=namespace, instance=tenant.instance, database=database)
+        return {"host": host, "port": port, "database": database, "user": user}
+
+async def drop_tenant_database(namespace: str) -> bool:
+    """
+    Drop a store's database and user. Returns False if the store never had
+    a shared database.
+    """
+    from app.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(TenantDatabase).where(TenantDatabase.namespace == namespace, TenantDatabase.dropped_at.is_(None))
+        )
+        tenant = result.scalars().first()
+        if tenant is None:
+            return False
+        await _execute(tenant.instance, [
+            (f"DROP DATABASE IF EXISTS `{tenant.database_name}`", None),
+            ("DROP USER IF EXISTS %s@'%%'", (tenant.username,)),
+        ])
+        tenant.dropped_at = datetime.datetime.now(datetime.timezone.utc)
+        await db.commit()
+        logger.info("tenant_database_dropped", namespace=namespace, instance=tenant.instance, database=tenant.database_name)
+        return True
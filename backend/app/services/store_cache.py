@@ -0,0 +1,103 @@
+import collections
+import hashlib
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+import structlog
+from prometheus_client import Counter
+from app.config import settings
+
+logger = structlog.get_logger()
+
+CACHE_REQUESTS = Counter("urumi_store_cache_requests_total", "Store read cache lookups", ["kind", "result"])
+
+class StoreReadCache:
+    """
+    Serialized store documents (by id) and list pages (by query), each with a
+    strong ETag. Entries are dropped when store_events reports a change, so a
+    hit never reaches the database or re-serializes; STORE_CACHE_TTL_SECONDS
+    bounds staleness if a notification is ever missed.
+
+    A generation counter guards fills: a read that started before an
+    invalidation does not store its (possibly stale) result.
+    """
+    def __init__(self, ttl: float, max_lists: int):
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self.docs: Dict[str, Tuple[float, str, bytes]] = {}
+        self.lists: "collections.OrderedDict[Tuple, Tuple[float, str, bytes, Optional[str]]]" = collections.OrderedDict()
+        self.doc_generation: Dict[str, int] = collections.Counter()
+        self.list_generation = 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return time.monotonic() - stored_at < self.ttl
+
+    def get_doc(self, store_id: uuid.UUID) -> Optional[Tuple[str, bytes]]:
+        entry = self.docs.get(str(store_id))
+        if entry and self._fresh(entry[0]):
+            CACHE_REQUESTS.labels(kind="store", result="hit").inc()
+            return entry[1], entry[2]
+        CACHE_REQUESTS.labels(kind="store", result="miss").inc()
+        return None
+
+    def doc_token(self, store_id: uuid.UUID) -> int:
+        return self.doc_generation[str(store_id)]
+
+    def put_doc(self, store_id: uuid.UUID, token: int, etag: str, body: bytes):
+        if self.doc_generation[str(store_id)] == token:
+            self.docs[str(store_id)] = (time.monotonic(), etag, body)
+
+    def get_list(self, key: Tuple) -> Optional[Tuple[str, bytes, Optional[str]]]:
+        entry = self.lists.get(key)
+        if entry and self._fresh(entry[0]):
+            self.lists.move_to_end(key)
+            CACHE_REQUESTS.labels(kind="list", result="hit").inc()
+            return entry[1], entry[2], entry[3]
+        CACHE_REQUESTS.labels(kind="list", result="miss").inc()
+        return None
+
+    def list_token(self) -> int:
+        return self.list_generation
+
+    def put_list(self, key: Tuple, token: int, etag: str, body: bytes, next_cursor: Optional[str]):
+        if self.list_generation != token:
+            return
+        self.lists[key] = (time.monotonic(), etag, body, next_cursor)
+        self.lists.move_to_end(key)
+        while len(self.lists) > self.max_lists:
+            self.lists.popitem(last=False)
+
+    def invalidate(self, store_id: Optional[uuid.UUID] = None):
+        """Drop one store (and every list page), or everything."""
+        if store_id is None:
+            for key in list(self.doc_generation):
+                self.doc_generation[key] += 1
+            self.docs.clear()
+        else:
+            self.doc_generation[str(store_id)] += 1
+            self.docs.pop(str(store_id), None)
+        self.list_generation += 1
+        self.lists.clear()
+
+    def on_event(self, event: Dict[str, Any]):
+        if event.get("type") == "reset":
+            self.invalidate()
+        elif event.get("type") == "status" and event.get("store_id"):
+            self.invalidate(uuid.UUID(event["store_id"]))
+
+def doc_etag(store_id: uuid.UUID, updated_at) -> str:
+    return f'"{store_id}-{int(updated_at.timestamp() * 1_000_000)}"'
+
+def list_etag(rows: Iterable[Tuple[uuid.UUID, Any]], next_cursor: Optional[str]) -> str:
+    h = hashlib.sha256()
+    for store_id, updated_at in rows:
+        h.update(f"{store_id}:{updated_at.timestamp()};".encode())
+    h.update((next_cursor or "").encode())
+    return f'"{h.hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+store_cache = StoreReadCache(settings.STORE_CACHE_TTL_SECONDS, settings.STORE_CACHE_MAX_LISTS)
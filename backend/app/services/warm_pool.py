@@ -0,0 +1,118 @@
+import datetime
+import secrets
+import uuid
+from typing import List, Optional
+import structlog
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Store, AuditLog
+from app.config import settings
+
+logger = structlog.get_logger()
+
+# Store.pool_state values. Customer stores have pool_state NULL.
+POOL_WARMING = "warming"      # provisioning as a generic pool instance
+POOL_AVAILABLE = "available"  # ready and waiting to be claimed
+
+def pool_engines():
+    return [e.strip() for e in settings.WARM_POOL_ENGINES.split(",") if e.strip()]
+
+async def claim_pooled_stores(db: AsyncSession, names: List[str], engine: str) -> List[Store]:
+    """
+    Atomically take up to len(names) ready pool instances for `engine` and
+    turn them into customer stores, in order. SKIP LOCKED lets concurrent
+    creates each claim different instances. The caller commits.
+    """
+    if not names:
+        return []
+    stmt = (
+        select(Store)
+        .where(Store.pool_state == POOL_AVAILABLE, Store.engine == engine, Store.status == "ready")
+        .order_by(Store.created_at)
+        .limit(len(names))
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(stmt)
+    stores = result.scalars().all()
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for store, name in zip(stores, names):
+        store.name = name
+        store.pool_state = None
+        store.status = "personalizing"
+        store.admin_password = secrets.token_urlsafe(16)
+        store.error_message = None
+        store.provisioning_started_at = now
+        store.provisioning_completed_at = None
+        store.created_at = now
+        # Set here rather than by onupdate, so callers can return the row without a refresh
+        store.updated_at = now
+        logger.info("pool_store_claimed", store_id=str(store.id), namespace=store.namespace, engine=engine)
+    return list(stores)
+
+async def claim_pooled_store(db: AsyncSession, name: str, engine: str) -> Optional[Store]:
+    """
+    Claim a single pool instance (see claim_pooled_stores). The caller commits.
+    """
+    claimed = await claim_pooled_stores(db, [name], engine)
+    return claimed[0] if claimed else None
+
+async def replenish_pool():
+    """
+    Top the warm pool up to WARM_POOL_SIZE per engine and clean out pool
+    instances that failed to provision.
+    """
+    from app.database import AsyncSessionLocal
+    from app.services.jobs import enqueue_job
+
+    async with AsyncSessionLocal() as db:
+        failed = await db.execute(
+            select(Store).where(Store.pool_state.isnot(None), Store.status == "failed")
+        )
+        for store in failed.scalars().all():
+            logger.info("pool_store_discarded", store_id=str(store.id))
+            store.status = "deleting"
+            enqueue_job(db, "deprovision_store", store.id)
+
+        # Pool refills must not eat the headroom customer creates need
+        from app.services.capacity import get_headroom
+        headroom = None
+        if settings.CAPACITY_ADMISSION_MODE != "off":
+            headroom = await get_headroom(db)
+        budget = headroom["free_stores"] - headroom["waiting_stores"] - 1 if headroom else None
+
+        new_ids = []
+        for engine in pool_engines():
+            result = await db.execute(
+                select(func.count()).select_from(Store).where(
+                    Store.pool_state.in_([POOL_WARMING, POOL_AVAILABLE]),
+                    Store.engine == engine,
+                    Store.status.notin_(["failed", "deleting"]),
+                )
+            )
+            deficit = settings.WARM_POOL_SIZE - (result.scalar() or 0)
+            if budget is not None:
+                deficit = min(deficit, budget - len(new_ids))
+            for _ in range(max(0, deficit)):
+                suffix = str(uuid.uuid4())[:8]
+                store = Store(
+                    name=f"pool-{suffix}",
+                    engine=engine,
+                    status="requested",
+                    namespace=f"store-{suffix}",
+                    pool_state=POOL_WARMING,
+                )
+                db.add(store)
+                await db.flush()
+                db.add(AuditLog(
+                    action="system.pool_refill",
+                    resource_type="store",
+                    resource_id=str(store.id),
+                    metadata_={"engine": engine},
+                ))
+                enqueue_job(db, "provision_store", store.id)
+                new_ids.append(store.id)
+        await db.commit()
+
+    if new_ids:
+        logger.info("pool_replenished", created=len(new_ids))
@@ -0,0 +1,23 @@
+import base64
+import datetime
+import json
+import uuid
+from typing import Tuple
+
+def encode_cursor(created_at: datetime.datetime, row_id: uuid.UUID) -> str:
+    """
+    Opaque keyset cursor for (created_at, id) ordered listings.
+    """
+    raw = json.dumps([created_at.isoformat(), str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, uuid.UUID]:
+    """
+    Inverse of encode_cursor. Raises ValueError on anything malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
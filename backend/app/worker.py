@@ -0,0 +1,37 @@
+import asyncio
+import signal
+import structlog
+from app.config import settings
+from app.services.jobs import run_worker
+
+structlog.configure(
+    processors=[
+        structlog.processors.JSONRenderer()
+    ]
+)
+logger = structlog.get_logger()
+
+async def main():
+    """
+    Standalone provisioning worker: `python -m app.worker`.
+    Scale throughput by running more replicas or raising JOB_WORKER_CONCURRENCY.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    from app.database import engine, Base
+    from app.models import Store, AuditLog, Job, TenantDatabase, QuotaUsage # Import models to register them
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        from app.services.audit_partitions import ensure_audit_partitions
+        await ensure_audit_partitions(conn)
+        from app.services.jobs import install_job_triggers
+        await install_job_triggers(conn)
+
+    logger.info("worker_startup", environment=settings.ENVIRONMENT, concurrency=settings.JOB_WORKER_CONCURRENCY)
+    await run_worker(stop=stop)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,10 +2,49 @@ from app.database import engine
 from sqlalchemy import text
 import asyncio
 
+# Columns added after the initial schema (create_all does not alter existing tables)
+MIGRATIONS = [
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS admin_password VARCHAR(255)",
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS provisioning_stages JSONB",
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS pool_state VARCHAR(20)",
+    "CREATE INDEX IF NOT EXISTS idx_stores_pool_state ON stores (pool_state, engine) WHERE pool_state IS NOT NULL",
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMPTZ",
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS hibernated_at TIMESTAMPTZ",
+    # Keyset listing indexes; the composites supersede the single-column ones
+    "CREATE INDEX IF NOT EXISTS idx_stores_created_id ON stores (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_stores_status_created_id ON stores (status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_stores_engine_created_id ON stores (engine, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_stores_user_created_id ON stores (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_stores_name_prefix ON stores (name varchar_pattern_ops)",
+    "DROP INDEX IF EXISTS idx_stores_status",
+    "DROP INDEX IF EXISTS idx_stores_user_id",
+    # Quota counters: backfill from the stores that count against quota today
+    "ALTER TABLE stores ADD COLUMN IF NOT EXISTS quota_reserved BOOLEAN NOT NULL DEFAULT false",
+    "CREATE TABLE IF NOT EXISTS quota_usage (tenant VARCHAR(255) PRIMARY KEY, used INTEGER NOT NULL DEFAULT 0, updated_at TIMESTAMPTZ DEFAULT now())",
+    "UPDATE stores SET quota_reserved = true WHERE pool_state IS NULL AND status NOT IN ('failed', 'deleting') AND NOT quota_reserved",
+    "INSERT INTO quota_usage (tenant, used) SELECT COALESCE(user_id::text, 'default'), count(*) FROM stores WHERE quota_reserved GROUP BY 1 "
+    "ON CONFLICT (tenant) DO UPDATE SET used = EXCLUDED.used, updated_at = now()",
+    "CREATE INDEX IF NOT EXISTS idx_stores_metrics ON stores (engine, status) "
+    "INCLUDE (provisioning_started_at, provisioning_completed_at) WHERE pool_state IS NULL",
+    # Audit categories and typed store references, backfilled from action/resource_id
+    "ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS category VARCHAR(20)",
+    "UPDATE audit_logs SET category = split_part(action, '.', 1) WHERE category IS NULL",
+    "ALTER TABLE audit_logs ALTER COLUMN category SET NOT NULL",
+    "ALTER TABLE audit_logs DROP CONSTRAINT IF EXISTS audit_logs_store_id_fkey",
+    "ALTER TABLE IF EXISTS audit_logs_legacy DROP CONSTRAINT IF EXISTS audit_logs_store_id_fkey",
+    "UPDATE audit_logs SET store_id = resource_id::uuid WHERE store_id IS NULL AND resource_type = 'store' "
+    "AND resource_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'",
+    "CREATE INDEX IF NOT EXISTS idx_audit_logs_store_timeline ON audit_logs (store_id, created_at) WHERE category IN ('activity', 'system')",
+    "CREATE INDEX IF NOT EXISTS idx_audit_logs_feed ON audit_logs (created_at) WHERE category <> 'activity'",
+    "DROP INDEX IF EXISTS idx_audit_logs_store_id",
+    "DROP INDEX IF EXISTS idx_audit_logs_created_at",
+]
+
 async def add_column():
     print("Running migration...")
     async with engine.begin() as conn:
-        await conn.execute(text("ALTER TABLE stores ADD COLUMN IF NOT EXISTS admin_password VARCHAR(255)"))
+        for statement in MIGRATIONS:
+            await conn.execute(text(statement))
     print("Migration complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+from app.database import engine
+from app.models import AuditLog
+from app.services.audit_partitions import is_partitioned, ensure_audit_partitions, month_start
+from sqlalchemy import text
+import asyncio
+import datetime
+
+# Converts an existing unpartitioned audit_logs table in place (run fix_db.py
+# first so its columns match the model). The old table is attached as one
+# partition covering everything up to next month, so no rows are copied;
+# retention drops it once its range has expired.
+PREPARE = [
+    "LOCK TABLE audit_logs IN ACCESS EXCLUSIVE MODE",
+    "UPDATE audit_logs SET created_at = now() WHERE created_at IS NULL",
+    "ALTER TABLE audit_logs RENAME TO audit_logs_legacy",
+    "ALTER SEQUENCE IF EXISTS audit_logs_id_seq RENAME TO audit_logs_legacy_id_seq",
+    # Free the index names for the partitioned table's own indexes
+    """
+    DO $$
+    DECLARE idx record;
+    BEGIN
+        FOR idx IN SELECT indexname FROM pg_indexes
+                   WHERE tablename = 'audit_logs_legacy' AND indexname LIKE 'idx_audit_logs_%' LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, replace(idx.indexname, 'idx_audit_logs_', 'idx_audit_logs_legacy_'));
+        END LOOP;
+    END $$
+    """,
+    "ALTER TABLE audit_logs_legacy DROP CONSTRAINT audit_logs_pkey",
+    "ALTER TABLE audit_logs_legacy ALTER COLUMN created_at SET NOT NULL",
+    "ALTER TABLE audit_logs_legacy ADD PRIMARY KEY (id, created_at)",
+]
+
+async def partition_audit_logs():
+    print("Partitioning audit_logs...")
+    async with engine.begin() as conn:
+        if await is_partitioned(conn):
+            print("audit_logs is already partitioned.")
+            await ensure_audit_partitions(conn)
+            return
+
+        for statement in PREPARE:
+            await conn.execute(text(statement))
+        await conn.run_sync(lambda sync_conn: AuditLog.__table__.create(sync_conn))
+        await conn.execute(text(
+            "SELECT setval('audit_logs_id_seq', (SELECT COALESCE(max(id), 0) + 1 FROM audit_logs_legacy), false)"
+        ))
+
+        next_month = month_start(datetime.datetime.now(datetime.timezone.utc).date(), 1)
+        await conn.execute(text(
+            f"ALTER TABLE audit_logs ATTACH PARTITION audit_logs_legacy FOR VALUES FROM (MINVALUE) TO ('{next_month.isoformat()}')"
+        ))
+        await ensure_audit_partitions(conn, start=next_month)
+    print("Partitioning complete!")
+
+if __name__ == "__main__":
+    asyncio.run(partition_audit_logs())
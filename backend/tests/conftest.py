@@ -0,0 +1,9 @@
+import pytest
+from app.services import kubernetes
+from tests.fakes import FakeKubernetes
+
+@pytest.fixture
+def fake_k8s(monkeypatch):
+    fake = FakeKubernetes()
+    monkeypatch.setattr(kubernetes, "get_api_client", fake.get_api_client)
+    return fake
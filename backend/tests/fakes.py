@@ -0,0 +1,114 @@
+import json
+import uuid
+from kubernetes_asyncio import client
+from kubernetes_asyncio.client.rest import ApiException
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.reason = "OK" if status < 400 else "Error"
+        self.data = json.dumps(body).encode()
+
+    def getheader(self, name, default=None):
+        return self.getheaders().get(name.lower(), default)
+
+    def getheaders(self):
+        return {"content-type": "application/json"}
+
+class FakeKubernetes:
+    """
+    Real ApiClient with the HTTP layer replaced: every request is recorded in
+    `calls` and answered by `respond(method, url, kwargs)`, which by default
+    echoes the request body back with 200.
+    """
+    def __init__(self):
+        self.calls = []
+        self.respond = lambda method, url, kwargs: FakeResponse(200, kwargs.get("body") or {})
+
+    async def get_api_client(self):
+        api = client.ApiClient(configuration=client.Configuration(host="https://k8s.test"))
+        # Nothing goes over the network
+        await api.rest_client.pool_manager.close()
+
+        async def request(method, url, **kwargs):
+            self.calls.append({"method": method, "url": url, **kwargs})
+            response = self.respond(method, url, kwargs)
+            if response.status >= 400:
+                raise ApiException(http_resp=response)
+            return response
+
+        api.rest_client.request = request
+        return api
+
+    def paths(self, method=None):
+        return [call["url"].replace("https://k8s.test", "") for call in self.calls if method in (None, call["method"])]
+
+class FakeResult:
+    def __init__(self, rows, rowcount=None):
+        self.rows = list(rows)
+        self.rowcount = len(self.rows) if rowcount is None else rowcount
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def one(self):
+        return self.rows[0]
+
+    def all(self):
+        return self.rows
+
+    def scalar(self):
+        row = self.first()
+        return row[0] if row is not None else None
+
+    def scalars(self):
+        # Rows for select(Model) are given as the model objects themselves
+        return self
+
+class FakeSession:
+    """
+    AsyncSession stand-in: records every statement (and executemany rows) in
+    `statements` / `params` and answers each execute with the next rows from
+    `results` (no rows once they run out; a FakeResult is returned as is).
+    Objects passed to add() land in `added`; `committed` holds those that
+    were added before the last commit.
+    """
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.params = []
+        self.added = []
+        self.committed = []
+        self.commits = 0
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        # Stand-in for column defaults the database would fill in
+        for obj in self.added:
+            if getattr(obj, "id", 0) is None:
+                obj.id = uuid.uuid4()
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        self.params.append(params)
+        result = self.results.pop(0) if self.results else []
+        return result if isinstance(result, FakeResult) else FakeResult(result)
+
+    async def commit(self):
+        self.commits += 1
+        self.committed = list(self.added)
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def sql(self, index):
+        from sqlalchemy.dialects import postgresql
+        return str(self.statements[index].compile(dialect=postgresql.dialect()))
@@ -0,0 +1,114 @@
+import asyncio
+from prometheus_client import REGISTRY
+
+from app import database
+from app.services.audit_sink import AuditSink
+
+def dropped(reason):
+    return REGISTRY.get_sample_value("urumi_audit_events_dropped_total", {"reason": reason}) or 0
+
+def recording_sink(monkeypatch, gate=None, **kwargs):
+    """AuditSink whose batches land in `sink.batches` instead of the database."""
+    options = {"batch_size": 3, "flush_seconds": 60, "max_buffer": 100, "enqueue_timeout": 0.01, **kwargs}
+    sink = AuditSink(**options)
+    sink.batches = []
+
+    async def write(events):
+        if gate:
+            await gate.wait()
+        sink.batches.append([e["action"] for e in events])
+    monkeypatch.setattr(sink, "_write", write)
+    return sink
+
+def test_full_batches_flush_without_waiting(monkeypatch):
+    async def run():
+        sink = recording_sink(monkeypatch)
+        sink.start()
+        for i in range(7):
+            await sink.emit(f"event.{i}")
+        for _ in range(100):
+            if len(sink.batches) == 2:
+                break
+            await asyncio.sleep(0)
+        flushed = list(sink.batches)
+        await sink.stop()
+        return flushed, sink.batches
+
+    flushed, batches = asyncio.run(run())
+    # flush_seconds is far away: only full batches went out before stop
+    assert flushed == [["event.0", "event.1", "event.2"], ["event.3", "event.4", "event.5"]]
+    assert batches == flushed + [["event.6"]]
+
+def test_partial_batch_flushes_after_interval(monkeypatch):
+    async def run():
+        sink = recording_sink(monkeypatch, flush_seconds=0.01)
+        sink.start()
+        await sink.emit("store.created", "store", "s-1", {"engine": "woocommerce"})
+        await asyncio.sleep(0.05)
+        flushed = list(sink.batches)
+        await sink.stop()
+        return flushed
+
+    assert asyncio.run(run()) == [["store.created"]]
+
+def test_stop_drains_the_buffer(monkeypatch):
+    async def run():
+        gate = asyncio.Event()
+        sink = recording_sink(monkeypatch, gate=gate, batch_size=2)
+        sink.start()
+        for i in range(5):
+            await sink.emit(f"event.{i}")
+        stopping = asyncio.create_task(sink.stop())
+        await asyncio.sleep(0)
+        gate.set()
+        await stopping
+        return sink
+
+    sink = asyncio.run(run())
+    assert [a for batch in sink.batches for a in batch] == [f"event.{i}" for i in range(5)]
+    assert all(len(batch) <= 2 for batch in sink.batches)
+    assert sink.task is None
+
+def test_full_buffer_drops_after_timeout(monkeypatch):
+    before = dropped("buffer_full")
+
+    async def run():
+        # The writer is stuck, so the bounded buffer fills up
+        gate = asyncio.Event()
+        sink = recording_sink(monkeypatch, gate=gate, batch_size=1, max_buffer=2)
+        sink.start()
+        for i in range(6):
+            await sink.emit(f"event.{i}")
+        gate.set()
+        await sink.stop()
+        return sink
+
+    sink = asyncio.run(run())
+    written = [a for batch in sink.batches for a in batch]
+    # One event in the writer's hands plus a full buffer; the rest are dropped
+    assert written == ["event.0", "event.1", "event.2"]
+    assert dropped("buffer_full") - before == 3
+
+def test_emit_writes_through_when_not_started(monkeypatch):
+    sink = recording_sink(monkeypatch)
+    asyncio.run(sink.emit("script.event"))
+    assert sink.batches == [["script.event"]]
+
+def test_failed_write_drops_the_batch(monkeypatch):
+    class BrokenEngine:
+        def begin(self):
+            raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(database, "engine", BrokenEngine())
+    before = dropped("write_failed")
+    sink = AuditSink(batch_size=10, flush_seconds=60, max_buffer=100, enqueue_timeout=0.01)
+
+    async def run():
+        sink.start()
+        for i in range(4):
+            await sink.emit(f"event.{i}")
+        # The writer logs and carries on; stop still completes
+        await sink.stop()
+
+    asyncio.run(run())
+    assert dropped("write_failed") - before == 4
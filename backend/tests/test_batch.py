@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import uuid
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("slowapi")
+pytest.importorskip("kubernetes")
+
+from starlette.requests import Request
+from app.api import batch
+from app.config import settings
+from app.models import Store
+from app.schemas import StoreBatchCreate, StoreBatchDelete, StoreBatchResponse
+from app.services import capacity, quota, warm_pool
+from tests.fakes import FakeSession
+
+NOW = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+REQUEST = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("10.0.0.1", 4321)})
+
+def make_store(name, status="requested", engine="woocommerce"):
+    return Store(
+        id=uuid.uuid4(), user_id=None, name=name, engine=engine, status=status,
+        namespace=f"store-{name}", created_at=NOW, updated_at=NOW,
+    )
+
+@pytest.fixture
+def services(monkeypatch):
+    """Quota grants up to `quota`, the pool holds `pooled`, the cluster fits `free` more."""
+    state = SimpleNamespace(quota=10, pooled=[], free=10, released=0, jobs={})
+
+    async def reserve_quota_slots(db, user_id, count):
+        return min(count, state.quota)
+
+    async def release_quota_slots(db, user_id, count):
+        state.released += count
+
+    async def claim_pooled_stores(db, names, engine):
+        claimed, state.pooled = state.pooled[:len(names)], state.pooled[len(names):]
+        for store, name in zip(claimed, names):
+            store.name = name
+        return claimed
+
+    async def get_headroom(db):
+        return {"free_stores": state.free, "waiting_stores": 0}
+
+    async def enqueue_jobs(db, job_type, store_ids):
+        state.jobs[job_type] = list(store_ids)
+
+    monkeypatch.setattr(quota, "reserve_quota_slots", reserve_quota_slots)
+    monkeypatch.setattr(quota, "release_quota_slots", release_quota_slots)
+    monkeypatch.setattr(warm_pool, "claim_pooled_stores", claim_pooled_stores)
+    monkeypatch.setattr(capacity, "get_headroom", get_headroom)
+    monkeypatch.setattr(batch, "enqueue_jobs", enqueue_jobs)
+    return state
+
+def create(db, stores):
+    # Skip the rate limiter; it needs a running app
+    handler = batch.create_stores_batch.__wrapped__
+    response = asyncio.run(handler(StoreBatchCreate(stores=stores), request=REQUEST, db=db))
+    return StoreBatchResponse.model_validate(response)
+
+def test_batch_create_reports_each_item(services, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "queue")
+    services.quota, services.free = 3, 1
+    pooled = make_store("pool-1", status="ready")
+    services.pooled = [pooled]
+    cold = [make_store("cold-a"), make_store("cold-b", status=capacity.STATUS_WAITING)]
+    db = FakeSession(cold)
+
+    response = create(db, [
+        {"name": "shop-a", "engine": "woocommerce"},
+        {"name": "bad name!", "engine": "woocommerce"},
+        {"name": "cold-a", "engine": "woocommerce"},
+        {"name": "cold-b", "engine": "woocommerce"},
+        {"name": "over-quota", "engine": "woocommerce"},
+    ])
+
+    results = [(item.index, item.result) for item in response.items]
+    assert results == [(0, "claimed"), (1, "invalid"), (2, "created"), (3, "waiting_capacity"), (4, "quota_exceeded")]
+    assert (response.succeeded, response.failed) == (3, 2)
+    assert response.items[0].store.name == "shop-a"
+    assert response.items[2].store_id == cold[0].id
+    assert "alphanumeric" in response.items[1].error
+
+    # One insert for the cold stores, in item order; only the first fits
+    assert [row["status"] for row in db.params[0]] == ["requested", capacity.STATUS_WAITING]
+    assert [row["name"] for row in db.params[0]] == ["cold-a", "cold-b"]
+    assert services.jobs == {"personalize_store": [pooled.id], "provision_store": [s.id for s in cold]}
+    assert db.commits == 1
+
+def test_batch_create_rejects_over_capacity_and_returns_quota(services, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "reject")
+    services.free = 1
+    created = make_store("fits")
+    db = FakeSession([created])
+
+    response = create(db, [{"name": "fits", "engine": "medusa"}, {"name": "no-room", "engine": "medusa"}])
+    assert [item.result for item in response.items] == ["created", "capacity_exceeded"]
+    assert (response.succeeded, response.failed) == (1, 1)
+    # The rejected item's quota slot is handed back in the same transaction
+    assert services.released == 1
+
+def test_batch_delete_reports_each_id(services, monkeypatch):
+    live, deleting, missing = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    rows = [SimpleNamespace(id=live, name="live", status="ready"), SimpleNamespace(id=deleting, name="gone", status="deleting")]
+    db = FakeSession(rows)
+    released = []
+
+    async def release_quota_many(db, store_ids):
+        released.extend(store_ids)
+        return len(store_ids)
+
+    monkeypatch.setattr(quota, "release_quota_many", release_quota_many)
+    response = asyncio.run(batch.delete_stores_batch(StoreBatchDelete(ids=[live, missing, deleting, live]), request=REQUEST, db=db))
+    response = StoreBatchResponse.model_validate(response)
+    assert [item.result for item in response.items] == ["deleting", "not_found", "already_deleting", "already_deleting"]
+    assert [item.store_id for item in response.items] == [live, missing, deleting, live]
+    assert (response.succeeded, response.failed) == (1, 3)
+    assert released == [live]
+    assert services.jobs == {"deprovision_store": [live]}
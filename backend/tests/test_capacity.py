@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("kubernetes")
+
+from app.config import settings
+from app.services import capacity
+from tests.fakes import FakeSession
+
+CLUSTER = {
+    "nodes": 1,
+    # 10 stores' worth at the default reservation, before target utilization
+    "allocatable_cpu_millicores": 2000,
+    "allocatable_memory_bytes": 10 * 512 * 1024 * 1024,
+    "other_cpu_millicores": 0,
+    "other_memory_bytes": 0,
+}
+
+@pytest.fixture
+def cluster(monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_TARGET_UTILIZATION", 1.0)
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "queue")
+    monkeypatch.setattr(settings, "STORE_RESERVED_CPU_MILLICORES", 200)
+    monkeypatch.setattr(settings, "STORE_RESERVED_MEMORY_MB", 512)
+
+    async def get_cluster_capacity(force=False):
+        return CLUSTER
+    monkeypatch.setattr(capacity, "get_cluster_capacity", get_cluster_capacity)
+
+def test_headroom_locks_then_counts_in_the_callers_transaction(cluster):
+    # advisory lock, then the store counts
+    db = FakeSession([], [(4, 1)])
+    headroom = asyncio.run(capacity.get_headroom(db))
+    assert (headroom["committed_stores"], headroom["waiting_stores"], headroom["free_stores"]) == (4, 1, 6)
+
+    assert db.sql(0).startswith("SELECT pg_advisory_xact_lock(")
+    assert list(db.statements[0].compile().params.values()) == [capacity.ADMISSION_LOCK_KEY]
+    assert db.sql(1).startswith("SELECT count(*) FILTER (WHERE (stores.status NOT IN")
+    assert db.commits == 0
+
+def test_every_admission_reads_the_database(cluster):
+    # Another replica admitted a store in between: no per-process figures to go stale
+    first, second = FakeSession([], [(9, 0)]), FakeSession([], [(10, 0)])
+    assert asyncio.run(capacity.check_admission(first))[0]
+    fits, headroom = asyncio.run(capacity.check_admission(second))
+    assert not fits
+    assert headroom["committed_stores"] == 10
+
+def test_read_only_headroom_skips_the_lock(cluster):
+    db = FakeSession([(2, 3)])
+    headroom = asyncio.run(capacity.get_headroom(db, lock=False))
+    assert (headroom["committed_stores"], headroom["waiting_stores"]) == (2, 3)
+    assert len(db.statements) == 1
+
+def test_admission_off_touches_nothing(cluster, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "off")
+    db = FakeSession()
+    assert asyncio.run(capacity.check_admission(db)) == (True, None)
+    assert db.statements == []
+
+def pod(cpu, memory):
+    container = SimpleNamespace(resources=SimpleNamespace(requests={"cpu": cpu, "memory": memory}))
+    return SimpleNamespace(spec=SimpleNamespace(containers=[container]))
+
+def named(name):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name))
+
+def test_read_cluster_lists_pods_outside_store_namespaces_only(monkeypatch):
+    listed = []
+
+    class CoreV1Api:
+        def list_node(self, timeout_seconds):
+            ready = SimpleNamespace(type="Ready", status="True")
+            node = SimpleNamespace(
+                spec=SimpleNamespace(unschedulable=False),
+                status=SimpleNamespace(conditions=[ready], allocatable={"cpu": 4, "memory": 8192}),
+            )
+            return SimpleNamespace(items=[node])
+
+        def list_namespace(self, label_selector, timeout_seconds):
+            listed.append(label_selector)
+            # Labelled store namespaces are filtered out by the API server;
+            # an unlabelled one from before the label is skipped by name
+            return SimpleNamespace(items=[named("kube-system"), named("urumi-platform"), named("store-legacy1")])
+
+        def list_namespaced_pod(self, namespace, field_selector, timeout_seconds):
+            listed.append(namespace)
+            pods = {"kube-system": [pod(0.5, 1024)], "urumi-platform": [pod(0.25, 512), pod(0.25, 512)]}
+            return SimpleNamespace(items=pods[namespace])
+
+        def list_pod_for_all_namespaces(self, **kwargs):
+            raise AssertionError("lists every store pod in the cluster")
+
+    monkeypatch.setattr(capacity.client, "CoreV1Api", CoreV1Api, raising=False)
+    monkeypatch.setattr(capacity, "_config_loaded", True)
+    reading = capacity._read_cluster()
+
+    assert listed == [f"!{capacity.STORE_NAMESPACE_LABEL}", "kube-system", "urumi-platform"]
+    assert (reading["nodes"], reading["allocatable_cpu_millicores"], reading["allocatable_memory_bytes"]) == (1, 4000, 8192)
+    assert (reading["other_cpu_millicores"], reading["other_memory_bytes"]) == (1000, 2048)
@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+import json
+import uuid
+import pytest
+
+from app.models import Store
+from app.utils.cursor import encode_cursor, decode_cursor
+from tests.fakes import FakeSession
+
+NOW = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+
+def test_cursor_round_trip():
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(NOW, row_id)
+    assert decode_cursor(cursor) == (NOW, row_id)
+
+    # Safe to pass in a query string as is
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", encode_cursor(NOW, uuid.uuid4())[:-4]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_cursor_keys_sort_like_the_listing():
+    # Same created_at: id breaks the tie, as in ORDER BY created_at DESC, id DESC
+    ids = sorted(uuid.uuid4() for _ in range(3))
+    rows = [(NOW, ids[0]), (NOW - datetime.timedelta(seconds=1), ids[2]), (NOW, ids[2]), (NOW, ids[1])]
+    keys = sorted((decode_cursor(encode_cursor(*row)) for row in rows), reverse=True)
+    assert keys == [(NOW, ids[2]), (NOW, ids[1]), (NOW, ids[0]), (NOW - datetime.timedelta(seconds=1), ids[2])]
+
+def make_store(created_at):
+    return Store(
+        id=uuid.uuid4(), user_id=None, name="shop", engine="woocommerce", status="ready",
+        namespace="store-shop", created_at=created_at, updated_at=created_at,
+    )
+
+@pytest.fixture
+def list_stores(monkeypatch):
+    pytest.importorskip("slowapi")
+    from app.api import stores
+    from app.services.store_cache import StoreReadCache
+    monkeypatch.setattr(stores, "store_cache", StoreReadCache(ttl=60, max_lists=10))
+
+    def call(db, **params):
+        query = {"limit": 2, "cursor": None, "status": None, "engine": None, "user_id": None, "name_prefix": None, "if_none_match": None}
+        return asyncio.run(stores.list_stores(db=db, **{**query, **params}))
+    return call
+
+def test_list_pages_by_keyset(list_stores):
+    rows = [make_store(NOW - datetime.timedelta(minutes=i)) for i in range(3)]
+
+    # One row past the limit means there is a next page
+    db = FakeSession(rows)
+    first = list_stores(db)
+    assert [s["id"] for s in json.loads(first.body)] == [str(r.id) for r in rows[:2]]
+    assert first.headers["x-next-cursor"] == encode_cursor(rows[1].created_at, rows[1].id)
+    sql = db.sql(0)
+    assert "ORDER BY stores.created_at DESC, stores.id DESC" in sql
+    assert db.statements[0].compile().params["param_1"] == 3
+
+    db = FakeSession(rows[2:])
+    last = list_stores(db, cursor=first.headers["x-next-cursor"])
+    assert [s["id"] for s in json.loads(last.body)] == [str(rows[2].id)]
+    assert "x-next-cursor" not in last.headers
+    assert "(stores.created_at, stores.id) < (" in db.sql(0)
+    params = db.statements[0].compile().params
+    assert (params["param_1"], params["param_2"]) == (rows[1].created_at, rows[1].id)
+
+def test_list_rejects_a_bad_cursor(list_stores):
+    from fastapi import HTTPException
+    with pytest.raises(HTTPException) as e:
+        list_stores(FakeSession(), cursor="garbage")
+    assert e.value.status_code == 400
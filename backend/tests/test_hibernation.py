@@ -0,0 +1,98 @@
+import asyncio
+import json
+import pytest
+from kubernetes_asyncio.client.rest import ApiException
+from app.config import settings
+from app.services import hibernation
+from tests.fakes import FakeResponse
+
+INGRESSES = "/apis/networking.k8s.io/v1/namespaces/{namespace}/ingresses"
+
+def ingress(name, namespace, host, service="wordpress"):
+    return {
+        "apiVersion": "networking.k8s.io/v1",
+        "kind": "Ingress",
+        "metadata": {"name": name, "namespace": namespace, "labels": {}, "annotations": {}},
+        "spec": {"ingressClassName": "traefik", "rules": [{"host": host, "http": {"paths": [{
+            "path": "/", "pathType": "Prefix",
+            "backend": {"service": {"name": service, "port": {"number": 80}}},
+        }]}}]},
+    }
+
+class Cluster:
+    """Ingress objects keyed by API path; `fail` maps (method, path) to an HTTP status."""
+    def __init__(self, *objects):
+        self.objects = {INGRESSES.format(namespace=o["metadata"]["namespace"]) + "/" + o["metadata"]["name"]: o for o in objects}
+        self.fail = {}
+
+    def __call__(self, method, url, kwargs):
+        path = url.replace("https://k8s.test", "")
+        if (method, path) in self.fail:
+            return FakeResponse(self.fail[(method, path)], {"message": "injected"})
+        if method == "GET" and path.endswith("/ingresses"):
+            items = [o for p, o in self.objects.items() if p.startswith(path + "/")]
+            return FakeResponse(200, {"apiVersion": "networking.k8s.io/v1", "kind": "IngressList", "metadata": {}, "items": items})
+        if method == "GET" and path.endswith(("/deployments", "/statefulsets")):
+            return FakeResponse(200, {"metadata": {}, "items": []})
+        if method == "GET":
+            return FakeResponse(200, self.objects[path]) if path in self.objects else FakeResponse(404, {})
+        if method == "PATCH":
+            self.objects[path] = kwargs["body"]
+            return FakeResponse(200, kwargs["body"])
+        if method == "DELETE":
+            return FakeResponse(200, {}) if self.objects.pop(path, None) else FakeResponse(404, {})
+        raise AssertionError(f"unexpected {method} {path}")
+
+    def hosts(self):
+        """host -> namespaces of the Ingresses routing it."""
+        routes = {}
+        for o in self.objects.values():
+            for rule in o["spec"]["rules"]:
+                routes.setdefault(rule["host"], []).append(o["metadata"]["namespace"])
+        return routes
+
+NS = "store-1a2b3c4d"
+HOST = f"{NS}.127.0.0.1.nip.io"
+ADMIN_HOST = f"{NS}-admin.127.0.0.1.nip.io"
+PLATFORM = settings.PLATFORM_NAMESPACE
+
+@pytest.fixture
+def cluster(fake_k8s, monkeypatch):
+    monkeypatch.setattr(hibernation, "get_api_client", fake_k8s.get_api_client)
+    cluster = Cluster(ingress("storefront", NS, HOST), ingress("admin", NS, ADMIN_HOST))
+    fake_k8s.respond = cluster
+    return cluster
+
+def test_hibernate_then_restore_swaps_routes(cluster):
+    asyncio.run(hibernation.hibernate_store(NS))
+    assert cluster.hosts() == {HOST: [PLATFORM], ADMIN_HOST: [PLATFORM]}
+    held = cluster.objects[INGRESSES.format(namespace=PLATFORM) + "/" + hibernation.activator_ingress_name(NS)]
+    assert len(json.loads(held["metadata"]["annotations"][hibernation.ORIGINAL_INGRESS_ANNOTATION])) == 2
+
+    restored = asyncio.run(hibernation.restore_store_routes(NS))
+    assert [i["metadata"]["name"] for i in restored] == ["storefront", "admin"]
+    assert cluster.hosts() == {HOST: [NS], ADMIN_HOST: [NS]}
+
+    # Already restored: nothing to do
+    assert asyncio.run(hibernation.restore_store_routes(NS)) == []
+
+def test_failed_restore_keeps_hosts_on_activator(cluster):
+    asyncio.run(hibernation.hibernate_store(NS))
+    cluster.fail[("PATCH", INGRESSES.format(namespace=NS) + "/admin")] = 500
+
+    with pytest.raises(ApiException):
+        asyncio.run(hibernation.restore_store_routes(NS))
+    # The storefront restored before the failure is removed again
+    assert cluster.hosts() == {HOST: [PLATFORM], ADMIN_HOST: [PLATFORM]}
+
+    # The next wake attempt completes the swap
+    del cluster.fail[("PATCH", INGRESSES.format(namespace=NS) + "/admin")]
+    asyncio.run(hibernation.restore_store_routes(NS))
+    assert cluster.hosts() == {HOST: [NS], ADMIN_HOST: [NS]}
+
+def test_failed_hibernate_restores_store_routes(cluster):
+    cluster.fail[("DELETE", INGRESSES.format(namespace=NS) + "/admin")] = 500
+
+    with pytest.raises(ApiException):
+        asyncio.run(hibernation.hibernate_store(NS))
+    assert cluster.hosts() == {HOST: [NS], ADMIN_HOST: [NS]}
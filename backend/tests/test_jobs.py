@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import uuid
+import pytest
+
+from app import database
+from app.config import settings
+from app.models import Job
+from app.services import jobs, quota
+from tests.fakes import FakeResult, FakeSession
+
+STORE_ID = uuid.uuid4()
+
+@pytest.fixture
+def session(monkeypatch):
+    """Every AsyncSessionLocal() hands out the next scripted FakeSession."""
+    sessions = []
+
+    def use(*results):
+        db = FakeSession(*results)
+        sessions.append(db)
+        return db
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", lambda: sessions.pop(0))
+    return use
+
+@pytest.fixture
+def released(monkeypatch):
+    store_ids = []
+
+    async def release_quota(db, store_id):
+        store_ids.append(store_id)
+        return True
+    monkeypatch.setattr(quota, "release_quota", release_quota)
+    return store_ids
+
+def make_job(kind="provision_store", attempts=0, max_attempts=5):
+    created = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=3)
+    return Job(id=7, kind=kind, store_id=STORE_ID, status="queued", attempts=attempts, max_attempts=max_attempts, created_at=created)
+
+def job_dict(kind="provision_store", attempts=1, max_attempts=5):
+    return {"id": 7, "kind": kind, "store_id": STORE_ID, "attempts": attempts, "max_attempts": max_attempts, "queued_seconds": 0.5}
+
+def test_claim_skips_locked_jobs_and_takes_the_lease(session):
+    job = make_job(attempts=1)
+    db = session([job])
+    claimed = asyncio.run(jobs.claim_jobs(3))
+
+    sql = db.sql(0)
+    assert "jobs.status = %(status_1)s AND jobs.run_after <= now()" in sql
+    assert "ORDER BY jobs.run_after, jobs.id" in sql
+    assert sql.endswith("FOR UPDATE SKIP LOCKED")
+    assert db.statements[0].compile().params["param_1"] == 3
+
+    assert (job.status, job.attempts, job.locked_by) == ("running", 2, jobs.WORKER_ID)
+    assert job.locked_at == job.started_at
+    assert claimed == [{
+        "id": 7, "kind": "provision_store", "store_id": STORE_ID, "attempts": 2, "max_attempts": 5,
+        "queued_seconds": claimed[0]["queued_seconds"],
+    }]
+    assert claimed[0]["queued_seconds"] >= 3
+    assert db.commits == 1
+
+def test_stale_leases_are_requeued(session, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 600)
+    db = session(FakeResult([], rowcount=2))
+    assert asyncio.run(jobs.requeue_stale_jobs()) == 2
+
+    sql = db.sql(0)
+    assert "WHERE jobs.status = %(status_1)s AND jobs.locked_at < %(locked_at_1)s" in sql
+    params = db.statements[0].compile().params
+    assert (params["status_1"], params["status"]) == ("running", "queued")
+    lease_age = datetime.datetime.now(datetime.timezone.utc) - params["locked_at_1"]
+    assert abs(lease_age.total_seconds() - 600) < 5
+
+def finish_values(db):
+    return db.statements[0].compile().params
+
+def test_success_marks_job_done(session):
+    db = session()
+    assert asyncio.run(jobs._finish(job_dict())) == "done"
+    assert finish_values(db)["status"] == "done"
+    assert len(db.statements) == 1
+
+@pytest.mark.parametrize("attempts, delay", [(1, 5), (2, 10), (4, 40), (9, 300)])
+def test_failure_retries_with_capped_backoff(session, monkeypatch, attempts, delay):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 5)
+    monkeypatch.setattr(settings, "JOB_RETRY_MAX_SECONDS", 300)
+    db = session()
+    before = datetime.datetime.now(datetime.timezone.utc)
+    assert asyncio.run(jobs._finish(job_dict(attempts=attempts, max_attempts=10), error="boom")) == "queued"
+
+    values = finish_values(db)
+    assert values["last_error"] == "boom"
+    assert abs((values["run_after"] - before).total_seconds() - delay) < 1
+    # The store is untouched until the last attempt
+    assert len(db.statements) == 1
+
+def test_final_failure_fails_store_and_releases_quota(session, released):
+    db = session()
+    assert asyncio.run(jobs._finish(job_dict(attempts=5), error="helm timeout")) == "failed"
+    assert finish_values(db)["status"] == "failed"
+    assert db.sql(1).startswith("UPDATE stores SET status=")
+    assert db.statements[1].compile().params["status"] == "failed"
+    assert released == [STORE_ID]
+
+def test_final_delete_failure_keeps_store_and_quota(session, released):
+    db = session()
+    assert asyncio.run(jobs._finish(job_dict(kind="deprovision_store", attempts=5), error="(403) Forbidden")) == "failed"
+    store_values = db.statements[1].compile().params
+    assert store_values == {"error_message": "(403) Forbidden", "id_1": STORE_ID}
+    assert released == []
+
+def test_run_job_retries_failed_deletes(session, monkeypatch):
+    async def deprovision_store(store_id):
+        raise ConnectionError("api server unreachable")
+    monkeypatch.setattr(jobs, "_handlers", lambda: {"deprovision_store": deprovision_store})
+
+    db = session()
+    asyncio.run(jobs.run_job(job_dict(kind="deprovision_store", attempts=1)))
+    values = finish_values(db)
+    assert (values["status"], values["last_error"]) == ("queued", "api server unreachable")
+
+def test_worker_runs_at_most_concurrency_jobs_and_drains(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+    queued = [job_dict(kind="provision_store") | {"id": i} for i in range(5)]
+    running, peak, finished, claims = [0], [0], [], []
+
+    async def claim_jobs(limit):
+        claims.append(limit)
+        taken = queued[:limit]
+        del queued[:limit]
+        return taken
+
+    async def run_job(job):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+        finished.append(job["id"])
+
+    async def requeue_stale_jobs():
+        return 0
+
+    async def listen(wake):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(jobs, "claim_jobs", claim_jobs)
+    monkeypatch.setattr(jobs, "run_job", run_job)
+    monkeypatch.setattr(jobs, "requeue_stale_jobs", requeue_stale_jobs)
+    monkeypatch.setattr(jobs, "_listen_for_jobs", listen)
+
+    async def run():
+        stop = asyncio.Event()
+        worker = asyncio.create_task(jobs.run_worker(concurrency=2, stop=stop))
+        while queued:
+            await asyncio.sleep(0.005)
+        # Stop with jobs still in flight: they finish before the worker returns
+        stop.set()
+        await worker
+
+    asyncio.run(run())
+    assert sorted(finished) == [0, 1, 2, 3, 4]
+    assert peak[0] == 2
+    assert all(limit <= 2 for limit in claims)
+
+def test_queue_stats():
+    db = FakeSession([("queued", 3), ("running", 1), ("done", 40)], [(12.345,)], [(1.5, 30.256)])
+    stats = asyncio.run(jobs.queue_stats(db))
+    assert stats == {
+        "depth": {"queued": 3, "running": 1, "done": 40},
+        "queued": 3,
+        "running": 1,
+        "oldest_queued_seconds": 12.35,
+        "avg_queue_wait_seconds_1h": 1.5,
+        "avg_completion_seconds_1h": 30.26,
+    }
+
+    empty = asyncio.run(jobs.queue_stats(FakeSession([], [(None,)], [(None, None)])))
+    assert (empty["queued"], empty["oldest_queued_seconds"], empty["avg_completion_seconds_1h"]) == (0, None, None)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+from kubernetes_asyncio.client.rest import ApiException
+from app.services import kubernetes
+from tests.fakes import FakeResponse
+
+QUOTA = {
+    "apiVersion": "v1",
+    "kind": "ResourceQuota",
+    "metadata": {"name": "store-quota", "namespace": "store-abc"},
+    "spec": {"hard": {"pods": "10"}},
+}
+
+def test_apply_manifest_server_side_applies(fake_k8s):
+    applied = {**QUOTA, "metadata": {**QUOTA["metadata"], "uid": "1"}}
+    fake_k8s.respond = lambda method, url, kwargs: FakeResponse(201, applied)
+    assert asyncio.run(kubernetes.apply_manifest(QUOTA)) == applied
+    call = fake_k8s.calls[0]
+    assert call["method"] == "PATCH"
+    assert call["url"] == "https://k8s.test/api/v1/namespaces/store-abc/resourcequotas/store-quota"
+    assert ("fieldManager", kubernetes.FIELD_MANAGER) in call["query_params"]
+    assert ("force", "true") in call["query_params"]
+    assert call["headers"]["Content-Type"] == "application/apply-patch+yaml"
+    assert call["body"] == QUOTA
+
+def test_apply_manifest_paths():
+    netpol = {"apiVersion": "networking.k8s.io/v1", "kind": "NetworkPolicy", "metadata": {"name": "p", "namespace": "n"}}
+    namespace = {"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": "n"}}
+    assert kubernetes._resource_path(netpol) == ("/apis/networking.k8s.io/v1", "/namespaces/n/networkpolicies/p")
+    assert kubernetes._resource_path(namespace) == ("/api/v1", "/namespaces/n")
+
+def test_apply_manifest_raises_api_errors(fake_k8s):
+    fake_k8s.respond = lambda method, url, kwargs: FakeResponse(422, {"message": "invalid"})
+    with pytest.raises(ApiException) as error:
+        asyncio.run(kubernetes.apply_manifest(QUOTA))
+    assert error.value.status == 422
+
+class FakeMessage:
+    def __init__(self, data):
+        self.data = data
+
+class FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = frames
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for channel, payload in self.frames:
+            yield FakeMessage(bytes([channel]) + payload)
+
+def fake_exec(monkeypatch, frames):
+    """Patch the exec websocket to replay `frames`; returns it and the exec params."""
+    websocket = FakeWebSocket(frames)
+    seen = {}
+
+    class FakeCore:
+        def __init__(self, api):
+            pass
+
+        async def connect_get_namespaced_pod_exec(self, pod, namespace, **params):
+            seen.update(params)
+            return websocket
+
+    async def get_ws_client():
+        return None
+    monkeypatch.setattr(kubernetes.client, "CoreV1Api", FakeCore)
+    monkeypatch.setattr(kubernetes, "get_ws_client", get_ws_client)
+    return websocket, seen
+
+SUCCESS = json.dumps({"status": "Success"}).encode()
+FAILURE = json.dumps({"status": "Failure", "message": "command terminated with non-zero exit code"}).encode()
+
+def test_exec_in_pod_returns_stdout(monkeypatch):
+    fake_exec(monkeypatch, [(kubernetes.STDOUT_CHANNEL, b"42\n"), (kubernetes.ERROR_CHANNEL, SUCCESS)])
+    assert asyncio.run(kubernetes.exec_in_pod("store-abc", "wp-0", ["wp"])) == "42"
+
+def test_exec_in_pod_failure_status(monkeypatch):
+    fake_exec(monkeypatch, [(kubernetes.STDERR_CHANNEL, b"Error: no site"), (kubernetes.ERROR_CHANNEL, FAILURE)])
+    with pytest.raises(kubernetes.KubernetesExecError, match="no site"):
+        asyncio.run(kubernetes.exec_in_pod("store-abc", "wp-0", ["wp"]))
+
+def test_exec_in_pod_missing_status_is_failure(monkeypatch):
+    fake_exec(monkeypatch, [(kubernetes.STDOUT_CHANNEL, b"partial")])
+    with pytest.raises(kubernetes.KubernetesExecError, match="without a status"):
+        asyncio.run(kubernetes.exec_in_pod("store-abc", "wp-0", ["wp"]))
+
+def test_upload_to_pod_quotes_path(monkeypatch):
+    websocket, seen = fake_exec(monkeypatch, [(kubernetes.ERROR_CHANNEL, SUCCESS)])
+    asyncio.run(kubernetes.upload_to_pod("store-abc", "wp-0", "/tmp/a b;rm -rf /", b"data"))
+    assert seen["command"] == ["sh", "-c", "head -c 4 > '/tmp/a b;rm -rf /'"]
+    assert websocket.sent == [bytes([kubernetes.STDIN_CHANNEL]) + b"data"]
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from pathlib import Path
+import pytest
+from app.config import settings
+from app.services import manifests
+
+CHART_DIR = str(Path(__file__).resolve().parents[2] / "helm" / "store-engines" / "woocommerce")
+NS = manifests.PLACEHOLDERS["namespace"]
+
+# What `helm template` produces for the placeholder values (abridged)
+RENDERED = [
+    {"apiVersion": "v1", "kind": "Secret", "metadata": {"name": "store-secrets", "namespace": NS},
+     "stringData": {"wordpress-password": manifests.PLACEHOLDERS["admin_password"], "mysql-password": manifests.PLACEHOLDERS["db_password"]}},
+    {"apiVersion": "v1", "kind": "ResourceQuota", "metadata": {"name": f"{manifests.PLACEHOLDERS['store_id']}-quota", "namespace": NS},
+     "spec": {"hard": {"pods": "10"}}},
+    {"apiVersion": "v1", "kind": "Service", "metadata": {"name": "wordpress", "namespace": NS}, "spec": {"ports": [{"port": 80}]}},
+    {"apiVersion": "apps/v1", "kind": "Deployment", "metadata": {"name": "wordpress", "namespace": NS},
+     "spec": {"template": {"spec": {"containers": [{"name": "wordpress", "env": [
+         {"name": "WORDPRESS_BLOG_NAME", "value": manifests.PLACEHOLDERS["store_name"]},
+     ]}]}}}},
+    {"apiVersion": "networking.k8s.io/v1", "kind": "Ingress", "metadata": {"name": "storefront", "namespace": NS},
+     "spec": {"rules": [{"host": manifests.PLACEHOLDERS["host"]}]}},
+]
+
+STORE = {
+    "namespace": "store-1a2b3c4d",
+    "store_id": "store-1a2b3c4d",
+    "store_name": 'Bob\'s "Best" Store',
+    "host": "store-1a2b3c4d.127.0.0.1.nip.io",
+    "admin_password": "s3cr\\et",
+    "db_password": "dbpass",
+}
+
+@pytest.fixture
+def rendered(monkeypatch, tmp_path):
+    """Stand-in for helm: counts renders, caches under tmp_path."""
+    renders = []
+
+    async def helm_template(chart_dir, values):
+        renders.append(values)
+        return json.loads(json.dumps(RENDERED))
+
+    monkeypatch.setattr(manifests, "_helm_template", helm_template)
+    monkeypatch.setattr(settings, "STORE_ENGINE_RENDER_DIR", str(tmp_path))
+    monkeypatch.setattr(manifests, "_rendered", {})
+    return renders
+
+def test_render_chart_is_cached_in_memory_and_on_disk(rendered, monkeypatch):
+    first = asyncio.run(manifests.render_chart(CHART_DIR, {"wordpress": {}}))
+    asyncio.run(manifests.render_chart(CHART_DIR, {"wordpress": {}}))
+    assert len(rendered) == 1
+    assert rendered[0]["wordpress"]["adminPassword"] == manifests.PLACEHOLDERS["admin_password"]
+
+    # A restarted operator reads the render back from disk
+    monkeypatch.setattr(manifests, "_rendered", {})
+    assert asyncio.run(manifests.render_chart(CHART_DIR, {"wordpress": {}})) == first
+    assert len(rendered) == 1
+
+    # Different static values are a different render
+    asyncio.run(manifests.render_chart(CHART_DIR, {"wordpress": {"replicas": 2}}))
+    assert len(rendered) == 2
+
+def test_personalize_substitutes_and_escapes():
+    docs = manifests.personalize(RENDERED, STORE)
+    assert docs[0]["metadata"]["namespace"] == "store-1a2b3c4d"
+    assert docs[0]["stringData"]["wordpress-password"] == "s3cr\\et"
+    assert docs[1]["metadata"]["name"] == "store-1a2b3c4d-quota"
+    assert docs[3]["spec"]["template"]["spec"]["containers"][0]["env"][0]["value"] == 'Bob\'s "Best" Store'
+    assert docs[4]["spec"]["rules"][0]["host"] == "store-1a2b3c4d.127.0.0.1.nip.io"
+    assert "urumi-ph-" not in json.dumps(docs)
+
+def test_apply_store_manifests_applies_supporting_objects_first(rendered, fake_k8s):
+    applied = asyncio.run(manifests.apply_store_manifests(CHART_DIR, {}, STORE))
+    assert applied == len(RENDERED)
+    paths = fake_k8s.paths("PATCH")
+    assert sorted(paths[:3]) == [
+        "/api/v1/namespaces/store-1a2b3c4d/resourcequotas/store-1a2b3c4d-quota",
+        "/api/v1/namespaces/store-1a2b3c4d/secrets/store-secrets",
+        "/api/v1/namespaces/store-1a2b3c4d/services/wordpress",
+    ]
+    assert sorted(paths[3:]) == [
+        "/apis/apps/v1/namespaces/store-1a2b3c4d/deployments/wordpress",
+        "/apis/networking.k8s.io/v1/namespaces/store-1a2b3c4d/ingresses/storefront",
+    ]
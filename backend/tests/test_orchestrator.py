@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+import pytest
+
+pytest.importorskip("kubernetes")
+
+from kubernetes.client.rest import ApiException
+from app import database
+from app.models import Store
+from app.services import orchestrator, quota
+from tests.fakes import FakeSession
+
+STORE = Store(id=uuid.uuid4(), name="shop", engine="woocommerce", status="deleting", namespace="store-1a2b3c4d")
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """CustomObjectsApi whose CR delete raises `cluster.error` (if set); quota releases recorded."""
+    class Cluster:
+        error = None
+        deleted = []
+        released = []
+
+    class CustomObjectsApi:
+        def delete_namespaced_custom_object(self, group, version, namespace, plural, name):
+            if Cluster.error:
+                raise Cluster.error
+            Cluster.deleted.append(name)
+
+    async def release_quota(db, store_id):
+        Cluster.released.append(store_id)
+        return True
+
+    monkeypatch.setattr(orchestrator.client, "CustomObjectsApi", CustomObjectsApi, raising=False)
+    monkeypatch.setattr(quota, "release_quota", release_quota)
+    return Cluster
+
+def deprovision(monkeypatch, db):
+    monkeypatch.setattr(database, "AsyncSessionLocal", lambda: db)
+    asyncio.run(orchestrator.deprovision_store(STORE.id))
+
+def test_deprovision_deletes_cr_then_row(cluster, monkeypatch):
+    db = FakeSession([STORE])
+    deprovision(monkeypatch, db)
+    assert cluster.deleted == ["store-1a2b3c4d"]
+    assert cluster.released == [STORE.id]
+    assert db.sql(1).startswith("DELETE FROM stores")
+    assert db.commits == 1
+
+def test_deprovision_treats_missing_cr_as_deleted(cluster, monkeypatch):
+    cluster.error = ApiException(status=404, reason="Not Found")
+    db = FakeSession([STORE])
+    deprovision(monkeypatch, db)
+    assert cluster.released == [STORE.id]
+    assert db.commits == 1
+
+@pytest.mark.parametrize("error", [ApiException(status=403, reason="Forbidden"), ApiException(status=503, reason="Unavailable"), ConnectionError("refused")])
+def test_deprovision_keeps_row_when_cr_delete_fails(cluster, monkeypatch, error):
+    # The job is retried; the row (and quota slot) stay until the CR is gone
+    cluster.error = error
+    db = FakeSession([STORE])
+    with pytest.raises(type(error)):
+        deprovision(monkeypatch, db)
+    assert cluster.released == []
+    assert len(db.statements) == 1
+    assert db.commits == 0
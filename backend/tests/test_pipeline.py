@@ -0,0 +1,148 @@
+import asyncio
+import pytest
+
+from app.operator.pipeline import Stage, run_stages, completed_stages, once
+
+class Recorder:
+    """Stage bodies and checkpoint callbacks that log what ran, in order."""
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.events = []
+
+    def stage(self, name, after=None):
+        async def fn():
+            self.events.append(f"run:{name}")
+            if name in self.fail:
+                raise RuntimeError(f"{name} failed")
+        return Stage(name, fn, after)
+
+    async def on_start(self, name):
+        self.events.append(f"start:{name}")
+
+    async def on_complete(self, name):
+        self.events.append(f"done:{name}")
+
+    def ran(self):
+        return [e.split(":", 1)[1] for e in self.events if e.startswith("run:")]
+
+def run(rec, stages, completed, **kwargs):
+    asyncio.run(run_stages(stages, completed, rec.on_start, rec.on_complete, **kwargs))
+
+def test_stages_run_in_order_and_checkpoint():
+    rec = Recorder()
+    completed = set()
+    run(rec, [rec.stage("namespace"), rec.stage("database", ["namespace"]), rec.stage("app", ["database"])], completed)
+    assert rec.events == [
+        "start:namespace", "run:namespace", "done:namespace",
+        "start:database", "run:database", "done:database",
+        "start:app", "run:app", "done:app",
+    ]
+    assert completed == {"namespace", "database", "app"}
+
+def test_retry_resumes_after_last_completed_stage():
+    stages = lambda rec: [rec.stage("namespace"), rec.stage("database", ["namespace"]), rec.stage("app", ["database"])]
+
+    rec = Recorder(fail={"database"})
+    completed = set()
+    with pytest.raises(RuntimeError):
+        run(rec, stages(rec), completed)
+    assert completed == {"namespace"}
+    assert "done:database" not in rec.events
+
+    # Next attempt skips what the checkpoint already holds
+    rec = Recorder()
+    run(rec, stages(rec), completed)
+    assert rec.ran() == ["database", "app"]
+    assert completed == {"namespace", "database", "app"}
+
+def test_fully_checkpointed_run_does_nothing():
+    rec = Recorder()
+    run(rec, [rec.stage("namespace"), rec.stage("app", ["namespace"])], {"namespace", "app"})
+    assert rec.events == []
+
+def test_completed_stages_ignores_other_cr_instances():
+    checkpoints = [
+        {"uid": "uid-1", "completed": ["namespace", "database"]},
+        None,
+        {"uid": "uid-1", "completed": ["app"]},
+        {"uid": "uid-0", "completed": ["hardening"]},
+    ]
+    assert completed_stages(checkpoints, "uid-1") == {"namespace", "database", "app"}
+    assert completed_stages(checkpoints, "uid-2") == set()
+
+def test_once_runs_prerequisite_at_most_once():
+    calls = []
+
+    async def find_pod():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return "pod-0"
+
+    async def main():
+        pod = once(find_pod)
+        return await asyncio.gather(pod(), pod(), pod())
+
+    assert asyncio.run(main()) == ["pod-0"] * 3
+    assert calls == [1]
+
+def test_independent_stages_overlap_up_to_max_parallel():
+    active, peak, order = [0], [0], []
+
+    def stage(name, after=None, delay=0.01):
+        async def fn():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(delay)
+            active[0] -= 1
+            order.append(name)
+        return Stage(name, fn, after)
+
+    async def noop(name):
+        pass
+
+    # pages, products and payments all wait on plugins, then run side by side
+    stages = [stage("plugins")] + [stage(n, ["plugins"]) for n in ("pages", "products", "payments")] + [stage("finalize", ["pages", "products", "payments"])]
+    asyncio.run(run_stages(stages, set(), noop, noop, max_parallel=2))
+    assert peak[0] == 2
+    assert order[0] == "plugins" and order[-1] == "finalize"
+
+    active[0], peak[0] = 0, 0
+    asyncio.run(run_stages(stages, set(), noop, noop, max_parallel=1))
+    assert peak[0] == 1
+
+def test_failure_lets_in_flight_stages_checkpoint():
+    events = []
+
+    def stage(name, after=None, fail=False, delay=0):
+        async def fn():
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError(f"{name} failed")
+        return Stage(name, fn, after)
+
+    async def on_start(name):
+        events.append(f"start:{name}")
+
+    async def on_complete(name):
+        events.append(f"done:{name}")
+
+    completed = set()
+    stages = [
+        stage("pages", fail=True),
+        stage("products", delay=0.02),
+        stage("payments", ["products"]),
+    ]
+    with pytest.raises(RuntimeError, match="pages failed"):
+        asyncio.run(run_stages(stages, completed, on_start, on_complete, max_parallel=2))
+    # products was already running: it finishes and is checkpointed; nothing new starts
+    assert completed == {"products"}
+    assert "done:products" in events
+    assert "start:payments" not in events
+
+def test_unsatisfiable_dependencies_raise():
+    async def noop(*args):
+        pass
+
+    stages = [Stage("app", noop, ["database"])]
+    with pytest.raises(Exception, match="Unsatisfiable stage dependencies"):
+        asyncio.run(run_stages(stages, set(), noop, noop))
@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+import pytest
+
+from app.config import settings
+from app.models import Store
+from app.services import quota
+from app.services.warm_pool import POOL_AVAILABLE
+from tests.fakes import FakeSession
+
+USER = uuid.uuid4()
+
+@pytest.fixture(autouse=True)
+def limit(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_STORES_PER_USER", 3)
+
+def make_store(**kwargs):
+    fields = {"id": uuid.uuid4(), "user_id": USER, "quota_reserved": False, "pool_state": None}
+    return Store(**{**fields, **kwargs})
+
+def test_reserve_takes_a_slot_under_the_limit():
+    store = make_store()
+    db = FakeSession([(1,)])
+    assert asyncio.run(quota.reserve_quota(db, store))
+    assert store.quota_reserved
+
+    # One conditional upsert on the tenant's counter row
+    sql = db.sql(0)
+    assert "ON CONFLICT (tenant) DO UPDATE SET used = (quota_usage.used +" in sql
+    assert "WHERE quota_usage.used <" in sql
+    assert db.statements[0].compile().params["tenant"] == str(USER)
+
+def test_reserve_refused_at_the_limit():
+    store = make_store()
+    # The upsert's WHERE failed, so no row came back
+    db = FakeSession([])
+    assert not asyncio.run(quota.reserve_quota(db, store))
+    assert not store.quota_reserved
+
+def test_reserve_without_enforce_has_no_limit():
+    store = make_store()
+    db = FakeSession([(4,)])
+    assert asyncio.run(quota.reserve_quota(db, store, enforce=False))
+    assert "WHERE quota_usage.used <" not in db.sql(0)
+
+def test_reserve_skips_held_slots_and_pool_instances():
+    held = make_store(quota_reserved=True)
+    pooled = make_store(pool_state=POOL_AVAILABLE)
+    db = FakeSession()
+    assert asyncio.run(quota.reserve_quota(db, held))
+    assert asyncio.run(quota.reserve_quota(db, pooled))
+    assert not pooled.quota_reserved
+    assert db.statements == []
+
+def test_release_decrements_once():
+    db = FakeSession([SimpleNamespace(user_id=USER)])
+    assert asyncio.run(quota.release_quota(db, uuid.uuid4()))
+    assert "quota_reserved IS true" in db.sql(0)
+    assert "greatest(quota_usage.used -" in db.sql(1)
+
+    # Flag already cleared: nothing to give back
+    db = FakeSession([])
+    assert not asyncio.run(quota.release_quota(db, uuid.uuid4()))
+    assert len(db.statements) == 1
+
+def test_reserve_slots_grants_up_to_the_limit():
+    db = FakeSession([], [(1,)])
+    assert asyncio.run(quota.reserve_quota_slots(db, USER, 5)) == 2
+    assert "FOR UPDATE" in db.sql(1)
+    assert db.statements[2].compile().params["used_1"] == 2
+
+    db = FakeSession([], [(3,)])
+    assert asyncio.run(quota.reserve_quota_slots(db, USER, 5)) == 0
+    assert len(db.statements) == 2
+
+def test_release_many_decrements_per_tenant():
+    other = uuid.uuid4()
+    rows = [SimpleNamespace(user_id=USER), SimpleNamespace(user_id=other), SimpleNamespace(user_id=USER)]
+    db = FakeSession(rows)
+    assert asyncio.run(quota.release_quota_many(db, [uuid.uuid4() for _ in rows])) == 3
+
+    decrements = {s.compile().params["tenant_1"]: s.compile().params["used_1"] for s in db.statements[1:]}
+    assert decrements == {str(USER): 2, str(other): 1}
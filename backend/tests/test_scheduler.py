@@ -0,0 +1,98 @@
+import asyncio
+
+from app.operator.scheduler import ProvisioningScheduler, PRIORITY_NEW, PRIORITY_RETRY, PRIORITY_POOL
+
+async def provision(scheduler, tenant, admitted, priority=PRIORITY_NEW, hold=None):
+    async with scheduler.slot(tenant, priority):
+        admitted.append(tenant)
+        if hold:
+            await hold.wait()
+        await asyncio.sleep(0)
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_priority_classes_served_in_order():
+    async def run():
+        scheduler = ProvisioningScheduler(1)
+        admitted, gate = [], asyncio.Event()
+        blocker = asyncio.create_task(provision(scheduler, "t0", admitted, hold=gate))
+        await settle()
+        waiters = [
+            asyncio.create_task(provision(scheduler, "pool", admitted, PRIORITY_POOL)),
+            asyncio.create_task(provision(scheduler, "retry", admitted, PRIORITY_RETRY)),
+            asyncio.create_task(provision(scheduler, "new", admitted, PRIORITY_NEW)),
+        ]
+        await settle()
+        assert admitted == ["t0"]
+        assert [scheduler.depth(p) for p in (PRIORITY_NEW, PRIORITY_RETRY, PRIORITY_POOL)] == [1, 1, 1]
+
+        gate.set()
+        await asyncio.gather(blocker, *waiters)
+        return admitted, scheduler
+
+    admitted, scheduler = asyncio.run(run())
+    assert admitted == ["t0", "new", "retry", "pool"]
+    assert scheduler.running == 0 and not scheduler.running_by_tenant
+
+def test_tenants_take_turns_within_a_class():
+    async def run():
+        scheduler = ProvisioningScheduler(1)
+        admitted, gate = [], asyncio.Event()
+        blocker = asyncio.create_task(provision(scheduler, "a", admitted, hold=gate))
+        await settle()
+        # One tenant's burst arrives ahead of the others
+        waiters = [asyncio.create_task(provision(scheduler, t, admitted)) for t in ("a", "a", "a", "b", "c")]
+        await settle()
+        gate.set()
+        await asyncio.gather(blocker, *waiters)
+        return admitted
+
+    assert asyncio.run(run()) == ["a", "a", "b", "c", "a", "a"]
+
+def test_tenant_with_fewest_running_goes_next():
+    async def run():
+        scheduler = ProvisioningScheduler(2)
+        admitted, a_gate, b_gate = [], asyncio.Event(), asyncio.Event()
+        a_running = asyncio.create_task(provision(scheduler, "a", admitted, hold=a_gate))
+        b_running = asyncio.create_task(provision(scheduler, "b", admitted, hold=b_gate))
+        await settle()
+        a_waiting = asyncio.create_task(provision(scheduler, "a", admitted, hold=a_gate))
+        await settle()
+        c_waiting = asyncio.create_task(provision(scheduler, "c", admitted, hold=a_gate))
+        await settle()
+
+        # "a" queued first but already holds a slot; "c" has none
+        b_gate.set()
+        await b_running
+        await settle()
+        assert admitted == ["a", "b", "c"]
+
+        a_gate.set()
+        await asyncio.gather(a_running, a_waiting, c_waiting)
+        return admitted
+
+    assert asyncio.run(run()) == ["a", "b", "c", "a"]
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        scheduler = ProvisioningScheduler(1)
+        admitted, gate = [], asyncio.Event()
+        blocker = asyncio.create_task(provision(scheduler, "a", admitted, hold=gate))
+        await settle()
+        cancelled = asyncio.create_task(provision(scheduler, "b", admitted))
+        waiter = asyncio.create_task(provision(scheduler, "c", admitted))
+        await settle()
+
+        cancelled.cancel()
+        await settle()
+        assert scheduler.depth(PRIORITY_NEW) == 1
+
+        gate.set()
+        await asyncio.gather(blocker, waiter)
+        return admitted, scheduler
+
+    admitted, scheduler = asyncio.run(run())
+    assert admitted == ["a", "c"]
+    assert scheduler.running == 0
@@ -0,0 +1,172 @@
+import asyncio
+import collections
+import datetime
+import uuid
+import pytest
+from pymysql.converters import escape_string
+
+from app import database
+from app.config import settings
+from app.services import shared_db
+from tests.fakes import FakeResult
+
+class FakeMariaDB:
+    """aiomysql stand-in: each connection's statements, interpolated the way aiomysql does."""
+    def __init__(self):
+        self.executed = collections.defaultdict(list)
+
+    async def connect(self, host, port, **kwargs):
+        db = self
+
+        class Cursor:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, sql, args=None):
+                if args is not None:
+                    sql = sql % tuple(f"'{escape_string(a)}'" for a in args)
+                db.executed[f"{host}:{port}"].append(sql)
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def close(self):
+                pass
+
+        return Connection()
+
+class TenantTable:
+    """
+    In-memory tenant_databases behind AsyncSessionLocal. Every execute yields
+    to the loop, so unserialized placements would interleave.
+    """
+    def __init__(self):
+        self.rows = []
+
+    def session(self):
+        table = self
+
+        class Session:
+            pending = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, stmt):
+                await asyncio.sleep(0)
+                params = stmt.compile().params
+                if "count(" in str(stmt):
+                    live = collections.Counter(t.instance for t in table.rows if t.dropped_at is None)
+                    return FakeResult(live.items())
+                rows = [t for t in table.rows if t.namespace == params["namespace_1"]]
+                if "dropped_at IS NULL" in str(stmt):
+                    rows = [t for t in rows if t.dropped_at is None]
+                return FakeResult([]) if not rows else FakeResult(rows)
+
+            def add(self, tenant):
+                self.pending.append(tenant)
+
+            async def commit(self):
+                await asyncio.sleep(0)
+                table.rows.extend(t for t in self.pending if t not in table.rows)
+                self.pending.clear()
+
+        return Session()
+
+@pytest.fixture
+def mariadb(monkeypatch):
+    fake = FakeMariaDB()
+    monkeypatch.setattr(shared_db.aiomysql, "connect", fake.connect)
+    monkeypatch.setattr(settings, "SHARED_DB_INSTANCES", "db-0:3306, db-1:3307")
+    monkeypatch.setattr(settings, "SHARED_DB_MAX_TENANTS_PER_INSTANCE", 3)
+    monkeypatch.setattr(settings, "SHARED_DB_MAX_USER_CONNECTIONS", 10)
+    return fake
+
+@pytest.fixture
+def tenants(monkeypatch):
+    table = TenantTable()
+    monkeypatch.setattr(database, "AsyncSessionLocal", table.session)
+    # asyncio.Lock binds to the first loop that waits on it; each test runs its own
+    monkeypatch.setattr(shared_db, "_placement_lock", asyncio.Lock())
+    return table
+
+async def provision(*namespaces, password="pw"):
+    return await asyncio.gather(*(shared_db.provision_tenant_database(ns, uuid.uuid4(), password) for ns in namespaces))
+
+def run(steps):
+    return asyncio.run(steps())
+
+def test_identifiers_are_plain_and_bounded():
+    assert shared_db.tenant_identifiers("store-1a2b3c4d") == ("wp_store_1a2b3c4d", "u_store_1a2b3c4d")
+    database_name, user = shared_db.tenant_identifiers("Store-`x`; DROP DATABASE mysql;--" + "a" * 80)
+    assert database_name.startswith("wp_store__x___drop_database_mysql")
+    assert set(database_name + user) <= set("abcdefghijklmnopqrstuvwxyz0123456789_")
+    assert (len(database_name), len(user)) == (64, 32)
+
+def test_concurrent_provisions_spread_across_instances(mariadb, tenants):
+    results = run(lambda: provision(*(f"store-{i}" for i in range(4))))
+    placed = collections.Counter(t.instance for t in tenants.rows)
+    assert placed == {"db-0:3306": 2, "db-1:3307": 2}
+    assert {(r["host"], r["port"]) for r in results} == {("db-0", 3306), ("db-1", 3307)}
+
+def test_placement_prefers_least_loaded_and_stops_when_full(mariadb, tenants):
+    async def steps():
+        await provision("store-a")
+        await provision("store-b")
+        await provision("store-c")
+        assert [t.instance for t in tenants.rows] == ["db-0:3306", "db-1:3307", "db-0:3306"]
+
+        # Dropped tenants free their slots: db-0 is now the emptier one
+        for tenant in (tenants.rows[0], tenants.rows[2]):
+            tenant.dropped_at = datetime.datetime.now(datetime.timezone.utc)
+        await provision("store-d")
+        assert tenants.rows[-1].instance == "db-0:3306"
+
+        await provision("store-e", "store-f", "store-g", "store-h")
+        with pytest.raises(shared_db.SharedDbCapacityError, match="All 2 shared database instances are full"):
+            await provision("store-i")
+    run(steps)
+
+def test_retry_reuses_placement_and_resets_password(mariadb, tenants):
+    async def steps():
+        await provision("store-a")
+        await provision("store-a", password="n3w'pass")
+    run(steps)
+    assert len(tenants.rows) == 1
+    assert mariadb.executed[tenants.rows[0].instance][-2] == "ALTER USER 'u_store_a'@'%' IDENTIFIED BY 'n3w\\'pass' WITH MAX_USER_CONNECTIONS 10"
+
+def test_provision_statements(mariadb, tenants):
+    run(lambda: provision("store-1a2b", password="p@ss'word"))
+    (instance, statements), = mariadb.executed.items()
+    assert statements == [
+        "CREATE DATABASE IF NOT EXISTS `wp_store_1a2b` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci",
+        "CREATE USER IF NOT EXISTS 'u_store_1a2b'@'%' IDENTIFIED BY 'p@ss\\'word'",
+        "ALTER USER 'u_store_1a2b'@'%' IDENTIFIED BY 'p@ss\\'word' WITH MAX_USER_CONNECTIONS 10",
+        "GRANT ALL PRIVILEGES ON `wp_store_1a2b`.* TO 'u_store_1a2b'@'%'",
+    ]
+
+def test_drop_tenant_database(mariadb, tenants):
+    run(lambda: provision("store-1a2b"))
+    instance = tenants.rows[0].instance
+    assert asyncio.run(shared_db.drop_tenant_database("store-1a2b"))
+    assert mariadb.executed[instance][-2:] == [
+        "DROP DATABASE IF EXISTS `wp_store_1a2b`",
+        "DROP USER IF EXISTS 'u_store_1a2b'@'%'",
+    ]
+    assert tenants.rows[0].dropped_at is not None
+
+    # Already dropped, or never shared
+    assert not asyncio.run(shared_db.drop_tenant_database("store-1a2b"))
+    assert not asyncio.run(shared_db.drop_tenant_database("store-none"))
+
+def test_no_instances_configured(mariadb, tenants, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_DB_INSTANCES", " ")
+    with pytest.raises(shared_db.SharedDbCapacityError, match="SHARED_DB_INSTANCES is empty"):
+        run(lambda: provision("store-a"))
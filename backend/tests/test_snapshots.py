@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import json
+import re
+import pytest
+
+from app.config import settings
+from app.operator import snapshots
+from app.operator.wpcli import RESULT_MARKER, WpPlanError
+
+DB = b"-- golden dump --"
+CONTENT = b"wp-content tarball"
+
+@pytest.fixture(autouse=True)
+def template_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORE_TEMPLATES_ENABLED", True)
+    monkeypatch.setattr(settings, "STORE_TEMPLATE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "STORE_TEMPLATE_VERSION", "woocommerce-v1")
+    return tmp_path
+
+class FakeWordPress:
+    """
+    exec_wp/upload stand-ins. Plans report every step as ok unless named in
+    `failing`; each plan is kept in `plans` with the user it ran as.
+    """
+    def __init__(self, admin="golden-admin", failing=()):
+        self.admin = admin
+        self.failing = set(failing)
+        self.commands = []
+        self.plans = []
+        self.uploads = {}
+
+    async def exec_wp(self, command):
+        self.commands.append(command)
+        if command == snapshots.ADMIN_LOOKUP:
+            return f"{self.admin}\n" if self.admin else ""
+        script = command[-1]
+        if "wp db export" in script:
+            return base64.b64encode(DB).decode()
+        if "tar czf" in script:
+            return base64.b64encode(CONTENT).decode()
+        if "wp eval-file" in script:
+            runner = base64.b64decode(script.split()[1]).decode()
+            steps = json.loads(base64.b64decode(re.search(r"base64_decode\('([^']+)'\)", runner).group(1)))
+            self.plans.append((re.search(r"--user=(\S+)", script).group(1), steps))
+            results = [{"name": s["name"], "ok": s["name"] not in self.failing, "output": "", "error": "failed"} for s in steps]
+            return RESULT_MARKER + json.dumps(results)
+        return ""
+
+    async def upload(self, path, data):
+        self.uploads[path] = data
+
+def capture(wp):
+    return asyncio.run(snapshots.capture_snapshot("woocommerce", wp.exec_wp, "http://golden.local", "Golden", "golden@example.com"))
+
+def restore(wp, snapshot, site_url="http://shop.example.com", admin_user="golden-admin"):
+    return asyncio.run(snapshots.restore_snapshot(
+        snapshot, wp.exec_wp, wp.upload, site_url=site_url, blog_name="Shop", admin_email="owner@example.com",
+        admin_user=admin_user, admin_password="s3cret",
+    ))
+
+def test_capture_writes_a_complete_snapshot(template_dir):
+    wp = FakeWordPress()
+    manifest = capture(wp)
+    path = template_dir / "woocommerce-woocommerce-v1"
+    assert manifest["path"] == str(path)
+    assert (path / snapshots.DB_FILE).read_bytes() == DB
+    assert (path / snapshots.CONTENT_FILE).read_bytes() == CONTENT
+    assert manifest["admin_user"] == "golden-admin"
+    assert manifest["bytes"] == {snapshots.DB_FILE: len(DB), snapshots.CONTENT_FILE: len(CONTENT)}
+    assert not (template_dir / "woocommerce-woocommerce-v1.tmp").exists()
+    assert snapshots.load_snapshot("woocommerce") == manifest
+
+    # Already captured: nothing is exported again
+    wp = FakeWordPress()
+    assert capture(wp) == manifest
+    assert wp.commands == []
+
+def test_load_rejects_incomplete_or_foreign_snapshots(template_dir, monkeypatch):
+    manifest = capture(FakeWordPress())
+    path = template_dir / "woocommerce-woocommerce-v1"
+
+    (path / snapshots.CONTENT_FILE).unlink()
+    assert snapshots.load_snapshot("woocommerce") is None
+    (path / snapshots.CONTENT_FILE).write_bytes(CONTENT)
+
+    # A manifest from another template version or engine copied into place
+    manifest.pop("path")
+    (path / snapshots.MANIFEST_FILE).write_text(json.dumps({**manifest, "version": "woocommerce-v0"}))
+    assert snapshots.load_snapshot("woocommerce") is None
+    (path / snapshots.MANIFEST_FILE).write_text(json.dumps({**manifest, "engine": "medusa"}))
+    assert snapshots.load_snapshot("woocommerce") is None
+
+    (path / snapshots.MANIFEST_FILE).write_text("{not json")
+    assert snapshots.load_snapshot("woocommerce") is None
+
+    (path / snapshots.MANIFEST_FILE).write_text(json.dumps(manifest))
+    assert snapshots.load_snapshot("woocommerce")
+    monkeypatch.setattr(settings, "STORE_TEMPLATE_VERSION", "woocommerce-v2")
+    assert snapshots.load_snapshot("woocommerce") is None
+    monkeypatch.setattr(settings, "STORE_TEMPLATE_VERSION", "woocommerce-v1")
+    monkeypatch.setattr(settings, "STORE_TEMPLATES_ENABLED", False)
+    assert snapshots.load_snapshot("woocommerce") is None
+
+def test_restore_round_trip_personalizes_the_store():
+    snapshot = capture(FakeWordPress())
+    wp = FakeWordPress()
+    results = restore(wp, snapshot)
+
+    assert wp.uploads == {"/tmp/urumi-db.sql.gz": DB, "/tmp/urumi-wp-content.tar.gz": CONTENT}
+    assert "wp db import" in wp.commands[0][-1] and "tar xzf" in wp.commands[1][-1]
+
+    user, steps = wp.plans[0]
+    assert user == "golden-admin"
+    by_name = {s["name"]: s for s in steps}
+    assert list(by_name) == ["search_replace_url", "blogname", "admin_email", "admin_user", "flush_rewrite", "flush_transients", "flush_cache"]
+    assert by_name["search_replace_url"]["command"] == "search-replace http://golden.local http://shop.example.com --all-tables --skip-columns=guid"
+    assert by_name["blogname"]["command"] == "option update blogname Shop"
+    assert by_name["admin_user"]["command"] == "user update golden-admin --user_pass=s3cret --user_email=owner@example.com --skip-email"
+    assert [s["name"] for s in steps if s["optional"]] == ["flush_rewrite", "flush_transients", "flush_cache"]
+    assert set(results) == set(by_name)
+
+def test_restore_skips_search_replace_for_the_same_url():
+    snapshot = capture(FakeWordPress())
+    wp = FakeWordPress()
+    restore(wp, snapshot, site_url="http://golden.local")
+    assert "search_replace_url" not in [s["name"] for s in wp.plans[0][1]]
+
+def test_restore_renames_golden_admin_to_the_spec_admin():
+    snapshot = capture(FakeWordPress(admin="admin"))
+    wp = FakeWordPress()
+    restore(wp, snapshot, admin_user="shop-owner")
+
+    user, steps = wp.plans[0]
+    by_name = {s["name"]: s for s in steps}
+    assert user == "admin"
+    assert by_name["admin_user"]["command"].startswith("user update admin ")
+    assert by_name["rename_admin"]["args"] == {"from": "admin", "to": "shop-owner"}
+    assert not by_name["rename_admin"]["optional"]
+
+def test_restore_finds_golden_admin_by_role_for_old_manifests():
+    snapshot = capture(FakeWordPress())
+    snapshot.pop("admin_user")
+    wp = FakeWordPress(admin="wp-setup")
+    restore(wp, snapshot, admin_user="shop-owner")
+
+    # Looked up after the import, against the golden database
+    assert wp.commands[2] == snapshots.ADMIN_LOOKUP
+    user, steps = wp.plans[0]
+    assert user == "wp-setup"
+    assert {s["name"]: s for s in steps}["rename_admin"]["args"] == {"from": "wp-setup", "to": "shop-owner"}
+
+def test_restore_fails_on_required_step_only():
+    snapshot = capture(FakeWordPress())
+    restore(FakeWordPress(failing={"flush_cache", "flush_transients"}), snapshot)
+    with pytest.raises(WpPlanError, match="admin_user"):
+        restore(FakeWordPress(failing={"admin_user"}), snapshot)
@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+import uuid
+import pytest
+
+from app.models import Store
+from app.services.store_cache import StoreReadCache, doc_etag, list_etag, etag_matches
+from tests.fakes import FakeSession
+
+NOW = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+STORE_ID = uuid.uuid4()
+
+def test_fill_after_invalidation_is_dropped():
+    cache = StoreReadCache(ttl=60, max_lists=10)
+
+    # A read starts, then the store changes before the read fills the cache
+    token = cache.doc_token(STORE_ID)
+    cache.invalidate(STORE_ID)
+    cache.put_doc(STORE_ID, token, '"stale"', b"{}")
+    assert cache.get_doc(STORE_ID) is None
+
+    token = cache.doc_token(STORE_ID)
+    cache.put_doc(STORE_ID, token, '"fresh"', b"{}")
+    assert cache.get_doc(STORE_ID) == ('"fresh"', b"{}")
+
+def test_list_fill_guarded_by_any_store_change():
+    cache = StoreReadCache(ttl=60, max_lists=10)
+    token = cache.list_token()
+    cache.invalidate(uuid.uuid4())
+    cache.put_list(("page",), token, '"etag"', b"[]", None)
+    assert cache.get_list(("page",)) is None
+
+    cache.put_list(("page",), cache.list_token(), '"etag"', b"[]", "next")
+    assert cache.get_list(("page",)) == ('"etag"', b"[]", "next")
+
+def test_events_invalidate_what_changed():
+    cache = StoreReadCache(ttl=60, max_lists=10)
+    other = uuid.uuid4()
+    for store_id in (STORE_ID, other):
+        cache.put_doc(store_id, cache.doc_token(store_id), '"e"', b"{}")
+    cache.put_list(("page",), cache.list_token(), '"l"', b"[]", None)
+
+    cache.on_event({"type": "audit", "store_id": str(STORE_ID)})
+    assert cache.get_doc(STORE_ID) and cache.get_list(("page",))
+
+    cache.on_event({"type": "status", "store_id": str(STORE_ID)})
+    assert cache.get_doc(STORE_ID) is None
+    assert cache.get_doc(other)
+    assert cache.get_list(("page",)) is None
+
+    cache.on_event({"type": "reset"})
+    assert cache.get_doc(other) is None
+
+def test_entries_expire_and_lists_are_bounded():
+    cache = StoreReadCache(ttl=0, max_lists=10)
+    cache.put_doc(STORE_ID, cache.doc_token(STORE_ID), '"e"', b"{}")
+    assert cache.get_doc(STORE_ID) is None
+
+    cache = StoreReadCache(ttl=60, max_lists=2)
+    for page in range(3):
+        cache.put_list((page,), cache.list_token(), '"e"', b"[]", None)
+    assert cache.get_list((0,)) is None
+    assert cache.get_list((2,))
+
+def test_etags():
+    later = NOW + datetime.timedelta(microseconds=1)
+    assert doc_etag(STORE_ID, NOW) != doc_etag(STORE_ID, later)
+    assert doc_etag(STORE_ID, NOW).startswith('"') and doc_etag(STORE_ID, NOW).endswith('"')
+
+    rows = [(STORE_ID, NOW)]
+    assert list_etag(rows, None) == list_etag(list(rows), None)
+    assert list_etag(rows, None) != list_etag([(STORE_ID, later)], None)
+    assert list_etag(rows, None) != list_etag(rows, "cursor")
+
+    etag = doc_etag(STORE_ID, NOW)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+@pytest.fixture
+def get_store(monkeypatch):
+    pytest.importorskip("slowapi")
+    from app.api import stores
+    cache = StoreReadCache(ttl=60, max_lists=10)
+    monkeypatch.setattr(stores, "store_cache", cache)
+
+    def call(db, if_none_match=None):
+        return asyncio.run(stores.get_store(STORE_ID, if_none_match=if_none_match, db=db))
+    return call, cache
+
+def make_store(updated_at):
+    return Store(
+        id=STORE_ID, user_id=None, name="shop", engine="woocommerce", status="ready",
+        namespace="store-shop", created_at=NOW, updated_at=updated_at,
+    )
+
+def test_get_store_serves_hits_and_304s(get_store):
+    call, cache = get_store
+    db = FakeSession([make_store(NOW)])
+    first = call(db)
+    assert first.status_code == 200
+    assert first.headers["etag"] == doc_etag(STORE_ID, NOW)
+
+    # Hit: no query, same bytes; a matching If-None-Match gets an empty 304
+    again = call(db)
+    assert again.body == first.body
+    assert len(db.statements) == 1
+    not_modified = call(db, if_none_match=first.headers["etag"])
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    assert not_modified.headers["etag"] == first.headers["etag"]
+
+    # After a change the old ETag no longer matches
+    later = NOW + datetime.timedelta(seconds=5)
+    cache.on_event({"type": "status", "store_id": str(STORE_ID)})
+    db = FakeSession([make_store(later)])
+    changed = call(db, if_none_match=first.headers["etag"])
+    assert changed.status_code == 200
+    assert changed.headers["etag"] == doc_etag(STORE_ID, later)
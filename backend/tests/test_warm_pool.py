@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import uuid
+import pytest
+from starlette.requests import Request
+
+from app import database
+from app.config import settings
+from app.models import AuditLog, Job, Store
+from app.schemas import StoreCreate
+from app.services import quota, warm_pool
+from app.services.warm_pool import POOL_AVAILABLE, POOL_WARMING
+from tests.fakes import FakeSession
+
+EARLIER = datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)
+REQUEST = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("10.0.0.1", 4321)})
+
+def pool_store(engine="woocommerce"):
+    return Store(
+        id=uuid.uuid4(), name=f"pool-{uuid.uuid4().hex[:8]}", engine=engine, status="ready",
+        namespace=f"store-{uuid.uuid4().hex[:8]}", pool_state=POOL_AVAILABLE, admin_password="pool-secret",
+        created_at=EARLIER, updated_at=EARLIER, provisioning_completed_at=EARLIER, quota_reserved=False,
+    )
+
+def test_claim_takes_ready_instances_of_the_engine_with_skip_locked():
+    stores = [pool_store(), pool_store()]
+    db = FakeSession(stores)
+    claimed = asyncio.run(warm_pool.claim_pooled_stores(db, ["shop-a", "shop-b", "shop-c"], "woocommerce"))
+
+    sql = db.sql(0)
+    assert "stores.pool_state = %(pool_state_1)s AND stores.engine = %(engine_1)s AND stores.status = %(status_1)s" in sql
+    assert "ORDER BY stores.created_at" in sql
+    assert sql.endswith("FOR UPDATE SKIP LOCKED")
+    params = db.statements[0].compile().params
+    assert (params["pool_state_1"], params["engine_1"], params["status_1"], params["param_1"]) == (POOL_AVAILABLE, "woocommerce", "ready", 3)
+
+    # Fewer instances than names: the first names get them, in order
+    assert claimed == stores
+    assert [s.name for s in claimed] == ["shop-a", "shop-b"]
+    for store in claimed:
+        assert (store.pool_state, store.status) == (None, "personalizing")
+        assert store.admin_password != "pool-secret"
+        assert store.provisioning_completed_at is None
+        assert store.created_at == store.updated_at == store.provisioning_started_at > EARLIER
+    assert db.commits == 0
+
+def test_claim_with_empty_pool_returns_none():
+    assert asyncio.run(warm_pool.claim_pooled_store(FakeSession([]), "shop", "medusa")) is None
+
+@pytest.fixture
+def create_store(monkeypatch):
+    pytest.importorskip("slowapi")
+    from app.api import stores
+
+    async def reserve_quota(db, store, enforce=True):
+        store.quota_reserved = True
+        return True
+    monkeypatch.setattr(quota, "reserve_quota", reserve_quota)
+
+    def call(db, name="shop-a", engine="woocommerce"):
+        handler = stores.create_store.__wrapped__
+        return asyncio.run(handler(StoreCreate(name=name, engine=engine), request=REQUEST, db=db))
+    return call
+
+def test_create_claims_a_pool_instance_and_queues_personalize(create_store):
+    pooled = pool_store()
+    db = FakeSession([pooled])
+    store = create_store(db, name="Shop-A")
+
+    assert store is pooled
+    assert (store.name, store.status, store.quota_reserved) == ("shop-a", "personalizing", True)
+    # Claim, audit entry and personalize job commit together
+    assert db.commits == 1
+    jobs = [obj for obj in db.committed if isinstance(obj, Job)]
+    assert [(j.kind, j.store_id) for j in jobs] == [("personalize_store", pooled.id)]
+    audit = next(obj for obj in db.committed if isinstance(obj, AuditLog))
+    assert audit.metadata_["warm_pool"] and audit.resource_id == str(pooled.id)
+    # The cold path's capacity check and insert never ran
+    assert len(db.statements) == 1
+
+def test_personalize_relabels_the_claimed_cr(monkeypatch):
+    pytest.importorskip("kubernetes")
+    from app.services import orchestrator
+
+    patched = []
+
+    class CustomObjectsApi:
+        def patch_namespaced_custom_object(self, group, version, namespace, plural, name, body):
+            patched.append((plural, name, body))
+
+    store = pool_store()
+    store.name, store.admin_password = "shop-a", "n3w"
+    db = FakeSession([store])
+    monkeypatch.setattr(orchestrator.client, "CustomObjectsApi", CustomObjectsApi, raising=False)
+    monkeypatch.setattr(database, "AsyncSessionLocal", lambda: db)
+    asyncio.run(orchestrator.personalize_store(store.id))
+
+    (plural, name, body), = patched
+    assert (plural, name) == ("stores", store.namespace)
+    assert body["metadata"]["labels"] == {"urumi.io/pool": "claimed"}
+    assert body["spec"]["name"] == "shop-a"
+    assert body["spec"]["personalize"]["adminPassword"] == "n3w"
+    assert db.commits == 1
+
+@pytest.fixture
+def replenish(monkeypatch):
+    """Runs replenish_pool against `db` with the given headroom."""
+    pytest.importorskip("kubernetes")
+    from app.services import capacity
+
+    monkeypatch.setattr(settings, "WARM_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "WARM_POOL_ENGINES", "woocommerce, medusa")
+
+    def run(db, headroom):
+        async def get_headroom(db):
+            return headroom
+        monkeypatch.setattr(capacity, "get_headroom", get_headroom)
+        monkeypatch.setattr(database, "AsyncSessionLocal", lambda: db)
+        asyncio.run(warm_pool.replenish_pool())
+    return run
+
+def created_pool_stores(db):
+    return [obj for obj in db.committed if isinstance(obj, Store)]
+
+def test_replenish_stays_within_capacity_budget(replenish, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "queue")
+    failed = pool_store()
+    failed.status = "failed"
+    # failed pool instances, then the live pool size per engine
+    db = FakeSession([failed], [(1,)], [(0,)])
+    replenish(db, {"free_stores": 4, "waiting_stores": 1})
+
+    # Budget is free - waiting - 1 (one slot kept for customer creates) = 2
+    stores = created_pool_stores(db)
+    assert [(s.engine, s.pool_state, s.status) for s in stores] == [("woocommerce", POOL_WARMING, "requested")] * 2
+    assert failed.status == "deleting"
+    jobs = [(j.kind, j.store_id) for j in db.committed if isinstance(j, Job)]
+    assert jobs == [("deprovision_store", failed.id)] + [("provision_store", s.id) for s in stores]
+    assert db.commits == 1
+
+def test_replenish_fills_every_engine_without_admission(replenish, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "off")
+    db = FakeSession([], [(3,)], [(1,)])
+    replenish(db, None)
+    assert [s.engine for s in created_pool_stores(db)] == ["medusa", "medusa"]
+
+def test_replenish_adds_nothing_when_cluster_is_full(replenish, monkeypatch):
+    monkeypatch.setattr(settings, "CAPACITY_ADMISSION_MODE", "reject")
+    db = FakeSession([], [(0,)], [(0,)])
+    replenish(db, {"free_stores": 1, "waiting_stores": 0})
+    assert created_pool_stores(db) == []
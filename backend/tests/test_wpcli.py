@@ -0,0 +1,74 @@
+import asyncio
+import base64
+import json
+import re
+import pytest
+
+from app.operator.wpcli import WpPlan, WpPlanError, RESULT_MARKER, parse_plan_output, run_wp_plan
+
+def make_plan():
+    return (
+        WpPlan("setup")
+        .cli("activate", ["plugin", "activate", "woocommerce"])
+        .php("title", "update_option('blogname', $args['title']);", {"title": "O'Brien's Shop"})
+        .cli("theme", ["theme", "install", "storefront"], optional=True)
+    )
+
+def marker_line(results):
+    return RESULT_MARKER + json.dumps(results)
+
+def step(name, ok=True, output="", error=""):
+    return {"name": name, "ok": ok, "output": output, "error": error, "duration_ms": 3}
+
+def test_command_ships_the_plan_in_one_exec():
+    command = make_plan().command(user="shop admin")
+    assert command[:2] == ["sh", "-c"]
+    assert command[2].endswith("wp eval-file - --allow-root --user='shop admin'")
+
+    script = base64.b64decode(command[2].split()[1]).decode()
+    assert RESULT_MARKER in script
+    plan = json.loads(base64.b64decode(re.search(r"base64_decode\('([^']+)'\)", script).group(1)))
+    assert [s["name"] for s in plan] == ["activate", "title", "theme"]
+    assert plan[0]["command"] == "plugin activate woocommerce"
+    assert plan[1]["args"] == {"title": "O'Brien's Shop"}
+    assert plan[2]["optional"]
+
+def test_parse_takes_the_marker_line_among_noise():
+    results = [step("activate", output="Plugin activated.")]
+    output = "\n".join([
+        "Deprecated: something in wp-includes",
+        RESULT_MARKER + "[]",
+        "PHP Notice: more noise",
+        marker_line(results),
+        "",
+    ])
+    assert parse_plan_output(output) == results
+
+def test_parse_without_marker_raises():
+    with pytest.raises(WpPlanError, match="No plan result found"):
+        parse_plan_output("Error: This does not seem to be a WordPress installation.")
+
+def test_run_returns_results_by_step_and_tolerates_optional_failures():
+    results = [step("activate"), step("title", output="1"), step("theme", ok=False, error="download failed")]
+    commands = []
+
+    async def exec_fn(command):
+        commands.append(command)
+        return "Success: done\n" + marker_line(results)
+
+    by_step = asyncio.run(run_wp_plan(exec_fn, make_plan()))
+    assert len(commands) == 1
+    assert list(by_step) == ["activate", "title", "theme"]
+    assert by_step["title"]["output"] == "1"
+    assert not by_step["theme"]["ok"]
+
+def test_run_raises_on_required_step_failure():
+    # The runner stops at the first required failure
+    results = [step("activate"), step("title", ok=False, error="Call to undefined function")]
+
+    async def exec_fn(command):
+        return marker_line(results)
+
+    with pytest.raises(WpPlanError, match="failed at step 'title': Call to undefined function") as e:
+        asyncio.run(run_wp_plan(exec_fn, make_plan()))
+    assert e.value.results == results
@@ -10,12 +10,45 @@ export const apiClient = axios.create({
     },
 });
 
+export interface StoreListParams {
+    limit?: number;
+    cursor?: string;
+    status?: string[];
+    engine?: string;
+    user_id?: string;
+    name_prefix?: string;
+}
+
+export interface StorePage {
+    stores: StoreModel[];
+    nextCursor: string | null;
+}
+
+// Server-Sent Events: store status and activity as they happen. EventSource
+// reconnects on its own and resumes from the last event id.
+export const subscribeStoreEvents = (storeId: string | null, onEvent: (event: MessageEvent) => void): (() => void) => {
+    const source = new EventSource(storeId ? `${API_URL}/events/stores/${storeId}` : `${API_URL}/events/`);
+    for (const type of ['status', 'audit', 'reset']) {
+        source.addEventListener(type, onEvent as EventListener);
+    }
+    return () => source.close();
+};
+
 export const storeApi = {
     list: async (): Promise<StoreModel[]> => {
         const response = await apiClient.get<StoreModel[]>('/stores');
         return response.data;
     },
 
+    // Keyset-paginated, server-filtered listing
+    listPage: async (params: StoreListParams = {}): Promise<StorePage> => {
+        const response = await apiClient.get<StoreModel[]>('/stores', {
+            params,
+            paramsSerializer: { indexes: null }, // status=a&status=b
+        });
+        return { stores: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+    },
+
     get: async (id: string): Promise<StoreModel> => {
         const response = await apiClient.get<StoreModel>(`/stores/${id}`);
         return response.data;
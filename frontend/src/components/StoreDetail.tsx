@@ -1,7 +1,7 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { useQuery } from '@tanstack/react-query';
-import { storeApi } from '../api/client';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
+import { storeApi, subscribeStoreEvents } from '../api/client';
 import { Badge } from '@/components/ui/badge';
 import { Loader2, ExternalLink, Copy, Check, RefreshCw, ShoppingCart, ShieldCheck, X, HardDrive, Clock, Box } from 'lucide-react';
 import { clsx, type ClassValue } from 'clsx';
@@ -16,13 +16,24 @@ export default function StoreDetail() {
     const navigate = useNavigate();
     const [copiedUrl, setCopiedUrl] = useState<string | null>(null);
 
+    const queryClient = useQueryClient();
+
+    // Pushed status/activity events refresh the store; polling is only a fallback
+    useEffect(() => {
+        if (!id) return;
+        return subscribeStoreEvents(id, () => {
+            queryClient.invalidateQueries({ queryKey: ['store', id] });
+            queryClient.invalidateQueries({ queryKey: ['store-logs', id] });
+        });
+    }, [id, queryClient]);
+
     const { data: store, isPending: storeLoading } = useQuery({
         queryKey: ['store', id],
         queryFn: () => storeApi.get(id!),
         enabled: !!id,
         refetchInterval: (query: any) => {
             const data = query.state.data;
-            return data?.status === 'provisioning' ? 2000 : false;
+            return data?.status === 'provisioning' ? 30000 : false;
         }
     });
 
@@ -31,7 +42,7 @@ export default function StoreDetail() {
         queryFn: () => storeApi.logs(id!),
         enabled: !!id,
         refetchInterval: () => {
-            return store?.status === 'provisioning' ? 2000 : false;
+            return store?.status === 'provisioning' ? 30000 : false;
         }
     });
 
@@ -1,10 +1,10 @@
-import { useQuery } from '@tanstack/react-query';
-import { storeApi } from '../api/client';
+import { useInfiniteQuery, useQueryClient } from '@tanstack/react-query';
+import { storeApi, subscribeStoreEvents } from '../api/client';
 import { Button } from '@/components/ui/button';
 import { Plus, Loader2, Trash, Eye, Copy, HardDrive } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import CreateStoreModal from './CreateStoreModal';
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { clsx, type ClassValue } from 'clsx';
 import { twMerge } from 'tailwind-merge';
 
@@ -13,11 +13,22 @@ function cn(...inputs: ClassValue[]) {
 }
 
 export default function StoreList() {
-    const { data: stores, isPending: isLoading, error, refetch } = useQuery({
+    const queryClient = useQueryClient();
+
+    // Fleet status events refresh the list; polling is only a fallback
+    useEffect(() => subscribeStoreEvents(null, (event) => {
+        if (event.type !== 'audit') queryClient.invalidateQueries({ queryKey: ['stores'] });
+    }), [queryClient]);
+
+    // Keyset pages: each page hands back the cursor for the next one
+    const { data, isPending: isLoading, error, refetch, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
         queryKey: ['stores'],
-        queryFn: storeApi.list,
-        refetchInterval: 5000,
+        queryFn: ({ pageParam }) => storeApi.listPage({ cursor: pageParam ?? undefined }),
+        initialPageParam: null as string | null,
+        getNextPageParam: (lastPage) => lastPage.nextCursor,
+        refetchInterval: 60000,
     });
+    const stores = data?.pages.flatMap((page) => page.stores);
 
     const [isCreateOpen, setIsCreateOpen] = useState(false);
     const [deletingId, setDeletingId] = useState<string | null>(null);
@@ -113,7 +124,8 @@ export default function StoreList() {
                                         <span className="text-sm font-medium text-blue-600 capitalize">
                                             {store.status === 'ready' ? 'Ready' :
                                                 (store.status === 'provisioning_requested' || store.status === 'requested') ? 'Provisioning' :
-                                                    store.status}
+                                                    store.status === 'waiting_capacity' ? 'Waiting for capacity' :
+                                                        store.status}
                                         </span>
                                     </div>
                                 </td>
@@ -161,6 +173,19 @@ export default function StoreList() {
                 </table>
             </div>
 
+            {hasNextPage && (
+                <div className="flex justify-center">
+                    <Button
+                        variant="outline"
+                        onClick={() => fetchNextPage()}
+                        disabled={isFetchingNextPage}
+                        className="bg-white border-gray-200 shadow-sm text-gray-700 rounded-lg px-4 py-2 font-medium hover:bg-gray-50"
+                    >
+                        {isFetchingNextPage && <Loader2 className="mr-2 h-4 w-4 animate-spin" />} Load more
+                    </Button>
+                </div>
+            )}
+
             <CreateStoreModal open={isCreateOpen} onOpenChange={setIsCreateOpen} />
         </div>
     );
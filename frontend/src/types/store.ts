@@ -2,7 +2,7 @@ export interface StoreModel {
     id: string;
     name: string;
     engine: 'woocommerce' | 'medusa';
-    status: 'requested' | 'provisioning' | 'provisioning_requested' | 'ready' | 'failed' | 'deleting';
+    status: 'requested' | 'provisioning' | 'provisioning_requested' | 'waiting_capacity' | 'personalizing' | 'ready' | 'hibernated' | 'waking' | 'failed' | 'deleting';
     namespace: string;
     domain?: string;
     admin_url?: string;
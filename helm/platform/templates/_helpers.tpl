@@ -0,0 +1,30 @@
+{{/*
+CPU quantity ("250m", "1", "0.5") in millicores.
+*/}}
+{{- define "platform.cpuMillis" -}}
+{{- $q := toString . -}}
+{{- if hasSuffix "m" $q -}}
+{{- trimSuffix "m" $q | int64 -}}
+{{- else -}}
+{{- mulf (float64 $q) 1000 | ceil | int64 -}}
+{{- end -}}
+{{- end -}}
+
+{{/*
+Memory or storage quantity with a binary suffix ("512Mi", "2Gi") or plain
+bytes, in MiB rounded up.
+*/}}
+{{- define "platform.mebibytes" -}}
+{{- $q := toString . -}}
+{{- if hasSuffix "Ti" $q -}}
+{{- mulf (float64 (trimSuffix "Ti" $q)) 1048576 | ceil | int64 -}}
+{{- else if hasSuffix "Gi" $q -}}
+{{- mulf (float64 (trimSuffix "Gi" $q)) 1024 | ceil | int64 -}}
+{{- else if hasSuffix "Mi" $q -}}
+{{- float64 (trimSuffix "Mi" $q) | ceil | int64 -}}
+{{- else if hasSuffix "Ki" $q -}}
+{{- divf (float64 (trimSuffix "Ki" $q)) 1024 | ceil | int64 -}}
+{{- else -}}
+{{- divf (float64 $q) 1048576 | ceil | int64 -}}
+{{- end -}}
+{{- end -}}
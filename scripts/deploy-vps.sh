@@ -30,7 +30,7 @@ fi
 
 # 3. Build & Import Images (Local Build on VPS to save time)
 echo "Building Platform Images..."
-docker build -t urumi-platform-api:vps ./backend
+docker build -t urumi-platform-api:vps --build-context store-engines=./helm/store-engines ./backend
 docker build -t urumi-dashboard:vps ./frontend
 
 # Export and Import to k3s containerd
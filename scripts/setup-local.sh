@@ -20,7 +20,7 @@ fi
 
 # 2. Build images (Mocking build for now, or use placeholder)
 echo "Building component images..."
-docker build -t urumi-platform-api:latest ./backend
+docker build -t urumi-platform-api:latest --build-context store-engines=./helm/store-engines ./backend
 docker build -t urumi-dashboard:latest ./frontend # This assumes Dockerfile in frontend builds nginx serving static
 
 # Import images to k3d